@@ -1,9 +1,14 @@
-import time
 import random
+from functools import lru_cache
+import numpy as np
 import pygame
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
 from rgbmatrix.graphics import Color
 from Utils.menu_utils import ExitOnBack
+from Utils.input_state import InputState
+from Utils.framebuffer import FrameBuffer, rgb
+from Utils.matrix_utils import create_matrix
+from Utils.led_text import draw_text_centered, draw_number
+from Utils.game_loop import clock
 
 # -------------------------------------------------
 # CO-OP / 2P BLACKJACK (128x64 LED MATRIX)
@@ -28,16 +33,8 @@ from Utils.menu_utils import ExitOnBack
 # ----------------------------
 # MATRIX CONFIG
 # ----------------------------
-options = RGBMatrixOptions()
-options.hardware_mapping = "adafruit-hat"
-options.rows = 64
-options.cols = 64
-options.chain_length = 2
-options.brightness = 50
-options.gpio_slowdown = 4
-
-matrix = RGBMatrix(options=options)
-canvas = matrix.CreateFrameCanvas()
+matrix, canvas = create_matrix(brightness=50)
+fb = FrameBuffer(128, 64)  # kept between frames: redrawn only when the table changes
 
 # ----------------------------
 # PYGAME / CONTROLLERS
@@ -54,6 +51,10 @@ pad2 = pygame.joystick.Joystick(1)
 pad1.init()
 pad2.init()
 
+# one event drain per frame; every pad read below comes from this snapshot
+inp = InputState([pad1, pad2])
+pad1, pad2 = inp.pads
+
 # ----------------------------
 # CONSTANTS
 # ----------------------------
@@ -63,7 +64,6 @@ A_BTN = 0
 B_BTN = 1
 BACK_BTN = 6
 
-DT_CAP = 0.05
 ROUND_SHOW_TIME = 2.2
 WIN_SHOW_TIME = 3.0
 REVEAL_SHOW_TIME = 2.5
@@ -120,13 +120,18 @@ CARD_BACK = [
 "WWWWWWWWWWWWW",
 ]
 
-def draw_sprite(cv, x0, y0, sprite, palette):
+def compile_sprite(sprite, palette):
+    """Sprite rows + palette -> (HxWx3 image, mask); "0" stays transparent."""
+    h, w = len(sprite), max(len(row) for row in sprite)
+    img = np.zeros((h, w, 3), dtype=np.uint8)
+    mask = np.zeros((h, w), dtype=bool)
     for y, row in enumerate(sprite):
         for x, ch in enumerate(row):
             if ch == "0":
                 continue
-            c = palette[ch]
-            cv.SetPixel(x0 + x, y0 + y, c.red, c.green, c.blue)
+            img[y, x] = rgb(palette[ch])
+            mask[y, x] = True
+    return img, mask
 
 PALETTE = {
     "W": Color(255,255,255),
@@ -142,114 +147,12 @@ def palette_tint(base, overrides=None):
     p.update(overrides)
     return p
 
-# usage:
-# draw_sprite(canvas, 10, 12, CARD_BACK, PALETTE)
-
-# ----------------------------
-# 3x5 DIGITS FONT
-# ----------------------------
-DIG3x5 = {
-    "0": ["111","101","101","101","111"],
-    "1": ["010","110","010","010","111"],
-    "2": ["111","001","111","100","111"],
-    "3": ["111","001","111","001","111"],
-    "4": ["101","101","111","001","001"],
-    "5": ["111","100","111","001","111"],
-    "6": ["111","100","111","101","111"],
-    "7": ["111","001","001","010","010"],
-    "8": ["111","101","111","101","111"],
-    "9": ["111","101","111","001","111"],
-    "-": ["000","000","111","000","000"],
-}
-
-LET3x5 = {
-    "P": ["111","101","111","100","100"],
-    "1": DIG3x5["1"],
-    "2": DIG3x5["2"],
-
-    "W": ["101","101","101","111","101"],
-    "I": ["111","010","010","010","111"],
-    "N": ["101","111","111","111","101"],
-
-    "L": ["100","100","100","100","111"],
-    "O": ["111","101","101","101","111"],
-    "S": ["111","100","111","001","111"],
-    "H": ["101","101","111","101","101"],
-
-    # optional if you want PUSH support:
-    "U": ["101","101","101","101","111"],
-}
-
-def draw_text3x5(cv, x, y, text, color, scale=2, gap=1):
-    # uses LET3x5 for letters and DIG3x5 for digits
-    cx = x
-    for ch in text:
-        if ch == " ":
-            cx += (3*scale + gap*scale)
-            continue
-
-        glyph = LET3x5.get(ch)
-        if glyph is None:
-            glyph = DIG3x5.get(ch)
-
-        if glyph:
-            for gy in range(5):
-                row = glyph[gy]
-                for gx in range(3):
-                    if row[gx] == "1":
-                        for sy in range(scale):
-                            for sx in range(scale):
-                                set_px(cv, cx + gx*scale + sx, y + gy*scale + sy, color)
-
-        cx += (3*scale + gap*scale)
-
-def draw_text3x5_centered(cv, cx, y, text, color, scale=2, gap=1):
-    char_w = 3*scale + gap*scale
-    total_w = len(text) * char_w - gap*scale
-    x0 = int(cx - total_w//2)
-    draw_text3x5(cv, x0, y, text, color, scale=scale, gap=gap)
-
-
 def set_px(cv, x, y, c):
     if 0 <= x < W and 0 <= y < H:
         cv.SetPixel(int(x), int(y), c.red, c.green, c.blue)
 
 def fill_rect(cv, x0, y0, w, h, c):
-    x1, y1 = x0 + w, y0 + h
-    if x1 <= 0 or y1 <= 0 or x0 >= W or y0 >= H:
-        return
-    x0 = max(0, int(x0)); y0 = max(0, int(y0))
-    x1 = min(W, int(x1)); y1 = min(H, int(y1))
-    for yy in range(y0, y1):
-        for xx in range(x0, x1):
-            cv.SetPixel(xx, yy, c.red, c.green, c.blue)
-
-def draw_digit3x5(cv, x, y, ch, color, scale=1):
-    glyph = DIG3x5.get(ch)
-    if not glyph:
-        return
-    for gy in range(5):
-        row = glyph[gy]
-        for gx in range(3):
-            if row[gx] == "1":
-                for sy in range(scale):
-                    for sx in range(scale):
-                        set_px(cv, x + gx*scale + sx, y + gy*scale + sy, color)
-
-def draw_number(cv, x, y, n, color, scale=1):
-    s = str(n)
-    digit_w = 3*scale
-    gap = 1*scale
-    for i, ch in enumerate(s):
-        draw_digit3x5(cv, x + i*(digit_w+gap), y, ch, color, scale)
-
-def draw_number_centered(cv, cx, y, n, color, scale=1):
-    s = str(n)
-    digit_w = 3*scale
-    gap = 1*scale
-    total_w = len(s)*digit_w + (len(s)-1)*gap
-    x0 = int(cx - total_w//2)
-    draw_number(cv, x0, y, n, color, scale)
+    cv.fill_rect(x0, y0, w, h, c)  # clipped + vectorized in FrameBuffer
 
 # ----------------------------
 # BLACKJACK LOGIC
@@ -287,20 +190,6 @@ def rank_label(rank):
         return 10  # show as 10 (face)
     return rank
 
-# ----------------------------
-# INPUT EDGE HELPERS
-# ----------------------------
-class EdgeButtons:
-    def __init__(self, pad):
-        self.pad = pad
-        self.prev = {}
-
-    def pressed(self, btn):
-        down = bool(self.pad.get_button(btn))
-        was = self.prev.get(btn, False)
-        self.prev[btn] = down
-        return down and (not was)
-
 # ----------------------------
 # GAME STATE
 # ----------------------------
@@ -312,7 +201,6 @@ def new_player(pad, color):
         "stood": False,
         "bust": False,
         "coins": START_COINS,
-        "edge": EdgeButtons(pad),
         "result": 0,   # -1 lose, 0 push/none, +1 win
     }
 
@@ -343,12 +231,11 @@ def reset_game(now):
         "round_over_until": 0.0,
         "game_winner": 0,          # 0 none, 1 p1, 2 p2
         "game_win_until": 0.0,
-        "last_t": now,
     }
     reset_round(g)
     return g
 
-game = reset_game(time.time())
+game = reset_game(clock())
 
 # ----------------------------
 # UPDATE
@@ -358,14 +245,14 @@ def can_hit(p):
 
 def update_player_actions(p, now):
     # A = HIT (edge)
-    if p["edge"].pressed(A_BTN) and can_hit(p):
+    if p["pad"].pressed(A_BTN) and can_hit(p):
         p["hand"].append(draw_card_rank())
         if hand_total(p["hand"]) > 21:
             p["bust"] = True
             p["stood"] = True
 
     # B = STAND (edge)
-    if p["edge"].pressed(B_BTN) and (not p["stood"]) and (not p["bust"]):
+    if p["pad"].pressed(B_BTN) and (not p["stood"]) and (not p["bust"]):
         p["stood"] = True
 
 def dealer_play(g):
@@ -401,16 +288,16 @@ def resolve_round(g):
     # check game winner (first to 5)
     if g["p1"]["coins"] >= TARGET_COINS and g["p2"]["coins"] >= TARGET_COINS:
         g["game_winner"] = 0  # tie (rare)
-        g["game_win_until"] = time.time() + WIN_SHOW_TIME
+        g["game_win_until"] = clock() + WIN_SHOW_TIME
     elif g["p1"]["coins"] >= TARGET_COINS:
         g["game_winner"] = 1
-        g["game_win_until"] = time.time() + WIN_SHOW_TIME
+        g["game_win_until"] = clock() + WIN_SHOW_TIME
     elif g["p2"]["coins"] >= TARGET_COINS:
         g["game_winner"] = 2
-        g["game_win_until"] = time.time() + WIN_SHOW_TIME
+        g["game_win_until"] = clock() + WIN_SHOW_TIME
 
     g["round_over"] = True
-    g["round_over_until"] = time.time() + ROUND_SHOW_TIME
+    g["round_over_until"] = clock() + ROUND_SHOW_TIME
 
 def start_reveal_phase(g, now):
     # dealer finishes their hand and we reveal everything
@@ -467,27 +354,42 @@ def draw_separator_lines(cv):
     for x in range(W):
         set_px(cv, x, MID_LINE_Y, SEP)
 
-def draw_card(cv, x, y, rank, border_c, text_c):
-    # draw the sprite card base (back pattern)
-    pal = palette_tint(PALETTE, {
-        "W": border_c,   # use player/dealer color for border
-        "G": CARD_BG,    # fill color
-        "R": Color(120, 0, 120),  # optional accent inside the card
-    })
-    draw_sprite(cv, x, y, CARD_BACK, pal)
+@lru_cache(maxsize=None)
+def card_bitmap(label, border, text, hidden):
+    """
+    One card as (image, mask), compiled on first use and kept:
+    keyed by (rank label, border rgb, text rgb, hidden). Hidden cards ignore label/text.
+    """
+    if hidden:
+        pal = palette_tint(PALETTE, {
+            "W": CARD_EDGE,
+            "G": HIDDEN_C,
+            "R": Color(120, 0, 120),
+        })
+    else:
+        pal = palette_tint(PALETTE, {
+            "W": border,     # use player/dealer color for border
+            "G": CARD_BG,    # fill color
+            "R": Color(120, 0, 120),  # optional accent inside the card
+        })
+    img, mask = compile_sprite(CARD_BACK, pal)
+    if hidden:
+        return img, mask
+
+    # overlay the rank number (your existing digits), clipped to the card
+    face = FrameBuffer(img.shape[1], img.shape[0])
+    face.blit(0, 0, img, mask)
+    draw_text_centered(face, CARD_W//2, 5, str(label), text, scale=1)
+    return face.pixels.copy(), mask
 
-    # overlay the rank number (your existing digits)
-    val = rank_label(rank)
-    draw_number_centered(cv, x + CARD_W//2, y + 5, val, text_c, scale=1)
+def draw_card(cv, x, y, rank, border_c, text_c):
+    img, mask = card_bitmap(rank_label(rank), rgb(border_c), rgb(text_c), False)
+    cv.blit(x, y, img, mask)
 
 
 def draw_hidden_card(cv, x, y):
-    pal = palette_tint(PALETTE, {
-        "W": CARD_EDGE,
-        "G": HIDDEN_C,
-        "R": Color(120, 0, 120),
-    })
-    draw_sprite(cv, x, y, CARD_BACK, pal)
+    img, mask = card_bitmap(None, None, None, True)
+    cv.blit(x, y, img, mask)
 
 
 def draw_hand(cv, x0, y0, ranks, border_c, text_c, hide_second=False):
@@ -578,8 +480,8 @@ def draw_round_result_overlay(cv, g):
     p2_txt = "P2 " + label_for_result(g["p2"]["result"])
 
     # draw P1 line, then P2 line below
-    draw_text3x5_centered(cv, W//2, y0 + 2,  p1_txt, P1_C, scale=2, gap=1)
-    draw_text3x5_centered(cv, W//2, y0 + 18, p2_txt, P2_C, scale=2, gap=1)
+    draw_text_centered(cv, W//2, y0 + 2,  p1_txt, P1_C, scale=2, gap=1)
+    draw_text_centered(cv, W//2, y0 + 18, p2_txt, P2_C, scale=2, gap=1)
 
     # subtle divider between lines
     for x in range(10, W-10):
@@ -608,7 +510,7 @@ def draw_game_win(cv, winner):
         draw_number(cv, 40, 27, 2, col, scale=1)
     else:
         # tie
-        draw_number_centered(cv, W//2, 28, 0, col, scale=1)
+        draw_text_centered(cv, W//2, 28, "0", col, scale=1)
 
     # "WIN" bars
     fill_rect(cv, 60, 26, 3, 12, col)
@@ -617,33 +519,48 @@ def draw_game_win(cv, winner):
 
     fill_rect(cv, 60, 38, 15, 3, col)
 
+def table_look(g, screen):
+    """Everything the table shows on this screen; the frame is only redrawn when it changes."""
+    players = tuple(
+        (p["coins"], tuple(p["hand"]), p["stood"], p["bust"], p["result"])
+        for p in (g["p1"], g["p2"])
+    )
+    return (screen, players, tuple(g["dealer_hand"]), g["dealer_reveal"], g["game_winner"])
+
+def draw_table(fb, g, screen):
+    """
+    screen: "play" (also the reveal), "round" (result overlay) or "win".
+    Nothing is drawn (and nothing sent to the panel) while the table is unchanged.
+    """
+    if not fb.changed("table", table_look(g, screen)):
+        return
+    fb.clear()
+    draw_ui(fb, g)
+    draw_separator_lines(fb)
+    if screen == "win":
+        draw_game_win(fb, g["game_winner"])
+        return
+    draw_round_state(fb, g)
+    if screen == "round":
+        draw_round_result_overlay(fb, g)
+
 # ----------------------------
 # MAIN LOOP
 # ----------------------------
 exit_mgr = ExitOnBack([pad1, pad2], back_btn=BACK_BTN, quit_only=False)
 
 while True:
-    pygame.event.pump()
-    now = time.time()
+    inp.poll()
+    now = clock()
 
     if exit_mgr.should_exit():
         matrix.Clear()
         exit_mgr.handle()
 
-    dt = now - game["last_t"]
-    game["last_t"] = now
-    if dt < 0:
-        dt = 0.0
-    if dt > DT_CAP:
-        dt = DT_CAP
-
     # If someone already won the match, show win screen then restart match
     if game["game_winner"] != 0 and now < game["game_win_until"]:
-        canvas.Clear()
-        draw_ui(canvas, game)
-        draw_separator_lines(canvas)
-        draw_game_win(canvas, game["game_winner"])
-        canvas = matrix.SwapOnVSync(canvas)
+        draw_table(fb, game, "win")
+        canvas = fb.present(matrix, canvas)
         continue
     elif game["game_winner"] != 0 and now >= game["game_win_until"]:
         game = reset_game(now)
@@ -651,12 +568,8 @@ while True:
 
     # Round over screen
     if game["round_over"]:
-        canvas.Clear()
-        draw_ui(canvas, game)
-        draw_separator_lines(canvas)
-        draw_round_state(canvas, game)
-        draw_round_result_overlay(canvas, game)
-        canvas = matrix.SwapOnVSync(canvas)
+        draw_table(fb, game, "round")
+        canvas = fb.present(matrix, canvas)
 
         if now >= game["round_over_until"]:
             # start next round unless someone reached 5 coins
@@ -676,11 +589,8 @@ while True:
         if now >= game["reveal_until"]:
             finish_round_and_score(game, now)
 
-        canvas.Clear()
-        draw_ui(canvas, game)
-        draw_separator_lines(canvas)
-        draw_round_state(canvas, game)  # dealer_reveal is True here
-        canvas = matrix.SwapOnVSync(canvas)
+        draw_table(fb, game, "play")  # dealer_reveal is True here
+        canvas = fb.present(matrix, canvas)
         continue
 
     # --- NORMAL ROUND ---
@@ -701,15 +611,9 @@ while True:
         start_reveal_phase(game, now)
 
     # draw current play frame
-    canvas.Clear()
-    draw_ui(canvas, game)
-    draw_separator_lines(canvas)
-    draw_round_state(canvas, game)
-    canvas = matrix.SwapOnVSync(canvas)
+    draw_table(fb, game, "play")
+    canvas = fb.present(matrix, canvas)
 
     # DRAW
-    canvas.Clear()
-    draw_ui(canvas, game)
-    draw_separator_lines(canvas)
-    draw_round_state(canvas, game)
-    canvas = matrix.SwapOnVSync(canvas)
\ No newline at end of file
+    draw_table(fb, game, "play")
+    canvas = fb.present(matrix, canvas)
\ No newline at end of file
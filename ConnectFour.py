@@ -1,9 +1,13 @@
-import time
 import math
 import pygame
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
+import numpy as np
 from rgbmatrix.graphics import Color
 from Utils.menu_utils import ExitOnBack
+from Utils.input_state import InputState
+from Utils.framebuffer import FrameBuffer, mask_from_rows
+from Utils.matrix_utils import create_matrix
+from Utils import connect4 as c4
+from Utils.game_loop import clock
 
 # -------------------------------------------------
 # CONNECT FOUR (128x64) - 2 PLAYER
@@ -12,6 +16,7 @@ from Utils.menu_utils import ExitOnBack
 # Controls (Xbox-style pygame mapping):
 # - Both players use LEFT STICK X to move the drop cursor
 # - A to drop a chip
+# - X (pad 1) toggles VS CPU (yellow is played by the AI); one pad = always VS CPU
 # - BACK on either controller -> return to menu (ExitOnBack)
 #
 # Chips:
@@ -26,16 +31,8 @@ from Utils.menu_utils import ExitOnBack
 # ----------------------------
 # MATRIX CONFIG
 # ----------------------------
-options = RGBMatrixOptions()
-options.hardware_mapping = "adafruit-hat"
-options.rows = 64
-options.cols = 64
-options.chain_length = 2
-options.brightness = 50
-options.gpio_slowdown = 4
-
-matrix = RGBMatrix(options=options)
-canvas = matrix.CreateFrameCanvas()
+matrix, canvas = create_matrix(brightness=50)
+fb = FrameBuffer(128, 64)  # kept between frames: the board is redrawn only when it changes
 
 # ----------------------------
 # PYGAME / CONTROLLERS
@@ -43,15 +40,21 @@ canvas = matrix.CreateFrameCanvas()
 pygame.init()
 pygame.joystick.init()
 
-if pygame.joystick.get_count() < 2:
-    print("Need two controllers", flush=True)
+if pygame.joystick.get_count() < 1:
+    print("Need a controller", flush=True)
     raise SystemExit(1)
 
+SOLO = pygame.joystick.get_count() < 2  # one pad: always play the CPU
+
 pad1 = pygame.joystick.Joystick(0)
-pad2 = pygame.joystick.Joystick.Joystick(1) if False else pygame.joystick.Joystick(1)
+pad2 = pad1 if SOLO else pygame.joystick.Joystick(1)
 pad1.init()
 pad2.init()
 
+# one event drain per frame; every pad read below comes from this snapshot
+inp = InputState([pad1] if SOLO else [pad1, pad2])
+pad1, pad2 = inp.pads[0], inp.pads[-1]
+
 # ----------------------------
 # CONSTANTS
 # ----------------------------
@@ -71,6 +74,7 @@ TOP_PAD = TOP_UI + (H - TOP_UI - GRID_H) // 2
 
 # Buttons / input
 A_BTN = 0
+X_BTN = 2
 BACK_BTN = 6
 AXIS_X = 0
 DEADZONE = 0.45
@@ -78,6 +82,11 @@ DEADZONE = 0.45
 MOVE_REPEAT_DELAY = 0.22
 MOVE_REPEAT_RATE = 0.10
 DROP_DEBOUNCE = 0.25
+MODE_DEBOUNCE = 0.5
+
+# CPU opponent
+CPU = 2                  # the AI plays yellow
+AI_MOVE_BUDGET = 0.6     # seconds of thinking per move (in the worker process)
 
 # Colors
 BG = Color(0, 0, 0)
@@ -94,32 +103,28 @@ BANNER_BG = Color(0, 0, 0)
 BANNER_TEXT = Color(255, 0, 255)
 
 ROUND_END_SHOW = 2.5
-DT_CAP = 0.05
 
 # ----------------------------
 # HELPERS
 # ----------------------------
 def set_px(cv, x, y, c):
-    if 0 <= x < W and 0 <= y < H:
-        cv.SetPixel(int(x), int(y), c.red, c.green, c.blue)
+    cv.set_px(x, y, c)
 
 def fill_rect(cv, x0, y0, w, h, c):
-    x1, y1 = x0 + w, y0 + h
-    if x1 <= 0 or y1 <= 0 or x0 >= W or y0 >= H:
-        return
-    x0 = max(0, int(x0)); y0 = max(0, int(y0))
-    x1 = min(W, int(x1)); y1 = min(H, int(y1))
-    for yy in range(y0, y1):
-        for xx in range(x0, x1):
-            cv.SetPixel(xx, yy, c.red, c.green, c.blue)
+    cv.fill_rect(x0, y0, w, h, c)  # clipped + vectorized in FrameBuffer
+
+_DISC_MASKS = {}
+
+def disc_mask(r):
+    # filled circle-ish, good enough for LED matrix (built once per radius)
+    m = _DISC_MASKS.get(r)
+    if m is None:
+        yy, xx = np.mgrid[-r:r + 1, -r:r + 1]
+        m = _DISC_MASKS[r] = (xx*xx + yy*yy) <= r*r
+    return m
 
 def draw_disc(cv, cx, cy, r, col):
-    # filled circle-ish, good enough for LED matrix
-    rr = r * r
-    for y in range(-r, r + 1):
-        for x in range(-r, r + 1):
-            if x*x + y*y <= rr:
-                set_px(cv, cx + x, cy + y, col)
+    cv.blit_mask(cx - r, cy - r, disc_mask(r), col)
 
 def board_to_px(col, row):
     # row 0 is bottom (Connect 4), but draw with bottom aligned
@@ -133,80 +138,67 @@ def within_board(col, row):
 # ----------------------------
 # GAME STATE
 # ----------------------------
-def new_game(now):
-    # board[row][col] where row 0 = bottom
-    board = [[0 for _ in range(COLS)] for _ in range(ROWS)]
+def new_game(now, vs_cpu=SOLO):
+    # board = [P1 stones, P2 stones] as bitboards (see Utils/connect4.py)
     return {
-        "board": board,
+        "board": [0, 0],
+        "vs_cpu": vs_cpu,
         "turn": P1,
         "cursor": COLS // 2,
         "round_over": False,
         "winner": 0,              # 0 none/draw, 1 p1, 2 p2, 3 draw
         "over_until": 0.0,
-        "last_t": now,
 
         # input repeat per player
         "axis_state": {0: 0, 1: 0},         # -1/0/+1
         "next_repeat": {0: 0.0, 1: 0.0},
         "last_drop": 0.0,
+        "last_mode": now,
     }
 
-game = new_game(time.time())
+game = new_game(clock())
+ai = None  # search worker process, only while CPU play is on
+
+def cpu_player():
+    # fork the worker the first time the CPU has to move, not at import
+    global ai
+    if ai is None:
+        ai = c4.AIPlayer(budget=AI_MOVE_BUDGET)
+    return ai
+
+def stop_cpu():
+    global ai
+    if ai is not None:
+        ai.close()
+        ai = None
 
 # ----------------------------
 # CONNECT FOUR LOGIC
 # ----------------------------
+def cell_at(board, col, row):
+    bit = c4.cell_bit(col, row)
+    if board[0] & bit:
+        return P1
+    if board[1] & bit:
+        return P2
+    return 0
+
 def get_drop_row(board, col):
-    for r in range(ROWS):
-        if board[r][col] == 0:
-            return r
-    return None
+    return c4.drop_row(board[0] | board[1], col)
 
 def drop_chip(board, col, player):
     r = get_drop_row(board, col)
     if r is None:
         return None
-    board[r][col] = player
+    board[player - 1] |= c4.cell_bit(col, r)
     return r
 
-def check_winner(board):
+def check_winner(board, player):
     # return 1/2 for winner, 3 for draw, 0 for none
-    def line4(a, b, c, d):
-        if a != 0 and a == b == c == d:
-            return a
-        return 0
-
-    # horizontal
-    for r in range(ROWS):
-        for c in range(COLS - 3):
-            w = line4(board[r][c], board[r][c+1], board[r][c+2], board[r][c+3])
-            if w:
-                return w
-
-    # vertical
-    for c in range(COLS):
-        for r in range(ROWS - 3):
-            w = line4(board[r][c], board[r+1][c], board[r+2][c], board[r+3][c])
-            if w:
-                return w
-
-    # diag up-right
-    for r in range(ROWS - 3):
-        for c in range(COLS - 3):
-            w = line4(board[r][c], board[r+1][c+1], board[r+2][c+2], board[r+3][c+3])
-            if w:
-                return w
-
-    # diag up-left
-    for r in range(ROWS - 3):
-        for c in range(3, COLS):
-            w = line4(board[r][c], board[r+1][c-1], board[r+2][c-2], board[r+3][c-3])
-            if w:
-                return w
-
-    # draw
-    full = all(board[ROWS-1][c] != 0 for c in range(COLS))
-    if full:
+    # only the player who just dropped can have made four
+    if c4.has_four(board[player - 1]):
+        return player
+    if c4.is_full(board[0] | board[1]):
         return 3
     return 0
 
@@ -214,13 +206,7 @@ def check_winner(board):
 # INPUT (TURN-BASED)
 # ----------------------------
 def read_axis_dir(pad):
-    try:
-        lx = pad.get_axis(AXIS_X)
-    except Exception:
-        return 0
-    if abs(lx) < DEADZONE:
-        return 0
-    return 1 if lx > 0 else -1
+    return pad.dir8(DEADZONE, AXIS_X)[0]
 
 def handle_movement(g, pads, now):
     # only current player can move cursor
@@ -248,22 +234,14 @@ def handle_movement(g, pads, now):
 def any_drop_pressed(pad):
     return bool(pad.get_button(A_BTN))
 
-def handle_drop(g, pads, now):
-    if now - g["last_drop"] < DROP_DEBOUNCE:
-        return
-
-    pad = pads[0] if g["turn"] == P1 else pads[1]
-    if not any_drop_pressed(pad):
-        return
-
-    col = g["cursor"]
+def play_turn(g, col, now):
     r = drop_chip(g["board"], col, g["turn"])
     if r is None:
         # column full -> ignore drop
         g["last_drop"] = now
         return
 
-    w = check_winner(g["board"])
+    w = check_winner(g["board"], g["turn"])
     if w != 0:
         g["round_over"] = True
         g["winner"] = w
@@ -273,6 +251,39 @@ def handle_drop(g, pads, now):
 
     g["last_drop"] = now
 
+def handle_drop(g, pads, now):
+    if now - g["last_drop"] < DROP_DEBOUNCE:
+        return
+
+    pad = pads[0] if g["turn"] == P1 else pads[1]
+    if not any_drop_pressed(pad):
+        return
+
+    play_turn(g, g["cursor"], now)
+
+def handle_cpu(g, now):
+    # ask once per turn, then just poll: the render loop never waits on the search
+    ai = cpu_player()
+    if not ai.pending:
+        board = g["board"]
+        mask = board[0] | board[1]
+        ai.request(board[CPU - 1], mask, mask.bit_count())
+        return
+
+    col = ai.poll()
+    if col is not None:
+        g["cursor"] = col
+        play_turn(g, col, now)
+
+def handle_mode(g, now):
+    # X on pad 1: toggle VS CPU and start a fresh round
+    global game
+    if SOLO or now - g["last_mode"] < MODE_DEBOUNCE or not pad1.get_button(X_BTN):
+        return
+    if g["vs_cpu"]:
+        stop_cpu()
+    game = new_game(now, vs_cpu=not g["vs_cpu"])
+
 # ----------------------------
 # DRAW
 # ----------------------------
@@ -292,7 +303,7 @@ def draw_board(cv, board):
             cy = y0 + CELL // 2
             draw_disc(cv, cx, cy, 3, HOLE)
 
-            v = board[r][c]
+            v = cell_at(board, c, r)
             if v == P1:
                 draw_disc(cv, cx, cy, 3, P1_C)
             elif v == P2:
@@ -304,18 +315,20 @@ def draw_cursor(cv, col, player, now):
     cx = x0 + CELL // 2
     y = TOP_PAD - 6
 
+    draw_disc(cv, cx, y, 2, cursor_color(player, now))
+
+def cursor_color(player, now):
     # pulse
     pulse = (math.sin(now * 6.0) + 1) / 2
     if player == P1:
         base = P1_C
     else:
         base = P2_C
-    colp = Color(
+    return (
         int(base.red * (0.5 + 0.5 * pulse)),
         int(base.green * (0.5 + 0.5 * pulse)),
         int(base.blue * (0.5 + 0.5 * pulse)),
     )
-    draw_disc(cv, cx, y, 2, colp)
 
 def draw_banner(cv, winner, now):
     # Solid rectangle banner with magenta-ish stripes, and color hint by winner
@@ -355,13 +368,7 @@ def draw_banner(cv, winner, now):
     def draw_text_5x7(cv, x, y, txt, color, scale=1):
         for ch in txt:
             g = FONT5x7.get(ch, FONT5x7[" "])
-            for gy in range(7):
-                row = g[gy]
-                for gx in range(5):
-                    if row[gx] == "1":
-                        for sy in range(scale):
-                            for sx in range(scale):
-                                set_px(cv, x + gx*scale + sx, y + gy*scale + sy, color)
+            cv.blit_mask(x, y, mask_from_rows(g), color, scale=scale)
             x += (6 * scale)  # 5px + 1px gap
 
     # center text
@@ -372,44 +379,59 @@ def draw_banner(cv, winner, now):
     y = y0 + (h - 7*scale) // 2
     draw_text_5x7(cv, x, y, txt, BANNER_TEXT, scale=scale)
 
+def draw_frame(fb, g, now):
+    """
+    Redraw the board (and banner) only after a drop or a new round; otherwise just
+    the cursor strip above it, whose pulse changes every frame.
+    """
+    banner = g["winner"] if g["round_over"] else None
+    board_changed = fb.changed("board", (tuple(g["board"]), banner))
+    if board_changed:
+        fb.clear()
+        draw_board(fb, g["board"])
+        if banner is not None:
+            draw_banner(fb, g["winner"], now)
+
+    if fb.changed("cursor", (g["cursor"], g["turn"], cursor_color(g["turn"], now))) or board_changed:
+        fill_rect(fb, LEFT_PAD, 0, GRID_W, TOP_PAD - 2, BG)
+        draw_cursor(fb, g["cursor"], g["turn"], now)
+
 # ----------------------------
 # MAIN LOOP
 # ----------------------------
 exit_mgr = ExitOnBack([pad1, pad2], back_btn=BACK_BTN, quit_only=False)
 pads = [pad1, pad2]
 
-while True:
-    pygame.event.pump()
-    now = time.time()
-
-    if exit_mgr.should_exit():
-        matrix.Clear()
-        exit_mgr.handle()
-
-    dt = now - game["last_t"]
-    game["last_t"] = now
-    if dt < 0:
-        dt = 0.0
-    if dt > DT_CAP:
-        dt = DT_CAP
-
-    if game["round_over"]:
-        canvas.Clear()
-        draw_board(canvas, game["board"])
-        draw_cursor(canvas, game["cursor"], game["turn"], now)
-        draw_banner(canvas, game["winner"], now)
-        canvas = matrix.SwapOnVSync(canvas)
-
-        if now >= game["over_until"]:
-            game = new_game(now)
-        continue
-
-    # update
-    handle_movement(game, pads, now)
-    handle_drop(game, pads, now)
-
-    # draw
-    canvas.Clear()
-    draw_board(canvas, game["board"])
-    draw_cursor(canvas, game["cursor"], game["turn"], now)
-    canvas = matrix.SwapOnVSync(canvas)
+try:
+    while True:
+        inp.poll()
+        now = clock()
+
+        if exit_mgr.should_exit():
+            matrix.Clear()
+            stop_cpu()  # handle() may exec the menu, which skips the finally below
+            exit_mgr.handle()
+
+        if game["round_over"]:
+            draw_frame(fb, game, now)
+            canvas = fb.present(matrix, canvas)
+
+            if now >= game["over_until"]:
+                if ai is not None:
+                    ai.cancel()
+                game = new_game(now, vs_cpu=game["vs_cpu"])
+            continue
+
+        # update
+        handle_mode(game, now)
+        if game["vs_cpu"] and game["turn"] == CPU:
+            handle_cpu(game, now)
+        else:
+            handle_movement(game, pads, now)
+            handle_drop(game, pads, now)
+
+        # draw
+        draw_frame(fb, game, now)
+        canvas = fb.present(matrix, canvas)
+finally:
+    stop_cpu()
@@ -1,10 +1,13 @@
 import pygame
-import time
 import math
 import random
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
 from rgbmatrix.graphics import Color
 from Utils.menu_utils import ExitOnBack
+from Utils.input_state import InputState
+from Utils.framebuffer import FrameBuffer
+from Utils.matrix_utils import create_matrix
+from Utils.particles import Particles
+from Utils.game_loop import FixedStep, clock
 
 # -------------------------------------------------
 # 1v1 CROSSY-ADVANCE (DUAL PANEL)
@@ -44,16 +47,12 @@ controllerB = pygame.joystick.Joystick(1)
 controllerA.init()
 controllerB.init()
 
-options = RGBMatrixOptions()
-options.hardware_mapping = "adafruit-hat"
-options.rows = 64
-options.cols = 64
-options.chain_length = 2
-options.brightness = 50
-options.gpio_slowdown = 4
+# one event drain per frame; every pad read below comes from this snapshot
+inp = InputState([controllerA, controllerB])
+controllerA, controllerB = inp.pads
 
-matrix = RGBMatrix(options=options)
-canvas = matrix.CreateFrameCanvas()
+matrix, canvas = create_matrix(brightness=50)
+fb = FrameBuffer(128, 64)  # draw here, push once per frame
 
 # -------------------------------------------------
 # CONSTANTS
@@ -96,9 +95,13 @@ SPEED_MAX = 12.0
 # results
 RESULT_SHOW_TIME = 4.0          # a bit longer looks nicer
 RESULT_ANIM_SPEED = 6.0         # blink speed
-RESULT_CONFETTI = 140           # how many sparkle pixels per frame
+RESULT_CONFETTI = 140           # confetti pieces per second on a win
+RESULT_STATIC = 1600            # faint static pixels per second (lose / draw)
 WIN_GLOW = 40                   # border glow pulse strength
 
+SIM_HZ = 60.0                   # fixed simulation steps per second
+MAX_CATCHUP_STEPS = 5           # per frame; beyond that the game really slows down
+
 # colors
 C_SCORE = Color(255, 0, 255)
 C_TIMER = Color(255, 255, 255)
@@ -125,22 +128,15 @@ OBSTACLE_COLORS = [
 # -------------------------------------------------
 
 def clear_panel(cv, x0):
-    for yy in range(PANEL_H):
-        for xx in range(x0, x0 + PANEL_W):
-            cv.SetPixel(xx, yy, 0, 0, 0)
+    cv.fill_rect(x0, 0, PANEL_W, PANEL_H, (0, 0, 0))
 
 def draw_hbar(cv, x0, y, filled_pixels, color):
     filled_pixels = max(0, min(PANEL_W, int(filled_pixels)))
-    for i in range(PANEL_W):
-        if i < filled_pixels:
-            cv.SetPixel(x0 + i, y, color.red, color.green, color.blue)
-        else:
-            cv.SetPixel(x0 + i, y, 0, 0, 0)
+    cv.hline(x0, y, PANEL_W, (0, 0, 0))
+    cv.hline(x0, y, filled_pixels, color)
 
 def fill_rect(cv, x0, y0, w, h, color):
-    for yy in range(y0, y0 + h):
-        for xx in range(x0, x0 + w):
-            cv.SetPixel(xx, yy, color.red, color.green, color.blue)
+    cv.fill_rect(x0, y0, w, h, color)
 
 def tile_x_to_px(x0, tile_x):
     return x0 + tile_x * TILE
@@ -149,38 +145,21 @@ def lane_to_py(lane_idx):
     return UI_H + lane_idx * LANE_H
 
 def draw_big_X(cv, x0, color):
-    for i in range(PANEL_W):
-        for t in (-1, 0, 1):
-            y1 = i + t
-            y2 = (PANEL_H - 1 - i) + t
-            if 0 <= y1 < PANEL_H:
-                cv.SetPixel(x0 + i, y1, color.red, color.green, color.blue)
-            if 0 <= y2 < PANEL_H:
-                cv.SetPixel(x0 + i, y2, color.red, color.green, color.blue)
+    # two 3px-thick diagonals; rows outside the panel are clipped by the framebuffer
+    for t in (-1, 0, 1):
+        cv.line(x0, t, x0 + PANEL_W - 1, PANEL_H - 1 + t, color)
+        cv.line(x0, PANEL_H - 1 + t, x0 + PANEL_W - 1, t, color)
 
 def draw_big_check(cv, x0, color):
-    for i in range(18):
-        px = 12 + i
-        py = 34 + i
-        for t in (-1, 0, 1):
-            yy = py + t
-            if 0 <= yy < PANEL_H:
-                cv.SetPixel(x0 + px, yy, color.red, color.green, color.blue)
-                cv.SetPixel(x0 + px + 1, yy, color.red, color.green, color.blue)
-    for i in range(30):
-        px = 30 + i
-        py = 52 - i
-        for t in (-1, 0, 1):
-            yy = py + t
-            if 0 <= yy < PANEL_H:
-                cv.SetPixel(x0 + px, yy, color.red, color.green, color.blue)
-                cv.SetPixel(x0 + px + 1, yy, color.red, color.green, color.blue)
+    # short stroke down-right, long stroke up-right (2px wide, 3px tall)
+    for t in (-1, 0, 1):
+        for w in (0, 1):
+            cv.line(x0 + 12 + w, 34 + t, x0 + 29 + w, 51 + t, color)
+            cv.line(x0 + 30 + w, 52 + t, x0 + 59 + w, 23 + t, color)
 
 def draw_draw_symbol(cv, x0, color):
     for y in (28, 36):
-        for x in range(14, 50):
-            for t in (0, 1):
-                cv.SetPixel(x0 + x, y + t, color.red, color.green, color.blue)
+        cv.fill_rect(x0 + 14, y, 36, 2, color)
 
 def draw_result_panel(cv, x0, result, blink_on):
     clear_panel(cv, x0)
@@ -198,33 +177,44 @@ def draw_result_panel(cv, x0, result, blink_on):
             draw_draw_symbol(cv, x0, C_DRAW)
         border = C_DRAW
 
-    for i in range(PANEL_W):
-        cv.SetPixel(x0 + i, 0, border.red, border.green, border.blue)
-        cv.SetPixel(x0 + i, PANEL_H - 1, border.red, border.green, border.blue)
-    for i in range(PANEL_H):
-        cv.SetPixel(x0 + 0, i, border.red, border.green, border.blue)
-        cv.SetPixel(x0 + PANEL_W - 1, i, border.red, border.green, border.blue)
+    cv.rect_outline(x0, 0, PANEL_W, PANEL_H, border)
 
 def draw_border(cv, x0, color):
-    for i in range(PANEL_W):
-        cv.SetPixel(x0 + i, 0, color.red, color.green, color.blue)
-        cv.SetPixel(x0 + i, PANEL_H - 1, color.red, color.green, color.blue)
-    for i in range(PANEL_H):
-        cv.SetPixel(x0 + 0, i, color.red, color.green, color.blue)
-        cv.SetPixel(x0 + PANEL_W - 1, i, color.red, color.green, color.blue)
+    cv.rect_outline(x0, 0, PANEL_W, PANEL_H, color)
 
 def draw_text_banner(cv, x0, y, w, h, color):
     # simple filled banner block (no font needed)
     fill_rect(cv, x0 + 6, y, w, h, color)
 
-def draw_confetti(cv, x0, seed):
-    # deterministic-ish sparkle so it doesn't look like random noise
-    r = random.Random(seed)
-    for _ in range(RESULT_CONFETTI):
-        x = r.randint(2, PANEL_W - 3)
-        y = r.randint(2, PANEL_H - 3)
-        c = random.choice(OBSTACLE_COLORS)
-        cv.SetPixel(x0 + x, y, c.red, c.green, c.blue)
+# result screen effects: one particle system per panel, kept inside its border
+sparkle = {
+    x0: Particles(512, gravity=10.0, box=(x0 + 2, 2, PANEL_W - 4, PANEL_H - 4))
+    for x0 in (P1_X0, P2_X0)
+}
+
+def emit_count(rate, dt):
+    # rate per second -> whole particles this frame (fractions carried by chance)
+    n = rate * dt
+    return int(n) + (random.random() < n - int(n))
+
+def update_sparkle(x0, result, dt):
+    p = sparkle[x0]
+    if result == "win":
+        # confetti drifting down from the top edge
+        p.emit(emit_count(RESULT_CONFETTI, dt), (x0 + 2, x0 + PANEL_W - 2), (2, 6),
+               speed=(4, 14), angle=(0.3, math.pi - 0.3), life=(1.0, 2.5), colors=OBSTACLE_COLORS)
+    elif result == "lose":
+        # faint "static" pixels
+        p.emit(emit_count(RESULT_STATIC, dt), (x0 + 2, x0 + PANEL_W - 2), (2, PANEL_H - 2),
+               life=0.05, colors=[(30, 0, 0)])
+    else:
+        # subtle confetti
+        p.emit(emit_count(RESULT_STATIC * 3 // 4, dt), (x0 + 2, x0 + PANEL_W - 2), (2, PANEL_H - 2),
+               life=0.05, colors=[(40, 40, 0)])
+    p.update(dt)
+
+def draw_confetti(cv, x0, fade=True):
+    sparkle[x0].draw(cv, fade)
 
 def draw_result_screen_pretty(cv, x0, result, score, blink_on, now, player_color):
     """
@@ -247,27 +237,19 @@ def draw_result_screen_pretty(cv, x0, result, score, blink_on, now, player_color
             min(255, player_color.blue + glow)
         )
         draw_border(cv, x0, base)
-        draw_confetti(cv, x0, int(now * 10) + x0)
+        draw_confetti(cv, x0)
 
     elif result == "lose":
         base = Color(180, 0, 0)
         draw_border(cv, x0, Color(120 + glow, 0, 0))
         # faint “static” pixels
-        r = random.Random(int(now * 20) + x0)
-        for _ in range(80):
-            x = r.randint(2, PANEL_W - 3)
-            y = r.randint(2, PANEL_H - 3)
-            cv.SetPixel(x0 + x, y, 30, 0, 0)
+        draw_confetti(cv, x0, fade=False)
 
     else:
         base = Color(220, 220, 0)
         draw_border(cv, x0, Color(200, 200, 0))
         # subtle confetti
-        r = random.Random(int(now * 10) + x0)
-        for _ in range(60):
-            x = r.randint(2, PANEL_W - 3)
-            y = r.randint(2, PANEL_H - 3)
-            cv.SetPixel(x0 + x, y, 40, 40, 0)
+        draw_confetti(cv, x0, fade=False)
 
     # show score bar on y=0 like in-game
     # draw_hbar(cv, x0, 0, min(PANEL_W, score), C_SCORE)
@@ -333,7 +315,9 @@ def init_world():
 # -------------------------------------------------
 
 def reset_game():
-    now = time.time()
+    now = clock()
+    for p in sparkle.values():
+        p.clear()
     return {
         "p1": {
             "x0": P1_X0,
@@ -357,7 +341,6 @@ def reset_game():
             "time_left": TIME_MAX,
             "out": False,
         },
-        "last_t": now,
         "show_result": False,
         "result_until": 0.0,
         "p1_result": "draw",
@@ -406,12 +389,7 @@ def handle_movement(player, now):
     if now - player["last_move"] < MOVE_DELAY:
         return
 
-    lx = player["ctrl"].get_axis(0)
-    dx = 0
-    if lx > DEADZONE:
-        dx = 1
-    elif lx < -DEADZONE:
-        dx = -1
+    dx, _ = player["ctrl"].dir8(DEADZONE)
 
     if dx != 0:
         player["tile_x"] = max(0, min(GRID_W_TILES - 1, player["tile_x"] + dx))
@@ -526,10 +504,29 @@ def draw_player_panel(cv, player):
 # MAIN LOOP
 # -------------------------------------------------
 exit_mgr = ExitOnBack([controllerA, controllerB], back_btn=BACK_BTN, quit_only=False)
+loop = FixedStep(SIM_HZ, MAX_CATCHUP_STEPS)
+
+def step_game(g, dt, now):
+    if g["show_result"]:
+        update_sparkle(P1_X0, g["p1_result"], dt)
+        update_sparkle(P2_X0, g["p2_result"], dt)
+        return
+
+    # update both players
+    update_player(g["p1"], dt, now)
+    update_player(g["p2"], dt, now)
+
+    # end round conditions (fix endless game + speed incentive)
+    if should_end_round():
+        p1r, p2r = compute_results()
+        g["p1_result"] = p1r
+        g["p2_result"] = p2r
+        g["show_result"] = True
+        g["result_until"] = now + RESULT_SHOW_TIME
 
 while True:
-    pygame.event.pump()
-    now = time.time()
+    inp.poll()
+    now = clock()
 
     # EXIT
     if exit_mgr.should_exit():
@@ -541,38 +538,24 @@ while True:
         game = reset_game()
         game["last_action"] = now
 
-    # delta time
-    dt = now - game["last_t"]
-    game["last_t"] = now
-    if dt < 0: dt = 0
-    if dt > 0.1: dt = 0.1
+    # fixed steps: a slow frame catches up instead of slowing the game down
+    for dt in loop.steps(now):
+        step_game(game, dt, loop.tick_t)
 
     # show result screen if active
     if game["show_result"]:
         blink_on = int(now * 2) % 2 == 0
-        draw_result_screen_pretty(canvas, P1_X0, game["p1_result"], game["p1"]["score"], blink_on, now, C_P1)
-        draw_result_screen_pretty(canvas, P2_X0, game["p2_result"], game["p2"]["score"], blink_on, now, C_P2)
+        draw_result_screen_pretty(fb, P1_X0, game["p1_result"], game["p1"]["score"], blink_on, now, C_P1)
+        draw_result_screen_pretty(fb, P2_X0, game["p2_result"], game["p2"]["score"], blink_on, now, C_P2)
 
         if now >= game["result_until"]:
             game = reset_game()
 
-        canvas = matrix.SwapOnVSync(canvas)
+        canvas = fb.present(matrix, canvas)
         continue
 
-    # update both players
-    update_player(game["p1"], dt, now)
-    update_player(game["p2"], dt, now)
-
-    # end round conditions (fix endless game + speed incentive)
-    if should_end_round():
-        p1r, p2r = compute_results()
-        game["p1_result"] = p1r
-        game["p2_result"] = p2r
-        game["show_result"] = True
-        game["result_until"] = now + RESULT_SHOW_TIME
-
     # draw
-    draw_player_panel(canvas, game["p1"])
-    draw_player_panel(canvas, game["p2"])
+    draw_player_panel(fb, game["p1"])
+    draw_player_panel(fb, game["p2"])
 
-    canvas = matrix.SwapOnVSync(canvas)
+    canvas = fb.present(matrix, canvas)
@@ -1,10 +1,12 @@
 import pygame
 import os
-import time
 import math
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
 from rgbmatrix.graphics import Color
 from Utils.menu_utils import ExitOnBack
+from Utils.input_state import InputState
+from Utils.matrix_utils import create_matrix
+from Utils.replay import Session
+from Utils.game_loop import FixedStep
 
 # -------------------------------------------------
 # 1v1 FIGHT GAME (DUAL PANEL AS ONE ARENA, 128x64)
@@ -26,19 +28,18 @@ pad2 = pygame.joystick.Joystick(1)
 pad1.init()
 pad2.init()
 
+# LED_RECORD / LED_REPLAY: pads become per-frame snapshots, time starts at 0
+rec = Session("FightGame", [pad1, pad2])
+pad1, pad2 = rec.pads
+
+# one event drain per frame; every pad read below comes from this snapshot
+inp = InputState([pad1, pad2])
+pad1, pad2 = inp.pads
+
 # ----------------------------
 # INIT (matrix)
 # ----------------------------
-options = RGBMatrixOptions()
-options.hardware_mapping = "adafruit-hat"
-options.rows = 64
-options.cols = 64
-options.chain_length = 2
-options.brightness = 50
-options.gpio_slowdown = 4
-
-matrix = RGBMatrix(options=options)
-canvas = matrix.CreateFrameCanvas()
+matrix, canvas = create_matrix(brightness=50)
 
 # ----------------------------
 # CONSTANTS
@@ -99,6 +100,10 @@ HEAVY_KICK_LEN = 18      # how far the leg reaches (pixels)
 HEAVY_KICK_RISE = 10     # how high it rises (pixels)
 HEAVY_KICK_THICK = 3     # thickness of the kick hitbox
 
+# loop
+SIM_HZ = 60.0            # fixed simulation steps per second
+MAX_CATCHUP_STEPS = 5    # per frame; beyond that the game really slows down
+
 
 # ----------------------------
 # HELPERS
@@ -160,10 +165,9 @@ def reset_round(now):
         "winner": 0,
         "over_until": 0.0,
         "last_reset_try": 0.0,
-        "last_t": now
     }
 
-game = reset_round(time.time())
+game = reset_round(rec.now)
 
 # ----------------------------
 # ATTACK LOGIC
@@ -188,7 +192,7 @@ def start_heavy(p, now):
     p["atk_has_hit"] = False
     p["atk_active_start"] = 0.0
 
-def attack_hitbox(p, now=None):
+def attack_hitbox(p, now):
     bx, by, bw, bh = get_body_rect(p)
 
     # LIGHT: same as before
@@ -201,10 +205,6 @@ def attack_hitbox(p, now=None):
         return hb_x, hb_y, hb_w, hb_h
 
     # HEAVY: diagonal-up kick (animated during active phase)
-    # We need 'now' to animate; if not provided, fall back to current time
-    if now is None:
-        now = time.time()
-
     # progress 0..1 over the active window
     if HEAVY_ACTIVE > 0:
         t = (now - p.get("atk_active_start", now)) / HEAVY_ACTIVE
@@ -276,10 +276,7 @@ def update_attack(p, other, now):
 # INPUT + PHYSICS
 # ----------------------------
 def read_axis(pad, axis):
-    v = pad.get_axis(axis)
-    if abs(v) < DEADZONE:
-        return 0.0
-    return v
+    return pad.axis(axis, DEADZONE)
 
 def update_player(p, other, dt, now):
     if p["hp"] <= 0:
@@ -301,14 +298,15 @@ def update_player(p, other, dt, now):
 
     p["vx"] = lx * speed
 
-    if p["pad"].get_button(X_BTN) and p["on_ground"] and (not p["crouch"]):
+    # down(): held, or tapped and released since the last frame
+    if p["pad"].down(X_BTN) and p["on_ground"] and (not p["crouch"]):
         p["vy"] = JUMP_VEL
         p["on_ground"] = False
 
     if p["atk_type"] is None and now >= p["atk_cooldown_until"] and (not p["block"]):
-        if p["pad"].get_button(A_BTN):
+        if p["pad"].down(A_BTN):
             start_light(p, now)
-        elif p["pad"].get_button(B_BTN):
+        elif p["pad"].down(B_BTN):
             start_heavy(p, now)
 
     p["x"] += p["vx"] * dt
@@ -358,11 +356,11 @@ def draw_hp_bars(cv, p1, p2):
 
     fill_rect(cv, 63, y0, 2, h, Color(40, 40, 40))
 
-def draw_player(cv, p):
+def draw_player(cv, p, now):
     x, y, w, h = get_body_rect(p)
 
     col = p["color"]
-    if time.time() < p["flash_until"]:
+    if now < p["flash_until"]:
         col = HIT_FLASH
 
     fill_rect(cv, x, y, w, h, col)
@@ -375,12 +373,12 @@ def draw_player(cv, p):
         fill_rect(cv, ox, oy, 1, oh, BLOCK_COLOR)
         fill_rect(cv, ox + ow - 1, oy, 1, oh, BLOCK_COLOR)
 
-def draw_attack(cv, p):
+def draw_attack(cv, p, now):
     if p["atk_type"] is None or p["atk_phase"] != "active":
         return
 
     if p["atk_type"] == "light":
-        hx, hy, hw, hh = attack_hitbox(p, time.time())
+        hx, hy, hw, hh = attack_hitbox(p, now)
         fill_rect(cv, hx, hy, hw, 2, Color(255, 255, 255))
         return
 
@@ -389,7 +387,7 @@ def draw_attack(cv, p):
     origin_x = bx + (bw if p["facing"] > 0 else 0)
     origin_y = by + bh - 4
 
-    hx, hy, hw, hh = attack_hitbox(p, time.time())
+    hx, hy, hw, hh = attack_hitbox(p, now)
     foot_x = hx + (0 if p["facing"] > 0 else hw)  # better endpoint for left-facing
     foot_y = hy
 
@@ -437,46 +435,44 @@ def draw_result_overlay(cv, winner, now):
 # ----------------------------
 # MAIN LOOP
 # ----------------------------
-now = time.time()
+now = rec.now
 last_both_b = 0.0
 exit_mgr = ExitOnBack([pad1, pad2], back_btn=BACK_BTN, quit_only=False)
+loop = FixedStep(SIM_HZ, MAX_CATCHUP_STEPS)
+loop.reset(rec.now)  # the session's frame clock (starts at 0 when recording)
 
 while True:
-    pygame.event.pump()
-    now = time.time()
+    now = rec.frame(check=(game["p1"]["x"], game["p1"]["hp"], game["p2"]["x"], game["p2"]["hp"]))
+    inp.poll()  # after rec.frame(): replayed pads are loaded there
 
     if exit_mgr.should_exit():
         matrix.Clear()
         exit_mgr.handle()
 
-    # dt
-    dt = now - game["last_t"]
-    game["last_t"] = now
-    if dt < 0:
-        dt = 0
-    if dt > 0.05:
-        dt = 0.05
-
     p1 = game["p1"]
     p2 = game["p2"]
 
-    if not game["round_over"]:
-        update_player(p1, p2, dt, now)
-        update_player(p2, p1, dt, now)
+    # fixed steps: a slow frame catches up instead of slowing the game down
+    for dt in loop.steps(now):
+        if game["round_over"]:
+            break
+        t = loop.tick_t
+        update_player(p1, p2, dt, t)
+        update_player(p2, p1, dt, t)
 
         w = compute_winner(p1, p2)
         if w != 0:
             game["round_over"] = True
             game["winner"] = w
-            game["over_until"] = now + 2.5
+            game["over_until"] = t + 2.5
 
     # DRAW
     canvas.Clear()
     draw_floor(canvas)
-    draw_attack(canvas, p1)
-    draw_attack(canvas, p2)
-    draw_player(canvas, p1)
-    draw_player(canvas, p2)
+    draw_attack(canvas, p1, now)
+    draw_attack(canvas, p2, now)
+    draw_player(canvas, p1, now)
+    draw_player(canvas, p2, now)
     draw_hp_bars(canvas, p1, p2)
 
     if game["round_over"]:
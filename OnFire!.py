@@ -1,11 +1,11 @@
 import pygame
 import os
-import time
 import math
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
 from rgbmatrix.graphics import Color
-from rgbmatrix import graphics
 from Utils.menu_utils import ExitOnBack
+from Utils.input_state import InputState
+from Utils.matrix_utils import create_matrix, load_font, draw_bdf_text
+from Utils.game_loop import FixedStep, clock
 
 # -------------------------------------------------
 # 1v1 HOT POTATO TAG (128x64, WRAP AROUND)
@@ -38,19 +38,14 @@ pad2 = pygame.joystick.Joystick(1)
 pad1.init()
 pad2.init()
 
+# one event drain per frame; every pad read below comes from this snapshot
+inp = InputState([pad1, pad2])
+pad1, pad2 = inp.pads
+
 # ----------------------------
 # MATRIX
 # ----------------------------
-options = RGBMatrixOptions()
-options.hardware_mapping = "adafruit-hat"
-options.rows = 64
-options.cols = 64
-options.chain_length = 2
-options.brightness = 50
-options.gpio_slowdown = 4
-
-matrix = RGBMatrix(options=options)
-canvas = matrix.CreateFrameCanvas()
+matrix, canvas = create_matrix(brightness=50)
 
 # ----------------------------
 # CONSTANTS
@@ -79,6 +74,10 @@ FIRE_TICK_SEC = 0.25
 SPEED_NORMAL = 18.0
 SPEED_FIRE = 26.0
 
+# Loop
+SIM_HZ = 60.0            # fixed simulation steps per second
+MAX_CATCHUP_STEPS = 5    # per frame; beyond that the game really slows down
+
 # Tag behavior
 STUN_TIME = 2.0
 TOUCH_DIST_CELLS = 2  # collision radius (in cells); increase if hard to tag
@@ -100,8 +99,7 @@ BANNER_BG = Color(0, 0, 0)
 BANNER_TEXT = Color(255, 0, 255)
 
 FONT_PATH = "/home/rpi-kristof/rpi-rgb-led-matrix/fonts/6x10.bdf"
-font = graphics.Font()
-font.LoadFont(FONT_PATH)
+font = load_font(FONT_PATH)
 
 # ----------------------------
 # HELPERS
@@ -124,7 +122,7 @@ def fill_rect(cv, x0, y0, w, h, c):
             cv.SetPixel(xx, yy, c.red, c.green, c.blue)
 
 def draw_text(cv, x, y, text, color):
-    graphics.DrawText(cv, font, x, y, color, text)
+    draw_bdf_text(cv, font, x, y, color, text)
 
 def text_width_px(text: str) -> int:
     return sum(font.CharacterWidth(ord(c)) for c in text)
@@ -135,8 +133,7 @@ def draw_center_text(cv, baseline_y, text, color):
     draw_text(cv, x, baseline_y, text, color)
 
 def read_axis(pad, axis):
-    v = pad.get_axis(axis)
-    return 0.0 if abs(v) < DEADZONE else v
+    return pad.axis(axis, DEADZONE)
 
 def cell_to_px(cx, cy):
     px = int(cx * CELL)
@@ -176,10 +173,9 @@ def reset_game(now):
         "round_over": False,
         "winner": 0,
         "over_until": 0.0,
-        "last_t": now,
     }
 
-game = reset_game(time.time())
+game = reset_game(clock())
 
 # ----------------------------
 # LOGIC
@@ -293,47 +289,21 @@ def draw_banner(cv, winner):
 # MAIN LOOP
 # ----------------------------
 exit_mgr = ExitOnBack([pad1, pad2], back_btn=BACK_BTN, quit_only=False)
+loop = FixedStep(SIM_HZ, MAX_CATCHUP_STEPS)
 
-while True:
-    pygame.event.pump()
-    now = time.time()
-
-    if exit_mgr.should_exit():
-        matrix.Clear()
-        exit_mgr.handle()
-
-    # dt
-    dt = now - game["last_t"]
-    game["last_t"] = now
-    if dt < 0:
-        dt = 0.0
-    if dt > 0.05:
-        dt = 0.05
-
-    if game["round_over"]:
-        canvas.Clear()
-        draw_ui(canvas, game)
-        draw_player(canvas, game["p1"], is_on_fire(game, 1), now)
-        draw_player(canvas, game["p2"], is_on_fire(game, 2), now)
-        draw_banner(canvas, game["winner"])
-        canvas = matrix.SwapOnVSync(canvas)
-
-        if now >= game["over_until"]:
-            game = reset_game(now)
-        continue
-
-    p1 = game["p1"]
-    p2 = game["p2"]
+def step_game(g, dt, now):
+    p1 = g["p1"]
+    p2 = g["p2"]
 
     # fire HP tick
-    update_fire_hp(game, now)
+    update_fire_hp(g, now)
 
     # movement (stunned players can't move)
     p1_stunned = now < p1["stun_until"]
     p2_stunned = now < p2["stun_until"]
 
-    p1_speed = SPEED_FIRE if is_on_fire(game, 1) else SPEED_NORMAL
-    p2_speed = SPEED_FIRE if is_on_fire(game, 2) else SPEED_NORMAL
+    p1_speed = SPEED_FIRE if is_on_fire(g, 1) else SPEED_NORMAL
+    p2_speed = SPEED_FIRE if is_on_fire(g, 2) else SPEED_NORMAL
 
     if not p1_stunned:
         move_player(p1, p1_speed, dt)
@@ -343,17 +313,43 @@ while True:
     # tag / transfer logic:
     # Only the fire player can transfer fire on touch (prevents weird double transfers).
     if players_touch(p1, p2):
-        if is_on_fire(game, 1) and not p2_stunned:
-            transfer_fire(game, now, p1, p2)
-        elif is_on_fire(game, 2) and not p1_stunned:
-            transfer_fire(game, now, p2, p1)
+        if is_on_fire(g, 1) and not p2_stunned:
+            transfer_fire(g, now, p1, p2)
+        elif is_on_fire(g, 2) and not p1_stunned:
+            transfer_fire(g, now, p2, p1)
 
     # win condition
-    check_round_end(game, now)
+    check_round_end(g, now)
+
+while True:
+    inp.poll()
+    now = clock()
+
+    if exit_mgr.should_exit():
+        matrix.Clear()
+        exit_mgr.handle()
+
+    # fixed steps: a slow frame catches up instead of slowing the game down
+    for dt in loop.steps(now):
+        if game["round_over"]:
+            break
+        step_game(game, dt, loop.tick_t)
+
+    if game["round_over"]:
+        canvas.Clear()
+        draw_ui(canvas, game)
+        draw_player(canvas, game["p1"], is_on_fire(game, 1), now)
+        draw_player(canvas, game["p2"], is_on_fire(game, 2), now)
+        draw_banner(canvas, game["winner"])
+        canvas = matrix.SwapOnVSync(canvas)
+
+        if now >= game["over_until"]:
+            game = reset_game(now)
+        continue
 
     # draw
     canvas.Clear()
     draw_ui(canvas, game)
-    draw_player(canvas, p1, is_on_fire(game, 1), now)
-    draw_player(canvas, p2, is_on_fire(game, 2), now)
+    draw_player(canvas, game["p1"], is_on_fire(game, 1), now)
+    draw_player(canvas, game["p2"], is_on_fire(game, 2), now)
     canvas = matrix.SwapOnVSync(canvas)
@@ -1,12 +1,15 @@
-import time
 import math
 import random
 from random import randint
 
 import pygame
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
 from rgbmatrix.graphics import Color
 from Utils.menu_utils import ExitOnBack
+from Utils.input_state import InputState
+from Utils.framebuffer import FrameBuffer
+from Utils.matrix_utils import create_matrix
+from Utils.led_text import draw_text_centered
+from Utils.game_loop import FixedStep, clock
 
 # -------------------------------------------------
 # CO-OP DINO RUN (128x64)
@@ -31,16 +34,8 @@ from Utils.menu_utils import ExitOnBack
 # ----------------------------
 # MATRIX CONFIG
 # ----------------------------
-options = RGBMatrixOptions()
-options.hardware_mapping = "adafruit-hat"
-options.rows = 64
-options.cols = 64
-options.chain_length = 2
-options.brightness = 50
-options.gpio_slowdown = 4
-
-matrix = RGBMatrix(options=options)
-canvas = matrix.CreateFrameCanvas()
+matrix, canvas = create_matrix(brightness=50)
+fb = FrameBuffer(128, 64)  # draw here, push once per frame
 
 # ----------------------------
 # PYGAME / CONTROLLERS
@@ -57,6 +52,10 @@ pad_spw = pygame.joystick.Joystick(1)   # Spawner
 pad_run.init()
 pad_spw.init()
 
+# one event drain per frame; every pad read below comes from this snapshot
+inp = InputState([pad_run, pad_spw])
+pad_run, pad_spw = inp.pads
+
 # ----------------------------
 # CONSTANTS
 # ----------------------------
@@ -118,65 +117,22 @@ SPAWN_COOLDOWN_MIN  = 0.6             # hard lower limit (tune)
 # Game over
 OVER_SHOW = 2.0
 
-DT_CAP = 0.05
-
-# ----------------------------
-# 3x5 DIGITS (score)
-# ----------------------------
-DIG3x5 = {
-    "0": ["111","101","101","101","111"],
-    "1": ["010","110","010","010","111"],
-    "2": ["111","001","111","100","111"],
-    "3": ["111","001","111","001","111"],
-    "4": ["101","101","111","001","001"],
-    "5": ["111","100","111","001","111"],
-    "6": ["111","100","111","101","111"],
-    "7": ["111","001","001","010","010"],
-    "8": ["111","101","111","101","111"],
-    "9": ["111","101","111","001","111"],
-}
+SIM_HZ = 60.0             # fixed simulation steps per second
+MAX_CATCHUP_STEPS = 5     # per frame; beyond that the game really slows down
 
 def set_px(cv, x, y, c):
-    if 0 <= x < W and 0 <= y < H:
-        cv.SetPixel(int(x), int(y), c.red, c.green, c.blue)
+    cv.set_px(x, y, c)
 
 def fill_rect(cv, x0, y0, w, h, c):
-    x1, y1 = x0 + w, y0 + h
-    if x1 <= 0 or y1 <= 0 or x0 >= W or y0 >= H:
-        return
-    x0 = max(0, int(x0)); y0 = max(0, int(y0))
-    x1 = min(W, int(x1)); y1 = min(H, int(y1))
-    for yy in range(y0, y1):
-        for xx in range(x0, x1):
-            cv.SetPixel(xx, yy, c.red, c.green, c.blue)
-
-def draw_digit3x5(cv, x, y, ch, color, scale=2):
-    glyph = DIG3x5.get(ch)
-    if not glyph:
-        return
-    for gy in range(5):
-        row = glyph[gy]
-        for gx in range(3):
-            if row[gx] == "1":
-                for sy in range(scale):
-                    for sx in range(scale):
-                        set_px(cv, x + gx*scale + sx, y + gy*scale + sy, color)
+    cv.fill_rect(x0, y0, w, h, c)  # clipped + vectorized in FrameBuffer
 
 def draw_score(cv, score):
-    s = str(max(0, int(score)))
-    scale = 2
-    digit_w = 3*scale
-    gap = 1*scale
-    total_w = len(s)*digit_w + (len(s)-1)*gap
-    x0 = (W - total_w) // 2
-    y0 = 1
-    for i, ch in enumerate(s):
-        draw_digit3x5(cv, x0 + i*(digit_w+gap), y0, ch, UI, scale=scale)
+    # score centered, one cached blit
+    draw_text_centered(cv, W // 2, 1, str(max(0, int(score))), UI, scale=2, gap=1)
 
 def draw_ui(cv, score):
     draw_score(cv, score)
-    for x in range(W):
-        set_px(cv, x, UI_H, SEP)
+    cv.hline(0, UI_H, W, SEP)
 
 def rects_overlap(ax, ay, aw, ah, bx, by, bw, bh):
     return not (ax + aw <= bx or bx + bw <= ax or ay + ah <= by or by + bh <= ay)
@@ -200,11 +156,9 @@ def reset_game(now):
 
         "hit": False,
         "hit_until": 0.0,
-
-        "last_t": now,
     }
 
-game = reset_game(time.time())
+game = reset_game(clock())
 
 def runner_rect(g):
     h = R_H_DUCK if g["duck"] else R_H_STAND
@@ -324,9 +278,7 @@ def spawn_cooldown(alive_time: float) -> float:
 # DRAW
 # ----------------------------
 def draw_ground(cv):
-    for x in range(W):
-        set_px(cv, x, GROUND_Y, GROUND_C)
-        set_px(cv, x, GROUND_Y + 1, GROUND_C)
+    cv.fill_rect(0, GROUND_Y, W, 2, GROUND_C)
 
 def draw_runner(cv, g, now):
     rx, ry, rw, rh = runner_rect(g)
@@ -350,46 +302,46 @@ def draw_game_over(cv):
 # MAIN LOOP
 # ----------------------------
 exit_mgr = ExitOnBack([pad_run, pad_spw], back_btn=BACK_BTN, quit_only=False)
+loop = FixedStep(SIM_HZ, MAX_CATCHUP_STEPS)
+
+def step_game(g, dt, now):
+    update_runner(g, dt, now)
+    update_spawner(g, now)
+    update_obstacles(g, dt, now)
+    check_collisions(g, now)
+    update_score(g, now)
 
 while True:
-    pygame.event.pump()
-    now = time.time()
+    inp.poll()
+    now = clock()
 
     if exit_mgr.should_exit():
         matrix.Clear()
         exit_mgr.handle()
 
-    dt = now - game["last_t"]
-    game["last_t"] = now
-    if dt < 0:
-        dt = 0.0
-    if dt > DT_CAP:
-        dt = DT_CAP
+    # fixed steps: a slow frame catches up instead of slowing the game down
+    for dt in loop.steps(now):
+        if game["hit"]:
+            break
+        step_game(game, dt, loop.tick_t)
 
     if game["hit"]:
-        canvas.Clear()
-        draw_ui(canvas, game["score"])
-        draw_ground(canvas)
-        draw_obstacles(canvas, game)
-        draw_runner(canvas, game, now)
-        draw_game_over(canvas)
-        canvas = matrix.SwapOnVSync(canvas)
+        fb.clear()
+        draw_ui(fb, game["score"])
+        draw_ground(fb)
+        draw_obstacles(fb, game)
+        draw_runner(fb, game, now)
+        draw_game_over(fb)
+        canvas = fb.present(matrix, canvas)
 
         if now >= game["hit_until"]:
             game = reset_game(now)
         continue
 
-    # update
-    update_runner(game, dt, now)
-    update_spawner(game, now)
-    update_obstacles(game, dt, now)
-    check_collisions(game, now)
-    update_score(game, now)
-
     # draw
-    canvas.Clear()
-    draw_ui(canvas, game["score"])
-    draw_ground(canvas)
-    draw_obstacles(canvas, game)
-    draw_runner(canvas, game, now)
-    canvas = matrix.SwapOnVSync(canvas)
+    fb.clear()
+    draw_ui(fb, game["score"])
+    draw_ground(fb)
+    draw_obstacles(fb, game)
+    draw_runner(fb, game, now)
+    canvas = fb.present(matrix, canvas)
@@ -1,10 +1,13 @@
 import pygame
-import time
 import math
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
 from rgbmatrix.graphics import Color
-from led_digits import DIGITS_8x8
+from Utils.led_text import draw_number
 from Utils.menu_utils import ExitOnBack
+from Utils.input_state import InputState
+from Utils.framebuffer import FrameBuffer
+from Utils.tiles import draw_tile
+from Utils.matrix_utils import create_matrix
+from Utils.game_loop import clock
 
 # -------------------------------------------------
 # 1v1 LANE SHOOTER – GAME MECHANICS
@@ -46,16 +49,12 @@ controllerB = pygame.joystick.Joystick(1)
 controllerA.init()
 controllerB.init()
 
-options = RGBMatrixOptions()
-options.hardware_mapping = 'adafruit-hat'
-options.rows = 64
-options.cols = 64
-options.chain_length = 2
-options.brightness = 50
-options.gpio_slowdown = 4
+# one event drain per frame; every pad read below comes from this snapshot
+inp = InputState([controllerA, controllerB])
+controllerA, controllerB = inp.pads
 
-matrix = RGBMatrix(options=options)
-canvas = matrix.CreateFrameCanvas()
+matrix, canvas = create_matrix(brightness=50)
+fb = FrameBuffer(128, 64)  # drawn with cached tile stamps, pushed once per frame
 
 # -------------------------------------------------
 # CONSTANTS
@@ -90,26 +89,15 @@ C_HIT = Color(255, 0, 0)       # red flash
 C_B1 = Color(255, 140, 0)      # orange
 C_B2 = Color(255, 255, 0)      # yellow
 
+# Small centered bullet mark inside a tile
+BULLET = [[1 if 3 <= x <= 4 and 3 <= y <= 4 else 0 for x in range(ICON_SIZE)] for y in range(ICON_SIZE)]
+
 # -------------------------------------------------
 # DRAWING HELPERS
 # -------------------------------------------------
 
 def clear_rect(cv, x0, y0, w, h):
-    for yy in range(y0, y0 + h):
-        for xx in range(x0, x0 + w):
-            cv.SetPixel(xx, yy, 0, 0, 0)
-
-def draw_icon_scaled(cv, pixel_x, pixel_y, icon, color, scale=1):
-    for y in range(8):
-        for x in range(8):
-            if icon[y][x] == 1:
-                for sy in range(scale):
-                    for sx in range(scale):
-                        cv.SetPixel(
-                            pixel_x + x * scale + sx,
-                            pixel_y + y * scale + sy,
-                            color.red, color.green, color.blue
-                        )
+    cv.fill_rect(x0, y0, w, h, (0, 0, 0))
 
 def clamp_0_99(n: int) -> int:
     n = int(n)
@@ -124,13 +112,7 @@ def draw_scoreboard_hp(cv, hp1, hp2):
     hp1 = clamp_0_99(hp1)
     hp2 = clamp_0_99(hp2)
 
-    p1_t = hp1 // 10
-    p1_o = hp1 % 10
-    p2_t = hp2 // 10
-    p2_o = hp2 % 10
-
     scale = 3
-    digit_w = 8 * scale   # 24
     digit_h = 8 * scale   # 24
 
     x = SCORE_X0 + 8
@@ -138,38 +120,32 @@ def draw_scoreboard_hp(cv, hp1, hp2):
     y2 = y1 + digit_h + 6
 
     # P1 (green)
-    draw_icon_scaled(cv, x, y1, DIGITS_8x8[p1_t], C_P1, scale)
-    draw_icon_scaled(cv, x + digit_w, y1, DIGITS_8x8[p1_o], C_P1, scale)
+    draw_number(cv, x, y1, hp1, C_P1, scale, digits=2, font="8x8")
 
     # P2 (blue)
-    draw_icon_scaled(cv, x, y2, DIGITS_8x8[p2_t], C_P2, scale)
-    draw_icon_scaled(cv, x + digit_w, y2, DIGITS_8x8[p2_o], C_P2, scale)
+    draw_number(cv, x, y2, hp2, C_P2, scale, digits=2, font="8x8")
 
 def tile_to_pixel(tx, ty):
     return GAME_X0 + tx * ICON_SIZE, ty * ICON_SIZE
 
 def draw_tile_solid(cv, tx, ty, color):
     px, py = tile_to_pixel(tx, ty)
-    for yy in range(ICON_SIZE):
-        for xx in range(ICON_SIZE):
-            cv.SetPixel(px + xx, py + yy, color.red, color.green, color.blue)
+    draw_tile(cv, px, py, color, size=ICON_SIZE)
 
 def draw_bullet(cv, tx, ty, color):
     """Small centered bullet mark inside a tile."""
     px, py = tile_to_pixel(tx, ty)
-    for yy in range(3, 5):
-        for xx in range(3, 5):
-            cv.SetPixel(px + xx, py + yy, color.red, color.green, color.blue)
+    draw_tile(cv, px, py, color, icon=BULLET)
 
 def draw_background(cv):
-    cv.Clear()  # black
+    cv.clear()  # black
 
 # -------------------------------------------------
 # GAME STATE
 # -------------------------------------------------
 
 def reset_game():
-    now = time.time()
+    now = clock()
     return {
         "p1_x": 2,
         "p2_x": 5,
@@ -208,12 +184,7 @@ def try_move_player(ctrl, x_key, last_move_key, now):
     if now - game[last_move_key] < MOVE_DELAY:
         return
 
-    lx = ctrl.get_axis(0)
-    dx = 0
-    if lx > DEADZONE:
-        dx = 1
-    elif lx < -DEADZONE:
-        dx = -1
+    dx, _ = ctrl.dir8(DEADZONE)
 
     if dx != 0:
         game[x_key] = max(0, min(7, game[x_key] + dx))
@@ -297,8 +268,8 @@ def check_game_over(now):
 exit_mgr = ExitOnBack([controllerA, controllerB], back_btn=BACK_BTN, quit_only=False)
 
 while True:
-    pygame.event.pump()
-    now = time.time()
+    inp.poll()
+    now = clock()
 
     # EXIT
     if exit_mgr.should_exit():
@@ -313,11 +284,11 @@ while True:
     # GAME OVER: keep showing, allow reset
     if game["over"]:
         # draw
-        draw_background(canvas)
+        draw_background(fb)
 
         # bullets (still show frozen state)
         for b in game["bullets"]:
-            draw_bullet(canvas, b["x"], b["y"], b["color"])
+            draw_bullet(fb, b["x"], b["y"], b["color"])
 
         # players (flash winner)
         blink = int(now * 3) % 2 == 0
@@ -335,11 +306,11 @@ while True:
         if game["winner"] == 2 and blink:
             p2_col = Color(255, 255, 255)
 
-        draw_tile_solid(canvas, game["p1_x"], game["p1_y"], p1_col)
-        draw_tile_solid(canvas, game["p2_x"], game["p2_y"], p2_col)
+        draw_tile_solid(fb, game["p1_x"], game["p1_y"], p1_col)
+        draw_tile_solid(fb, game["p2_x"], game["p2_y"], p2_col)
 
-        draw_scoreboard_hp(canvas, game["hp1"], game["hp2"])
-        canvas = matrix.SwapOnVSync(canvas)
+        draw_scoreboard_hp(fb, game["hp1"], game["hp2"])
+        canvas = fb.present(matrix, canvas)
         continue
 
     # -------------------------------------------------
@@ -367,11 +338,11 @@ while True:
     # -------------------------------------------------
     # DRAW
     # -------------------------------------------------
-    draw_background(canvas)
+    draw_background(fb)
 
     # bullets
     for b in game["bullets"]:
-        draw_bullet(canvas, b["x"], b["y"], b["color"])
+        draw_bullet(fb, b["x"], b["y"], b["color"])
 
     # players (flash red briefly when hit)
     p1_col = C_HIT if now < game["p1_flash_until"] else C_P1
@@ -385,10 +356,10 @@ while True:
     if p2_col == C_P2:
         p2_col = Color(0, 0, min(255, 255 - boost))
 
-    draw_tile_solid(canvas, game["p1_x"], game["p1_y"], p1_col)
-    draw_tile_solid(canvas, game["p2_x"], game["p2_y"], p2_col)
+    draw_tile_solid(fb, game["p1_x"], game["p1_y"], p1_col)
+    draw_tile_solid(fb, game["p2_x"], game["p2_y"], p2_col)
 
     # HP scoreboard on second panel
-    draw_scoreboard_hp(canvas, game["hp1"], game["hp2"])
+    draw_scoreboard_hp(fb, game["hp1"], game["hp2"])
 
-    canvas = matrix.SwapOnVSync(canvas)
+    canvas = fb.present(matrix, canvas)
@@ -1,11 +1,16 @@
 import pygame
 import os
-import time
 import random
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
+from collections import deque
+import numpy as np
 from rgbmatrix.graphics import Color
-from rgbmatrix import graphics
 from Utils.menu_utils import ExitOnBack
+from Utils.input_state import InputState
+from Utils.framebuffer import FrameBuffer, rgb
+from Utils.free_cells import FreeCells
+from Utils.matrix_utils import create_matrix, load_font
+from Utils.game_loop import FixedStep, clock
+from Utils import latency
 
 # -------------------------------------------------
 # 1v1 SNAKE (SHARED ARENA 128x64)
@@ -38,19 +43,16 @@ pad2 = pygame.joystick.Joystick.Joystick(1) if False else pygame.joystick.Joysti
 pad1.init()
 pad2.init()
 
+# one event drain per frame; every pad read below comes from this snapshot
+inp = InputState([pad1, pad2])
+pad1, pad2 = inp.pads
+
 # ----------------------------
 # MATRIX
 # ----------------------------
-options = RGBMatrixOptions()
-options.hardware_mapping = "adafruit-hat"
-options.rows = 64
-options.cols = 64
-options.chain_length = 2
-options.brightness = 50
-options.gpio_slowdown = 4
-
-matrix = RGBMatrix(options=options)
-canvas = matrix.CreateFrameCanvas()
+matrix, canvas = create_matrix(brightness=50)
+latency.defer("stick")  # LED_LATENCY: a stick move counts from the tick that turns the snake
+fb = FrameBuffer(128, 64)  # draw here, push once per frame
 
 # ----------------------------
 # CONSTANTS
@@ -67,6 +69,7 @@ AXIS_X = 0
 AXIS_Y = 1
 
 TICK_RATE = 10.0  # moves per second (increase for faster game)
+MAX_CATCHUP_STEPS = 3  # moves per frame after a stall; the rest is dropped
 INPUT_BUFFER_TIME = 0.12  # seconds: allow quick direction changes between ticks
 
 APPLE_COUNT = 2  # keep it simple; set >1 if you want more apples
@@ -92,8 +95,7 @@ DRAW_C = Color(220, 220, 0)
 BANNER_BG = Color(0, 0, 0)  # dark solid background
 BANNER_TEXT = Color(255, 0, 0)  # magenta text
 FONT_PATH = "/home/rpi-kristof/rpi-rgb-led-matrix/fonts/6x10.bdf"
-font = graphics.Font()
-font.LoadFont(FONT_PATH)
+font = load_font(FONT_PATH)
 
 BACK_BTN = 6
 
@@ -113,45 +115,27 @@ def clamp(v, lo, hi):
 
 
 def fill_rect(cv, x0, y0, w, h, c):
-    x1 = x0 + w
-    y1 = y0 + h
-    if x1 <= 0 or y1 <= 0 or x0 >= W or y0 >= H:
-        return
-    x0 = max(0, x0);
-    y0 = max(0, y0)
-    x1 = min(W, x1);
-    y1 = min(H, y1)
-    for yy in range(y0, y1):
-        for xx in range(x0, x1):
-            cv.SetPixel(xx, yy, c.red, c.green, c.blue)
+    cv.fill_rect(x0, y0, w, h, c)  # clipped + vectorized in FrameBuffer
 
 
 def draw_cell(cv, gx, gy, c):
     fill_rect(cv, gx * CELL, gy * CELL, CELL, CELL, c)
 
 
-def read_axis_dir(pad):
-    ax = pad.get_axis(AXIS_X)
-    ay = pad.get_axis(AXIS_Y)
+def read_axis_dir(pad, t):
+    # stick as it was at time t (exact with LED_INPUT_HZ, else the frame's snapshot);
+    # prefer the stronger axis; (dx, dy) matches UP / DOWN / LEFT / RIGHT
+    d = pad.dir4_at(t, DEADZONE, AXIS_X, AXIS_Y)
+    return d if d != (0, 0) else None
 
-    # prefer the stronger axis
-    if abs(ax) < DEADZONE and abs(ay) < DEADZONE:
-        return None
 
-    if abs(ax) > abs(ay):
-        return RIGHT if ax > 0 else LEFT
-    else:
-        return DOWN if ay > 0 else UP
-
-
-def spawn_apples(occupied_set, count):
+def spawn_apples(free, count):
+    """free: FreeCells of cells with no snake and no apple; picked cells are taken out."""
     apples = []
-    tries = 0
-    while len(apples) < count and tries < 2000:
-        tries += 1
-        pos = (random.randrange(GRID_W), random.randrange(GRID_H))
-        if pos in occupied_set or pos in apples:
-            continue
+    while len(apples) < count:
+        pos = free.pop()
+        if pos is None:
+            break
         apples.append(pos)
     return apples
 
@@ -181,15 +165,16 @@ def draw_result_banner(cv, winner, font):
     x = (W - text_w) // 2
     y = y0 + banner_h - 4  # baseline tweak for 6x10 font
 
-    graphics.DrawText(cv, font, x, y, BANNER_TEXT, text)
+    cv.text(font, x, y, BANNER_TEXT, text)
 
 
 # ----------------------------
 # GAME STATE
 # ----------------------------
-def new_snake(start_cells, direction, head_c, body_c, pad):
+def new_snake(start_cells, direction, head_c, body_c, pad, sid):
     return {
-        "cells": list(start_cells),  # list of (x,y), head is [0]
+        "id": sid,  # value this snake writes into the occupancy grid
+        "cells": deque(start_cells),  # (x,y) cells, head is [0]
         "dir": direction,
         "next_dir": direction,  # buffered direction
         "head_c": head_c,
@@ -206,25 +191,32 @@ def reset_game(now):
     p1_start = [(6, GRID_H // 2), (5, GRID_H // 2), (4, GRID_H // 2)]
     p2_start = [(GRID_W - 7, GRID_H // 2), (GRID_W - 6, GRID_H // 2), (GRID_W - 5, GRID_H // 2)]
 
-    s1 = new_snake(p1_start, RIGHT, P1_HEAD, P1_BODY, pad1)
-    s2 = new_snake(p2_start, LEFT, P2_HEAD, P2_BODY, pad2)
+    s1 = new_snake(p1_start, RIGHT, P1_HEAD, P1_BODY, pad1, 1)
+    s2 = new_snake(p2_start, LEFT, P2_HEAD, P2_BODY, pad2, 2)
 
-    occ = set(s1["cells"]) | set(s2["cells"])
-    apples = spawn_apples(occ, APPLE_COUNT)
+    # occupancy grid: 0 = empty, else the id of the snake on that cell.
+    # Kept in sync on every head push / tail pop, so lookups are O(1).
+    occ = np.zeros((GRID_H, GRID_W), dtype=np.uint8)
+    free = FreeCells.grid(GRID_W, GRID_H)
+    for s in (s1, s2):
+        for (x, y) in s["cells"]:
+            occ[y, x] = s["id"]
+            free.discard((x, y))
+    apples = spawn_apples(free, APPLE_COUNT)
 
     return {
         "s1": s1,
         "s2": s2,
+        "occ": occ,
+        "free": free,  # cells with no snake and no apple (apple spawning)
         "apples": apples,
-        "next_tick": now + (1.0 / TICK_RATE),
         "round_over": False,
         "winner": 0,  # 0 draw/none, 1 p1, 2 p2
         "over_until": 0.0,
-        "last_t": now,
     }
 
 
-game = reset_game(time.time())
+game = reset_game(clock())
 
 
 # ----------------------------
@@ -234,7 +226,7 @@ def buffer_direction(snake, now):
     if not snake["alive"]:
         return
 
-    d = read_axis_dir(snake["pad"])
+    d = read_axis_dir(snake["pad"], now)
     if d is None:
         return
 
@@ -249,11 +241,13 @@ def buffer_direction(snake, now):
 # ----------------------------
 # SIMULATION STEP
 # ----------------------------
-def step_snake(snake, other, apples):
+def step_snake(snake, occ, free, apples):
     if not snake["alive"]:
         return
 
     # apply buffered direction
+    if snake["next_dir"] != snake["dir"]:
+        latency.apply("stick")
     snake["dir"] = snake["next_dir"]
 
     hx, hy = snake["cells"][0]
@@ -264,18 +258,15 @@ def step_snake(snake, other, apples):
     ny = (hy + dy) % GRID_H
     new_head = (nx, ny)
 
-    # self collision (into own body)
-    if new_head in snake["cells"]:
-        snake["alive"] = False
-        return
-
-    # collision into other snake body (including head)
-    if new_head in other["cells"]:
+    # collision into own body or the other snake (including its head)
+    if occ[ny, nx]:
         snake["alive"] = False
         return
 
     # move head
-    snake["cells"].insert(0, new_head)
+    snake["cells"].appendleft(new_head)
+    occ[ny, nx] = snake["id"]
+    free.discard(new_head)
 
     # apple eat
     if new_head in apples:
@@ -286,7 +277,9 @@ def step_snake(snake, other, apples):
         if snake["grow"] > 0:
             snake["grow"] -= 1
         else:
-            snake["cells"].pop()
+            tail = snake["cells"].pop()
+            occ[tail[1], tail[0]] = 0
+            free.add(tail)
 
 
 def resolve_head_to_head(s1, s2):
@@ -299,9 +292,8 @@ def resolve_head_to_head(s1, s2):
 
 def update_apples(game):
     # keep apples at APPLE_COUNT
-    occ = set(game["s1"]["cells"]) | set(game["s2"]["cells"])
     while len(game["apples"]) < APPLE_COUNT:
-        add = spawn_apples(occ | set(game["apples"]), 1)
+        add = spawn_apples(game["free"], 1)
         if not add:
             break
         game["apples"].extend(add)
@@ -320,15 +312,25 @@ def compute_winner(s1, s2):
 # ----------------------------
 # DRAW
 # ----------------------------
-def draw_snake(cv, snake):
-    if not snake["alive"]:
-        # draw its body dimmed
-        for i, (x, y) in enumerate(snake["cells"]):
-            draw_cell(cv, x, y, DEAD_C)
-        return
-
-    for i, (x, y) in enumerate(snake["cells"]):
-        draw_cell(cv, x, y, snake["head_c"] if i == 0 else snake["body_c"])
+def draw_snakes(cv, game):
+    """Bodies straight from the occupancy grid (cost doesn't grow with length), then heads."""
+    s1 = game["s1"]; s2 = game["s2"]
+    occ = game["occ"]
+
+    # dead snakes draw their body dimmed
+    lut = np.zeros((3, 3), dtype=np.uint8)
+    lut[1] = rgb(s1["body_c"] if s1["alive"] else DEAD_C)
+    lut[2] = rgb(s2["body_c"] if s2["alive"] else DEAD_C)
+    img = lut[occ]
+    mask = occ > 0
+    if CELL > 1:
+        img = img.repeat(CELL, axis=0).repeat(CELL, axis=1)
+        mask = mask.repeat(CELL, axis=0).repeat(CELL, axis=1)
+    cv.blit(0, 0, img, mask)
+
+    for s in (s1, s2):
+        x, y = s["cells"][0]
+        draw_cell(cv, x, y, s["head_c"] if s["alive"] else DEAD_C)
 
 
 def draw_apples(cv, apples):
@@ -340,10 +342,11 @@ def draw_apples(cv, apples):
 # MAIN LOOP
 # ----------------------------
 exit_mgr = ExitOnBack([pad1, pad2], back_btn=BACK_BTN, quit_only=False)
+loop = FixedStep(TICK_RATE, MAX_CATCHUP_STEPS)
 
 while True:
-    pygame.event.pump()
-    now = time.time()
+    inp.poll()
+    now = clock()
 
     if exit_mgr.should_exit():
         matrix.Clear()
@@ -351,36 +354,33 @@ while True:
 
     # round over screen
     if game["round_over"]:
-        canvas.Clear()
+        fb.clear()
 
         # keep showing the last state dimly
-        draw_apples(canvas, game["apples"])
-        draw_snake(canvas, game["s1"])
-        draw_snake(canvas, game["s2"])
+        draw_apples(fb, game["apples"])
+        draw_snakes(fb, game)
 
         # overlay banner
-        draw_result_banner(canvas, game["winner"], font)
+        draw_result_banner(fb, game["winner"], font)
 
-        canvas = matrix.SwapOnVSync(canvas)
+        canvas = fb.present(matrix, canvas)
 
         if now >= game["over_until"]:
             game = reset_game(now)
+            loop.reset(now)  # first move one full tick after the new round starts
         continue
 
-    # input buffering (can change direction between ticks)
-    buffer_direction(game["s1"], now)
-    buffer_direction(game["s2"], now)
-
-    # tick-based movement
-    if now >= game["next_tick"]:
-        game["next_tick"] += (1.0 / TICK_RATE)
-
-        # step both snakes (order matters a bit; resolve head-to-head afterwards)
+    # tick-based movement (fixed steps; catches up after a slow frame)
+    for _ in loop.steps(now):
+        # input as it was when this tick was due
         s1 = game["s1"]
         s2 = game["s2"]
+        buffer_direction(s1, loop.tick_t)
+        buffer_direction(s2, loop.tick_t)
 
-        step_snake(s1, s2, game["apples"])
-        step_snake(s2, s1, game["apples"])
+        # step both snakes (order matters a bit; resolve head-to-head afterwards)
+        step_snake(s1, game["occ"], game["free"], game["apples"])
+        step_snake(s2, game["occ"], game["free"], game["apples"])
         resolve_head_to_head(s1, s2)
 
         update_apples(game)
@@ -390,10 +390,14 @@ while True:
             game["round_over"] = True
             game["winner"] = w
             game["over_until"] = now + ROUND_END_SHOW
+            break
+
+    # input buffering (can change direction between ticks)
+    buffer_direction(game["s1"], now)
+    buffer_direction(game["s2"], now)
 
     # draw
-    canvas.Clear()
-    draw_apples(canvas, game["apples"])
-    draw_snake(canvas, game["s1"])
-    draw_snake(canvas, game["s2"])
-    canvas = matrix.SwapOnVSync(canvas)
+    fb.clear()
+    draw_apples(fb, game["apples"])
+    draw_snakes(fb, game)
+    canvas = fb.present(matrix, canvas)
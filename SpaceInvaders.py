@@ -1,10 +1,14 @@
-import time
 import math
-import random
 import pygame
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
 from rgbmatrix.graphics import Color
 from Utils.menu_utils import ExitOnBack
+from Utils.input_state import InputState
+from Utils.framebuffer import FrameBuffer
+from Utils.matrix_utils import create_matrix
+from Utils.led_text import draw_text_centered
+from Utils.game_loop import FixedStep
+from Utils.profiler import Profiler
+from Utils.replay import Session, rng
 
 
 # -------------------------------------------------
@@ -35,16 +39,8 @@ from Utils.menu_utils import ExitOnBack
 # ----------------------------
 # MATRIX CONFIG
 # ----------------------------
-options = RGBMatrixOptions()
-options.hardware_mapping = "adafruit-hat"
-options.rows = 64
-options.cols = 64
-options.chain_length = 2
-options.brightness = 50
-options.gpio_slowdown = 4
-
-matrix = RGBMatrix(options=options)
-canvas = matrix.CreateFrameCanvas()
+matrix, canvas = create_matrix(brightness=50)
+fb = FrameBuffer(128, 64)  # draw here, push once per frame
 
 # ----------------------------
 # PYGAME / CONTROLLERS
@@ -61,6 +57,14 @@ pad2 = pygame.joystick.Joystick(1)
 pad1.init()
 pad2.init()
 
+# LED_RECORD / LED_REPLAY: pads become per-frame snapshots, time starts at 0
+rec = Session("SpaceInvaders", [pad1, pad2])
+pad1, pad2 = rec.pads
+
+# one event drain per frame; every pad read below comes from this snapshot
+inp = InputState([pad1, pad2])
+pad1, pad2 = inp.pads
+
 # ----------------------------
 # CONSTANTS
 # ----------------------------
@@ -129,68 +133,77 @@ SCORE_KILL_YELLOW = 15
 ROUND_BONUS_BASE = 50           # + round_idx*something
 ROUND_BONUS_STEP = 25
 
-TICK_DT_CAP = 0.05
-
-# ----------------------------
-# 3x5 DIGIT FONT FOR SCORE
-# ----------------------------
-DIG3x5 = {
-    "0": ["111","101","101","101","111"],
-    "1": ["010","110","010","010","111"],
-    "2": ["111","001","111","100","111"],
-    "3": ["111","001","111","001","111"],
-    "4": ["101","101","111","001","001"],
-    "5": ["111","100","111","001","111"],
-    "6": ["111","100","111","101","111"],
-    "7": ["111","001","001","010","010"],
-    "8": ["111","101","111","101","111"],
-    "9": ["111","101","111","001","111"],
-}
-
-def set_px(cv, x, y, c):
-    if 0 <= x < W and 0 <= y < H:
-        cv.SetPixel(x, y, c.red, c.green, c.blue)
+SIM_HZ = 60.0             # fixed simulation steps per second
+MAX_CATCHUP_STEPS = 5     # per frame; beyond that the game really slows down
 
 def fill_rect(cv, x0, y0, w, h, c):
-    x1, y1 = x0 + w, y0 + h
-    if x1 <= 0 or y1 <= 0 or x0 >= W or y0 >= H:
-        return
-    x0 = max(0, x0); y0 = max(0, y0)
-    x1 = min(W, x1); y1 = min(H, y1)
-    for yy in range(y0, y1):
-        for xx in range(x0, x1):
-            cv.SetPixel(xx, yy, c.red, c.green, c.blue)
-
-def draw_digit3x5(cv, x, y, ch, color, scale=2):
-    glyph = DIG3x5.get(ch)
-    if not glyph:
-        return
-    for gy in range(5):
-        row = glyph[gy]
-        for gx in range(3):
-            if row[gx] == "1":
-                for sy in range(scale):
-                    for sx in range(scale):
-                        set_px(cv, x + gx*scale + sx, y + gy*scale + sy, color)
+    cv.fill_rect(x0, y0, w, h, c)  # clipped + vectorized in FrameBuffer
 
 def draw_score(cv, score):
-    # score centered
-    s = str(max(0, int(score)))
-    scale = 2
-    digit_w = 3*scale
-    gap = 1*scale
-    total_w = len(s)*digit_w + (len(s)-1)*gap
-    x0 = (W - total_w) // 2
-    y0 = 1
-    for i, ch in enumerate(s):
-        draw_digit3x5(cv, x0 + i*(digit_w+gap), y0, ch, UI_TEXT, scale=scale)
-
-    for x in range(W):
-        set_px(cv, x, UI_H - 1, SEP)
+    # score centered, one cached blit
+    draw_text_centered(cv, W // 2, 1, str(max(0, int(score))), UI_TEXT, scale=2, gap=1)
+
+    cv.hline(0, UI_H - 1, W, SEP)
 
 def rects_overlap(ax, ay, aw, ah, bx, by, bw, bh):
     return not (ax + aw <= bx or bx + bw <= ax or ay + ah <= by or by + bh <= ay)
 
+# ----------------------------
+# SPATIAL HASH (enemies)
+# ----------------------------
+def rect_cells(x, y, w, h):
+    """Grid cells (ENEMY_CELL-sized buckets) touched by an int rect."""
+    cx0 = x // ENEMY_CELL; cx1 = (x + w - 1) // ENEMY_CELL
+    cy0 = y // ENEMY_CELL; cy1 = (y + h - 1) // ENEMY_CELL
+    return tuple((cx, cy) for cy in range(cy0, cy1 + 1) for cx in range(cx0, cx1 + 1))
+
+class EnemyGrid:
+    """
+    Uniform grid of living enemies keyed on ENEMY_CELL buckets.
+    An enemy (4x3) sits in at most 4 cells; it is only re-bucketed when the
+    formation moves it across a cell edge, and dropped when it dies.
+    """
+
+    def __init__(self, enemies):
+        self.cells = {}  # (cx, cy) -> list of enemies
+        for i, e in enumerate(enemies):
+            e["i"] = i  # spawn order, so hits resolve like the old linear scan
+            e["cells"] = ()
+            if e["alive"]:
+                self.move(e)
+
+    def _add(self, e, cells):
+        for k in cells:
+            self.cells.setdefault(k, []).append(e)
+        e["cells"] = cells
+
+    def remove(self, e):
+        for k in e["cells"]:
+            bucket = self.cells.get(k)
+            if bucket is not None:
+                bucket.remove(e)
+                if not bucket:
+                    del self.cells[k]
+        e["cells"] = ()
+
+    def move(self, e):
+        """Call after e["x"]/e["y"] changed."""
+        cells = rect_cells(int(e["x"]), int(e["y"]), ENEMY_W, ENEMY_H)
+        if cells != e["cells"]:
+            self.remove(e)
+            self._add(e, cells)
+
+    def hit(self, x, y, w, h):
+        """First (spawn-order) living enemy overlapping the int rect, or None."""
+        best = None
+        for k in rect_cells(x, y, w, h):
+            for e in self.cells.get(k, ()):
+                if best is not None and e["i"] >= best["i"]:
+                    continue
+                if rects_overlap(x, y, w, h, int(e["x"]), int(e["y"]), ENEMY_W, ENEMY_H):
+                    best = e
+        return best
+
 # ----------------------------
 # WAVES (PATTERNS)
 # 1 = spawn enemy (type assigned by round)
@@ -380,10 +393,12 @@ def new_player(x, color, bullet_color, pad):
     }
 
 def reset_game(now):
+    enemies = spawn_wave(0)
     return {
         "score": 0,
         "round_idx": 0,
-        "enemies": spawn_wave(0),
+        "enemies": enemies,
+        "grid": EnemyGrid(enemies),
         "enemy_dir": 1,
         "enemy_bullets": [],
 
@@ -392,18 +407,15 @@ def reset_game(now):
 
         "game_over": False,
         "game_over_until": 0.0,
-        "last_t": now,
     }
 
-game = reset_game(time.time())
+game = reset_game(rec.now)
 
 # ----------------------------
 # LOGIC
 # ----------------------------
 def move_player(p, dt):
-    lx = p["pad"].get_axis(AXIS_X)
-    if abs(lx) < DEADZONE:
-        lx = 0.0
+    lx = p["pad"].axis(AXIS_X, DEADZONE)
     speed = 60.0
     p["x"] += lx * speed * dt
     p["x"] = max(0, min(W - SHIP_W, p["x"]))
@@ -421,7 +433,7 @@ def try_fire(p, now):
         p["bullets"].append({"x": float(bx), "y": float(by)})
         p["cooldown_until"] = now + FIRE_COOLDOWN
 
-def update_player_bullets(p, enemies, dt):
+def update_player_bullets(p, grid, dt, now):
     if not p["bullets"]:
         return 0
 
@@ -433,20 +445,15 @@ def update_player_bullets(p, enemies, dt):
         if b["y"] < PLAY_Y0:
             continue
 
-        hit_enemy = None
-        for e in enemies:
-            if not e["alive"]:
-                continue
-            if rects_overlap(int(b["x"]), int(b["y"]), BULLET_W, BULLET_H,
-                             int(e["x"]), int(e["y"]), ENEMY_W, ENEMY_H):
-                hit_enemy = e
-                break
+        # only enemies in the bullet's own cells are tested
+        hit_enemy = grid.hit(int(b["x"]), int(b["y"]), BULLET_W, BULLET_H)
 
         if hit_enemy:
-            hit_enemy["flash_until"] = time.time() + ENEMY_HIT_FLASH_TIME
+            hit_enemy["flash_until"] = now + ENEMY_HIT_FLASH_TIME
             hit_enemy["hp"] -= 1
             if hit_enemy["hp"] <= 0:
                 hit_enemy["alive"] = False
+                grid.remove(hit_enemy)
                 gained += hit_enemy["score_kill"]
         else:
             alive_bullets.append(b)
@@ -462,9 +469,11 @@ def update_enemies(game, dt):
         game["round_idx"] += 1
         game["score"] += ROUND_BONUS_BASE + game["round_idx"] * ROUND_BONUS_STEP
         game["enemies"] = spawn_wave(game["round_idx"])
+        game["grid"] = EnemyGrid(game["enemies"])
         game["enemy_bullets"].clear()
         return
 
+    grid = game["grid"]
     minx, _, maxx, _ = b
     dx = game["enemy_dir"] * ENEMY_SPEED_X * dt
 
@@ -473,15 +482,18 @@ def update_enemies(game, dt):
         for e in enemies:
             if e["alive"]:
                 e["y"] += ENEMY_STEP_DOWN
+                grid.move(e)
     elif minx + dx <= ENEMY_EDGE_PAD:
         game["enemy_dir"] = 1
         for e in enemies:
             if e["alive"]:
                 e["y"] += ENEMY_STEP_DOWN
+                grid.move(e)
     else:
         for e in enemies:
             if e["alive"]:
                 e["x"] += dx
+                grid.move(e)  # no-op unless it crossed a cell edge
 
 def maybe_enemy_fire(game, dt):
     living = [e for e in game["enemies"] if e["alive"]]
@@ -489,13 +501,13 @@ def maybe_enemy_fire(game, dt):
         return
 
     # pick a random enemy; its type modifies fire chance
-    e = random.choice(living)
+    e = rng.choice(living)
 
     # scale chance by dt & by fire multiplier
     base = ENEMY_FIRE_CHANCE * e["fire_mult"]
     chance = 1.0 - pow((1.0 - base), dt * 60.0)
 
-    if random.random() < chance:
+    if rng.random() < chance:
         bx = int(e["x"] + ENEMY_W // 2)
         by = int(e["y"] + ENEMY_H + 1)
         game["enemy_bullets"].append({
@@ -545,6 +557,8 @@ def check_player_hits(game, now):
     for b in game["enemy_bullets"]:
         bx, by = int(b["x"]), int(b["y"])
         bw, bh = 1, 2
+        if by + bh <= SHIP_Y or by >= SHIP_Y + SHIP_H:
+            continue  # not in the ship row: no player to test
 
         for p in (p1, p2):
             if not p["alive"]:
@@ -637,32 +651,11 @@ def draw_game_over(cv, score):
 # MAIN LOOP
 # ----------------------------
 exit_mgr = ExitOnBack([pad1, pad2], back_btn=BACK_BTN, quit_only=False)
+loop = FixedStep(SIM_HZ, MAX_CATCHUP_STEPS)
+loop.reset(rec.now)
+prof = Profiler("SpaceInvaders", pads=[pad1, pad2])  # LB+RB+START: frame-time overlay
 
-while True:
-    pygame.event.pump()
-    now = time.time()
-
-    if exit_mgr.should_exit():
-        matrix.Clear()
-        exit_mgr.handle()
-
-    dt = now - game["last_t"]
-    game["last_t"] = now
-    if dt < 0:
-        dt = 0.0
-    if dt > TICK_DT_CAP:
-        dt = TICK_DT_CAP
-
-    # game over check
-    check_game_over(game, now)
-    if game["game_over"]:
-        canvas.Clear()
-        draw_game_over(canvas, game["score"])
-        canvas = matrix.SwapOnVSync(canvas)
-        if now >= game["game_over_until"]:
-            game = reset_game(now)
-        continue
-
+def step_game(game, dt, now):
     p1 = game["p1"]; p2 = game["p2"]
 
     # respawn handling (only while teammate alive)
@@ -683,25 +676,57 @@ while True:
     update_enemy_bullets(game, dt)
 
     # player bullets -> enemies
-    game["score"] += update_player_bullets(p1, game["enemies"], dt)
-    game["score"] += update_player_bullets(p2, game["enemies"], dt)
+    game["score"] += update_player_bullets(p1, game["grid"], dt, now)
+    game["score"] += update_player_bullets(p2, game["grid"], dt, now)
 
     # enemy bullets -> players
     check_player_hits(game, now)
 
+while True:
+    prof.begin()
+    now = rec.frame(check=(game["score"], game["p1"]["x"], game["p2"]["x"], len(game["enemy_bullets"])))
+    inp.poll()  # after rec.frame(): replayed pads are loaded there
+
+    if exit_mgr.should_exit():
+        matrix.Clear()
+        exit_mgr.handle()
+    prof.mark("input")
+
+    # fixed steps: a slow frame catches up instead of slowing the game down
+    for dt in loop.steps(now):
+        # game over check
+        check_game_over(game, loop.tick_t)
+        if game["game_over"]:
+            break
+        step_game(game, dt, loop.tick_t)
+    prof.mark("update")
+
+    if game["game_over"]:
+        fb.clear()
+        draw_game_over(fb, game["score"])
+        canvas = fb.present(matrix, canvas)
+        if now >= game["game_over_until"]:
+            game = reset_game(now)
+        continue
+
+    p1 = game["p1"]; p2 = game["p2"]
+
     # DRAW
-    canvas.Clear()
+    fb.clear()
 
-    draw_score(canvas, game["score"])
-    draw_lives(canvas, p1, 2)          # left lives
-    draw_lives(canvas, p2, W - 2 - (START_LIVES*4))  # right lives
+    draw_score(fb, game["score"])
+    draw_lives(fb, p1, 2)          # left lives
+    draw_lives(fb, p2, W - 2 - (START_LIVES*4))  # right lives
 
-    draw_enemies(canvas, game["enemies"], now)
-    draw_ship(canvas, p1, now)
-    draw_ship(canvas, p2, now)
+    draw_enemies(fb, game["enemies"], now)
+    draw_ship(fb, p1, now)
+    draw_ship(fb, p2, now)
 
-    draw_bullets(canvas, p1["bullets"], p1["bcolor"])
-    draw_bullets(canvas, p2["bullets"], p2["bcolor"])
-    draw_enemy_bullets(canvas, game["enemy_bullets"])
+    draw_bullets(fb, p1["bullets"], p1["bcolor"])
+    draw_bullets(fb, p2["bullets"], p2["bcolor"])
+    draw_enemy_bullets(fb, game["enemy_bullets"])
 
-    canvas = matrix.SwapOnVSync(canvas)
\ No newline at end of file
+    prof.overlay(fb)
+    prof.mark("draw")
+    canvas = fb.present(matrix, canvas)
+    prof.mark("swap")
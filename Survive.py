@@ -1,10 +1,14 @@
-import time
 import math
 import random
 import pygame
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
+import numpy as np
 from rgbmatrix.graphics import Color
 from Utils.menu_utils import ExitOnBack
+from Utils.input_state import InputState
+from Utils.framebuffer import FrameBuffer
+from Utils.matrix_utils import create_matrix
+from Utils.led_text import draw_text_centered
+from Utils.game_loop import FixedStep, clock
 
 # -------------------------------------------------
 # CO-OP "PILOT + GUNNER" SURVIVAL (128x64, 2 panels)
@@ -30,16 +34,8 @@ from Utils.menu_utils import ExitOnBack
 # ----------------------------
 # MATRIX CONFIG
 # ----------------------------
-options = RGBMatrixOptions()
-options.hardware_mapping = "adafruit-hat"
-options.rows = 64
-options.cols = 64
-options.chain_length = 2
-options.brightness = 50
-options.gpio_slowdown = 4
-
-matrix = RGBMatrix(options=options)
-canvas = matrix.CreateFrameCanvas()
+matrix, canvas = create_matrix(brightness=50)
+fb = FrameBuffer(128, 64)  # draw here, push once per frame
 
 # ----------------------------
 # PYGAME / CONTROLLERS
@@ -56,6 +52,10 @@ pad_fire = pygame.joystick.Joystick(1)  # Gunner
 pad_move.init()
 pad_fire.init()
 
+# one event drain per frame; every pad read below comes from this snapshot
+inp = InputState([pad_move, pad_fire])
+pad_move, pad_fire = inp.pads
+
 # ----------------------------
 # CONSTANTS
 # ----------------------------
@@ -95,6 +95,7 @@ MAX_BULLETS = 6
 AIM_MIN_MAG = 0.35
 
 # Enemies
+E_CAP = 512            # enemy slots (spawns pause while full)
 E_SIZE = 4
 E_SPEED_BASE = 9.0
 E_SPAWN_BASE = 1       # seconds between spawns at start
@@ -103,60 +104,18 @@ E_SPAWN_DECAY = 0.025    # spawn gets faster over time
 E_SPEED_RAMP = 1      # speed increases over time
 E_FLASH_TIME = 0.08
 
-DT_CAP = 0.05
-
-# ----------------------------
-# 3x5 DIGITS
-# ----------------------------
-DIG3x5 = {
-    "0": ["111","101","101","101","111"],
-    "1": ["010","110","010","010","111"],
-    "2": ["111","001","111","100","111"],
-    "3": ["111","001","111","001","111"],
-    "4": ["101","101","111","001","001"],
-    "5": ["111","100","111","001","111"],
-    "6": ["111","100","111","101","111"],
-    "7": ["111","001","001","010","010"],
-    "8": ["111","101","111","101","111"],
-    "9": ["111","101","111","001","111"],
-}
+SIM_HZ = 60.0             # fixed simulation steps per second
+MAX_CATCHUP_STEPS = 5     # per frame; beyond that the game really slows down
 
 def set_px(cv, x, y, c):
-    if 0 <= x < W and 0 <= y < H:
-        cv.SetPixel(int(x), int(y), c.red, c.green, c.blue)
+    cv.set_px(x, y, c)
 
 def fill_rect(cv, x0, y0, w, h, c):
-    x1, y1 = x0 + w, y0 + h
-    if x1 <= 0 or y1 <= 0 or x0 >= W or y0 >= H:
-        return
-    x0 = max(0, int(x0)); y0 = max(0, int(y0))
-    x1 = min(W, int(x1)); y1 = min(H, int(y1))
-    for yy in range(y0, y1):
-        for xx in range(x0, x1):
-            cv.SetPixel(xx, yy, c.red, c.green, c.blue)
-
-def draw_digit3x5(cv, x, y, ch, color, scale=2):
-    glyph = DIG3x5.get(ch)
-    if not glyph:
-        return
-    for gy in range(5):
-        row = glyph[gy]
-        for gx in range(3):
-            if row[gx] == "1":
-                for sy in range(scale):
-                    for sx in range(scale):
-                        set_px(cv, x + gx*scale + sx, y + gy*scale + sy, color)
+    cv.fill_rect(x0, y0, w, h, c)  # clipped + vectorized in FrameBuffer
 
 def draw_score(cv, score):
-    s = str(max(0, int(score)))
-    scale = 2
-    digit_w = 3*scale
-    gap = 1*scale
-    total_w = len(s)*digit_w + (len(s)-1)*gap
-    x0 = (W - total_w) // 2
-    y0 = 1
-    for i, ch in enumerate(s):
-        draw_digit3x5(cv, x0 + i*(digit_w+gap), y0, ch, UI, scale=scale)
+    # score centered, one cached blit
+    draw_text_centered(cv, W // 2, 1, str(max(0, int(score))), UI, scale=2, gap=1)
 
 def draw_hp_bar(cv, hp):
     # 40px bar at top-left
@@ -168,12 +127,8 @@ def draw_hp_bar(cv, hp):
     fill_rect(cv, x0, y0, w, 1, SEP)
     fill_rect(cv, x0, y0 + h - 1, w, 1, SEP)
 
-def rects_overlap(ax, ay, aw, ah, bx, by, bw, bh):
-    return not (ax + aw <= bx or bx + bw <= ax or ay + ah <= by or by + bh <= ay)
-
 def read_axis(pad, axis):
-    v = pad.get_axis(axis)
-    return 0.0 if abs(v) < DEADZONE else v
+    return pad.axis(axis, DEADZONE)
 
 def norm(x, y):
     m = math.hypot(x, y)
@@ -181,6 +136,50 @@ def norm(x, y):
         return 0.0, 0.0, 0.0
     return x/m, y/m, m
 
+# ----------------------------
+# ENTITY STORE (struct of arrays)
+# ----------------------------
+class Pool:
+    """
+    Fixed-capacity entities as parallel NumPy arrays (one per field) plus an
+    alive mask and a free-list of slots. Nothing grows during play.
+    """
+
+    def __init__(self, capacity, fields):
+        self.capacity = int(capacity)
+        self.fields = fields
+        for f in fields:
+            setattr(self, f, np.zeros(self.capacity, dtype=np.float64))
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        self.free = list(range(self.capacity - 1, -1, -1))  # pop() hands out low slots first
+
+    def __len__(self):
+        return self.capacity - len(self.free)
+
+    def add(self, **values):
+        """Claim a slot; returns its index or -1 when full."""
+        if not self.free:
+            return -1
+        i = self.free.pop()
+        for f in self.fields:
+            getattr(self, f)[i] = values.get(f, 0.0)
+        self.alive[i] = True
+        return i
+
+    def kill(self, idx):
+        """Free slot(s); idx: int or int array."""
+        for i in np.atleast_1d(idx):
+            i = int(i)
+            if self.alive[i]:
+                self.alive[i] = False
+                self.free.append(i)
+
+    def live(self):
+        return np.flatnonzero(self.alive)
+
+# 4x4 enemy footprint as pixel offsets (drawn for all enemies in one points() call)
+E_DX, E_DY = [a.ravel() for a in np.meshgrid(np.arange(E_SIZE), np.arange(E_SIZE))]
+
 # ----------------------------
 # GAME STATE
 # ----------------------------
@@ -199,7 +198,7 @@ def spawn_enemy():
     else:  # right
         x = float(W - E_SIZE)
         y = random.uniform(PLAY_Y0, H - E_SIZE)
-    return {"x": x, "y": y, "flash_until": 0.0}
+    return x, y
 
 def reset_game(now):
     return {
@@ -211,21 +210,20 @@ def reset_game(now):
         "aimx": 1.0,
         "aimy": 0.0,
 
-        "bullets": [],   # {x,y,vx,vy}
+        "bullets": Pool(MAX_BULLETS, ("x", "y", "vx", "vy")),
         "cd_until": 0.0,
 
-        "enemies": [],
+        "enemies": Pool(E_CAP, ("x", "y", "flash_until")),
         "next_spawn": now + 0.5,
 
         "score": 0,
         "t0": now,
-        "last_t": now,
 
         "game_over": False,
         "over_until": 0.0,
     }
 
-game = reset_game(time.time())
+game = reset_game(clock())
 
 # ----------------------------
 # DRAW
@@ -247,20 +245,28 @@ def draw_aim(cv, g):
         set_px(cv, x, y, AIM_COL)
 
 def draw_bullets(cv, bullets):
-    for b in bullets:
-        set_px(cv, b["x"], b["y"], BUL_COL)
-        set_px(cv, b["x"], b["y"]+1, BUL_COL)
+    i = bullets.live()
+    if not len(i):
+        return
+    xs = bullets.x[i].astype(np.int32)
+    ys = bullets.y[i].astype(np.int32)
+    cv.points(np.concatenate((xs, xs)), np.concatenate((ys, ys + 1)), BUL_COL)
 
 def draw_enemies(cv, enemies, now):
-    for e in enemies:
-        col = E_HIT_FLASH if now < e["flash_until"] else E_COL
-        fill_rect(cv, int(e["x"]), int(e["y"]), E_SIZE, E_SIZE, col)
+    i = enemies.live()
+    if not len(i):
+        return
+    xs = enemies.x[i].astype(np.int32)[:, None] + E_DX[None, :]
+    ys = enemies.y[i].astype(np.int32)[:, None] + E_DY[None, :]
+    flash = np.repeat(now < enemies.flash_until[i], len(E_DX))
+    cols = np.where(flash[:, None], (E_HIT_FLASH.red, E_HIT_FLASH.green, E_HIT_FLASH.blue),
+                    (E_COL.red, E_COL.green, E_COL.blue)).astype(np.uint8)
+    cv.points(xs, ys, cols)
 
 def draw_ui(cv, g):
     draw_hp_bar(cv, g["hp"])
     draw_score(cv, g["score"])
-    for x in range(W):
-        set_px(cv, x, UI_H-1, SEP)
+    cv.hline(0, UI_H-1, W, SEP)
 
 def draw_game_over(cv, g, now):
     # solid banner with magenta score
@@ -308,30 +314,27 @@ def try_fire(g, now):
 
     cx = g["px"] + P_SIZE/2
     cy = g["py"] + P_SIZE/2
-    g["bullets"].append({
-        "x": cx,
-        "y": cy,
-        "vx": ax * BUL_SPEED,
-        "vy": ay * BUL_SPEED,
-    })
+    g["bullets"].add(x=cx, y=cy, vx=ax * BUL_SPEED, vy=ay * BUL_SPEED)
     g["cd_until"] = now + FIRE_COOLDOWN
 
 def update_bullets(g, dt):
-    alive = []
-    for b in g["bullets"]:
-        b["x"] += b["vx"] * dt
-        b["y"] += b["vy"] * dt
-        if b["x"] < 0 or b["x"] >= W or b["y"] < PLAY_Y0 or b["y"] >= H:
-            continue
-        alive.append(b)
-    g["bullets"] = alive
+    b = g["bullets"]
+    i = b.live()
+    if not len(i):
+        return
+    b.x[i] += b.vx[i] * dt
+    b.y[i] += b.vy[i] * dt
+    x = b.x[i]; y = b.y[i]
+    out = (x < 0) | (x >= W) | (y < PLAY_Y0) | (y >= H)
+    b.kill(i[out])
 
 def spawn_enemies(g, now):
     # difficulty ramps with survival time
     alive_time = now - g["t0"]
     spawn_gap = max(E_SPAWN_MIN, E_SPAWN_BASE - alive_time * E_SPAWN_DECAY)
     if now >= g["next_spawn"]:
-        g["enemies"].append(spawn_enemy())
+        x, y = spawn_enemy()
+        g["enemies"].add(x=x, y=y)  # no-op while all E_CAP slots are busy
         g["next_spawn"] = now + spawn_gap
 
 def update_enemies(g, dt, now):
@@ -340,53 +343,66 @@ def update_enemies(g, dt, now):
     alive_time = now - g["t0"]
     spd = E_SPEED_BASE + alive_time * E_SPEED_RAMP
 
-    for e in g["enemies"]:
-        ex = e["x"] + E_SIZE/2
-        ey = e["y"] + E_SIZE/2
-        dx = px - ex
-        dy = py - ey
-        nx, ny, m = norm(dx, dy)
-        e["x"] += nx * spd * dt
-        e["y"] += ny * spd * dt
+    e = g["enemies"]
+    i = e.live()
+    if not len(i):
+        return
+    # chase: unit vector to the player for every enemy at once (norm() per row)
+    dx = px - (e.x[i] + E_SIZE/2)
+    dy = py - (e.y[i] + E_SIZE/2)
+    m = np.hypot(dx, dy)
+    step = np.where(m > 1e-6, spd * dt / np.maximum(m, 1e-6), 0.0)
+    e.x[i] += dx * step
+    e.y[i] += dy * step
 
 def bullets_hit_enemies(g, now):
-    if not g["bullets"] or not g["enemies"]:
+    b = g["bullets"]; e = g["enemies"]
+    bi = b.live(); ei = e.live()
+    if not len(bi) or not len(ei):
         return
-    new_b = []
-    for b in g["bullets"]:
-        hit = False
-        for e in g["enemies"]:
-            if rects_overlap(int(b["x"]), int(b["y"]), 1, 1,
-                             int(e["x"]), int(e["y"]), E_SIZE, E_SIZE):
-                e["flash_until"] = now + E_FLASH_TIME
-                e["dead"] = True
-                hit = True
-                g["score"] += 5
-                break
-        if not hit:
-            new_b.append(b)
-
-    g["bullets"] = new_b
-    g["enemies"] = [e for e in g["enemies"] if not e.get("dead")]
+
+    # bullets (1x1) vs enemies (E_SIZE box) on int coords: len(bi) x len(ei) mask
+    bx = b.x[bi].astype(np.int32)[:, None]
+    by = b.y[bi].astype(np.int32)[:, None]
+    ex = e.x[ei].astype(np.int32)[None, :]
+    ey = e.y[ei].astype(np.int32)[None, :]
+    hits = (bx >= ex) & (bx < ex + E_SIZE) & (by >= ey) & (by < ey + E_SIZE)
+
+    hit_b = hits.any(axis=1)
+    if not hit_b.any():
+        return
+    first = ei[hits[hit_b].argmax(axis=1)]  # each bullet takes its first overlapping enemy
+    e.flash_until[first] = now + E_FLASH_TIME
+    g["score"] += 5 * int(hit_b.sum())
+    b.kill(bi[hit_b])
+    e.kill(np.unique(first))
 
 def enemies_hit_player(g, now):
     if now < g["hurt_until"]:
         return
+    e = g["enemies"]
+    i = e.live()
+    if not len(i):
+        return
     px, py = int(g["px"]), int(g["py"])
-    for e in g["enemies"]:
-        if rects_overlap(int(e["x"]), int(e["y"]), E_SIZE, E_SIZE,
-                         px, py, P_SIZE, P_SIZE):
-            g["hp"] -= 1
-            g["hurt_until"] = now + HURT_COOLDOWN
-            # small knockback: push away from enemy
-            dx = (g["px"] + P_SIZE/2) - (e["x"] + E_SIZE/2)
-            dy = (g["py"] + P_SIZE/2) - (e["y"] + E_SIZE/2)
-            nx, ny, _ = norm(dx, dy)
-            g["px"] += nx * 6
-            g["py"] += ny * 6
-            g["px"] = max(0.0, min(W - P_SIZE, g["px"]))
-            g["py"] = max(float(PLAY_Y0), min(float(H - P_SIZE), g["py"]))
-            break
+    ex = e.x[i].astype(np.int32)
+    ey = e.y[i].astype(np.int32)
+    touching = np.flatnonzero((ex < px + P_SIZE) & (px < ex + E_SIZE) &
+                              (ey < py + P_SIZE) & (py < ey + E_SIZE))
+    if not len(touching):
+        return
+
+    k = i[touching[0]]
+    g["hp"] -= 1
+    g["hurt_until"] = now + HURT_COOLDOWN
+    # small knockback: push away from enemy
+    dx = (g["px"] + P_SIZE/2) - (e.x[k] + E_SIZE/2)
+    dy = (g["py"] + P_SIZE/2) - (e.y[k] + E_SIZE/2)
+    nx, ny, _ = norm(dx, dy)
+    g["px"] += nx * 6
+    g["py"] += ny * 6
+    g["px"] = max(0.0, min(W - P_SIZE, g["px"]))
+    g["py"] = max(float(PLAY_Y0), min(float(H - P_SIZE), g["py"]))
 
 def check_game_over(g, now):
     if g["hp"] <= 0 and not g["game_over"]:
@@ -397,49 +413,50 @@ def check_game_over(g, now):
 # MAIN LOOP
 # ----------------------------
 exit_mgr = ExitOnBack([pad_move, pad_fire], back_btn=BACK_BTN, quit_only=False)
+loop = FixedStep(SIM_HZ, MAX_CATCHUP_STEPS)
+
+def step_game(g, dt, now):
+    # update controls
+    update_player(g, dt)
+    update_aim(g)
+    try_fire(g, now)
+
+    # update world
+    update_bullets(g, dt)
+    spawn_enemies(g, now)
+    update_enemies(g, dt, now)
+    bullets_hit_enemies(g, now)
+    enemies_hit_player(g, now)
+    check_game_over(g, now)
 
 while True:
-    pygame.event.pump()
-    now = time.time()
+    inp.poll()
+    now = clock()
 
     if exit_mgr.should_exit():
         matrix.Clear()
         exit_mgr.handle()
 
-    dt = now - game["last_t"]
-    game["last_t"] = now
-    if dt < 0:
-        dt = 0.0
-    if dt > DT_CAP:
-        dt = DT_CAP
+    # fixed steps: a slow frame catches up instead of slowing the game down
+    for dt in loop.steps(now):
+        if game["game_over"]:
+            break
+        step_game(game, dt, loop.tick_t)
 
     if game["game_over"]:
-        canvas.Clear()
-        draw_ui(canvas, game)
-        draw_game_over(canvas, game, now)
-        canvas = matrix.SwapOnVSync(canvas)
+        fb.clear()
+        draw_ui(fb, game)
+        draw_game_over(fb, game, now)
+        canvas = fb.present(matrix, canvas)
         if now >= game["over_until"]:
             game = reset_game(now)
         continue
 
-    # update controls
-    update_player(game, dt)
-    update_aim(game)
-    try_fire(game, now)
-
-    # update world
-    update_bullets(game, dt)
-    spawn_enemies(game, now)
-    update_enemies(game, dt, now)
-    bullets_hit_enemies(game, now)
-    enemies_hit_player(game, now)
-    check_game_over(game, now)
-
     # draw
-    canvas.Clear()
-    draw_ui(canvas, game)
-    draw_player(canvas, game)
-    draw_aim(canvas, game)
-    draw_bullets(canvas, game["bullets"])
-    draw_enemies(canvas, game["enemies"], now)
-    canvas = matrix.SwapOnVSync(canvas)
+    fb.clear()
+    draw_ui(fb, game)
+    draw_player(fb, game)
+    draw_aim(fb, game)
+    draw_bullets(fb, game["bullets"])
+    draw_enemies(fb, game["enemies"], now)
+    canvas = fb.present(matrix, canvas)
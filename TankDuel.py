@@ -1,10 +1,17 @@
 import pygame
-import time
 import math
 import random
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
-from rgbmatrix.graphics import Color, DrawText, Font
+import numpy as np
+from functools import lru_cache
+from rgbmatrix.graphics import Color
 from Utils.menu_utils import ExitOnBack
+from Utils.input_state import InputState
+from Utils.framebuffer import FrameBuffer, rgb
+from Utils.matrix_utils import create_matrix, load_font
+from Utils.free_cells import FreeCells
+from Utils.game_loop import FixedStep, clock
+from Utils.profiler import Profiler
+from Utils.particles import Particles
 
 # =========================================================
 # INIT
@@ -21,25 +28,20 @@ joy2 = pygame.joystick.Joystick(1)
 joy1.init()
 joy2.init()
 
+# one event drain per frame; every pad read below comes from this snapshot
+inp = InputState([joy1, joy2])
+joy1, joy2 = inp.pads
+
 # =========================================================
 # MATRIX
 # =========================================================
-options = RGBMatrixOptions()
-options.hardware_mapping = "adafruit-hat"
-options.rows = 64
-options.cols = 64
-options.chain_length = 2
-options.brightness = 55
-options.gpio_slowdown = 4
-
-matrix = RGBMatrix(options=options)
-canvas = matrix.CreateFrameCanvas()
+matrix, canvas = create_matrix(brightness=55)
+fb = FrameBuffer(128, 64)  # draw here, push once per frame
 
 # =========================================================
 # FONT
 # =========================================================
-font = Font()
-font.LoadFont("/usr/local/share/rgbmatrix/fonts/6x10.bdf")
+font = load_font("/usr/local/share/rgbmatrix/fonts/6x10.bdf")
 
 # =========================================================
 # CONSTANTS
@@ -48,13 +50,19 @@ WIDTH = 128
 HEIGHT = 64
 
 TANK_SIZE = 4
-TANK_SPEED = 0.25
+TANK_SPEED = 0.25   # pixels per simulation step
 BULLET_SPEED = 1.2
+
+SIM_HZ = 60.0            # fixed simulation steps per second
+MAX_CATCHUP_STEPS = 5
 MAX_LIVES = 3
 
 GRID_CELL = TANK_SIZE * 2
 OBSTACLE_COUNT = 10
 
+EXPLOSION_SPARKS = 32           # particles per hit
+EXPLOSION_COLORS = [(255, 120, 0), (255, 200, 0), (255, 40, 0)]
+
 POWERUP_DURATION = 6
 POWERUP_RESPAWN_TIME = 8
 
@@ -66,6 +74,9 @@ DIR_DOWN  =  math.pi / 2
 DIR_LEFT  =  math.pi
 DIR_RIGHT =  0
 
+TANK_DIRECTIONS = 4        # sprite angles per full turn; 8 or 16 once tanks rotate freely
+SPRITE_R = TANK_SIZE + 6   # tank centre to sprite edge (body + barrel + rapid line fit)
+
 # =========================================================
 # FIXED MAP
 # =========================================================
@@ -85,6 +96,7 @@ TILE = 8                         # 8px tiles -> 16x8 grid on 128x64
 GRID_COLS = WIDTH // TILE        # 16
 GRID_ROWS = HEIGHT // TILE       # 8
 
+OBSTACLE_C = (255, 0, 0)         # obstacle tile color
 OBSTACLE_TILES = 18              # number of obstacle tiles to place
 SPAWN_BUFFER_TILES = 1           # keep obstacles away from spawn tiles (radius in tiles)
 
@@ -107,10 +119,18 @@ def create_tank(x, y, color):
 tank1 = create_tank(16, 32, Color(0, 255, 0))   # green tank
 tank2 = create_tank(112, 32, Color(0, 0, 255))  # blue tank
 
-explosions = []
+explosions = Particles(256, drag=4.0)  # sparks from every hit, updated per step
 powerup = None
-last_powerup_time = time.time()
-obstacles = []
+last_powerup_time = clock()
+obstacles = []  # change only through set_obstacles(): the layers below follow it
+
+# occupancy (see build_occupancy): per-pixel obstacle bitmap, its summed-area
+# table for O(1) rect queries, and every free tank/powerup position
+occ = None
+occ_sum = None
+free_tank_spots = None
+free_powerup_spots = None
+background = None  # RGB obstacle layer every frame starts from (draw_background)
 
 # =========================================================
 # MAP GENERATION
@@ -127,7 +147,7 @@ def tiles_in_radius(cx, cy, r):
     return out
 
 def generate_obstacles():
-    # returns list of obstacle rects in pixels: {x,y,w,h}
+    # new map as a list of obstacle rects in pixels: {x,y,w,h}, installed with set_obstacles()
     obs = []
 
     # If using fixed map, convert it into TILE-sized obstacles.
@@ -137,7 +157,7 @@ def generate_obstacles():
             for c in range(len(FIXED_MAP[0])):
                 if FIXED_MAP[r][c]:
                     obs.append({"x": c * TILE, "y": r * TILE, "w": TILE, "h": TILE})
-        return obs
+        return set_obstacles(obs)
 
     # Random tiled map
     # build a set of forbidden tiles around both tanks
@@ -157,8 +177,47 @@ def generate_obstacles():
     for (tx, ty) in chosen:
         obs.append({"x": tx * TILE, "y": ty * TILE, "w": TILE, "h": TILE})
 
+    return set_obstacles(obs)
+
+def set_obstacles(obs):
+    """The one way to change the map: occupancy and the background layer are rebuilt with it."""
+    global obstacles
+    obstacles = obs
+    build_occupancy(obs)
     return obs
 
+def build_occupancy(obs):
+    """
+    Rasterize obstacles once per map; every collision query after this is O(1),
+    and every frame starts from the background layer instead of redrawing them.
+    """
+    global occ, occ_sum, free_tank_spots, free_powerup_spots, background
+    occ = np.zeros((HEIGHT, WIDTH), dtype=bool)
+    for o in obs:
+        occ[o["y"]:o["y"] + o["h"], o["x"]:o["x"] + o["w"]] = True
+
+    background = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    background[occ] = OBSTACLE_C
+
+    occ_sum = np.zeros((HEIGHT + 1, WIDTH + 1), dtype=np.int32)
+    occ_sum[1:, 1:] = occ.cumsum(axis=0).cumsum(axis=1)
+
+    # tank rect free at every integer centre (x, y), clipped to the screen like the old scan
+    s = TANK_SIZE * 2
+    xs = np.arange(WIDTH); ys = np.arange(HEIGHT)
+    x0 = np.clip(xs - TANK_SIZE, 0, WIDTH)[None, :]; x1 = np.clip(xs - TANK_SIZE + s, 0, WIDTH)[None, :]
+    y0 = np.clip(ys - TANK_SIZE, 0, HEIGHT)[:, None]; y1 = np.clip(ys - TANK_SIZE + s, 0, HEIGHT)[:, None]
+    free = (occ_sum[y1, x1] - occ_sum[y0, x1] - occ_sum[y1, x0] + occ_sum[y0, x0]) == 0
+
+    def spots(lo_x, hi_x, lo_y, hi_y):
+        m = np.zeros_like(free)
+        m[lo_y:hi_y + 1, lo_x:hi_x + 1] = free[lo_y:hi_y + 1, lo_x:hi_x + 1]
+        return FreeCells((int(x), int(y)) for y, x in np.argwhere(m))
+
+    # same ranges the old rejection samplers drew from
+    free_tank_spots = spots(TANK_SIZE, WIDTH - TANK_SIZE, TANK_SIZE, HEIGHT - TANK_SIZE)
+    free_powerup_spots = spots(6, WIDTH - 6, 6, HEIGHT - 6)
+
 # =========================================================
 # SAFETY
 # =========================================================
@@ -170,107 +229,114 @@ def spawn_tank_safe(tank, x, y):
     if is_position_free(x, y):
         tank["x"], tank["y"] = x, y
         return
-    for _ in range(200):
-        nx = random.randint(TANK_SIZE, WIDTH - TANK_SIZE)
-        ny = random.randint(TANK_SIZE, HEIGHT - TANK_SIZE)
-        if is_position_free(nx, ny):
-            tank["x"], tank["y"] = nx, ny
-            return
+    spot = free_tank_spots.choice()
+    if spot is not None:
+        tank["x"], tank["y"] = spot
 
 def spawn_powerup():
-    for _ in range(1000):  # more attempts to ensure not in wall
-        x = random.randint(6, WIDTH - 6)
-        y = random.randint(6, HEIGHT - 6)
-        if is_position_free(x, y):
-            return {"x": x, "y": y, "type": "RAPID"}
-    return None
+    spot = free_powerup_spots.choice()
+    if spot is None:
+        return None
+    x, y = spot
+    return {"x": x, "y": y, "type": "RAPID"}
 
 # =========================================================
 # DRAWING
 # =========================================================
-def draw_tank(tank):
-    cx, cy = int(tank["x"]), int(tank["y"])
+def sprite_dir(angle, n=TANK_DIRECTIONS):
+    """Index of the precomputed sprite direction nearest to angle."""
+    return int(round(angle / (2 * math.pi / n))) % n
+
+@lru_cache(maxsize=None)
+def tank_sprite(d, color, rapid, n=TANK_DIRECTIONS):
+    """
+    Body + barrel (+ rapid indicator) facing direction d of n, as (image, mask)
+    with the tank centre at (SPRITE_R, SPRITE_R). Built once per look.
+    """
+    angle = math.remainder(d * 2 * math.pi / n, 2 * math.pi)  # -pi/2 for up, like DIR_UP
+    size = SPRITE_R * 2 + 1
+    img = np.zeros((size, size, 3), dtype=np.uint8)
+    mask = np.zeros((size, size), dtype=bool)
+    c = SPRITE_R
 
     # Tank body
-    for y in range(-TANK_SIZE, TANK_SIZE):
-        for x in range(-TANK_SIZE, TANK_SIZE):
-            canvas.SetPixel(cx + x, cy + y,
-                            tank["color"].red,
-                            tank["color"].green,
-                            tank["color"].blue)
+    img[c - TANK_SIZE:c + TANK_SIZE, c - TANK_SIZE:c + TANK_SIZE] = color
+    mask[c - TANK_SIZE:c + TANK_SIZE, c - TANK_SIZE:c + TANK_SIZE] = True
 
     # Barrel 2px wide, centered
-    perp_x = -math.sin(tank["angle"])
-    perp_y =  math.cos(tank["angle"])
+    perp_x = -math.sin(angle)
+    perp_y =  math.cos(angle)
 
     for i in range(6):
-        bx = cx + math.cos(tank["angle"]) * (TANK_SIZE - 1 + i)
-        by = cy + math.sin(tank["angle"]) * (TANK_SIZE - 1 + i)
+        bx = c + math.cos(angle) * (TANK_SIZE - 1 + i)
+        by = c + math.sin(angle) * (TANK_SIZE - 1 + i)
+
+        for x, y in ((bx + perp_x * 0.5, by + perp_y * 0.5), (bx - perp_x * 0.5, by - perp_y * 0.5)):
+            img[int(y), int(x)] = (255, 255, 255)
+            mask[int(y), int(x)] = True
+
+    # Indicator if rapid active
+    if rapid:
+        img[c - TANK_SIZE - 1, c - TANK_SIZE:c + TANK_SIZE] = (255, 255, 0)
+        mask[c - TANK_SIZE - 1, c - TANK_SIZE:c + TANK_SIZE] = True
 
-        canvas.SetPixel(int(bx + perp_x * 0.5), int(by + perp_y * 0.5), 255,255,255)
-        canvas.SetPixel(int(bx - perp_x * 0.5), int(by - perp_y * 0.5), 255,255,255)
+    return img, mask
 
-    # Draw indicator if rapid active
-    if tank["rapid"]:
-        for i in range(-TANK_SIZE, TANK_SIZE):
-            canvas.SetPixel(cx + i, cy - TANK_SIZE - 1, 255, 255, 0)
+# every look the two tanks can have, built at import
+for _tank in (tank1, tank2):
+    for _d in range(TANK_DIRECTIONS):
+        for _rapid in (False, True):
+            tank_sprite(_d, rgb(_tank["color"]), _rapid)
 
-def draw_obstacles():
-    for o in obstacles:
-        for y in range(o["h"]):
-            for x in range(o["w"]):
-                canvas.SetPixel(int(o["x"]+x), int(o["y"]+y), 255,0,0)
+def draw_tank(tank):
+    img, mask = tank_sprite(sprite_dir(tank["angle"]), rgb(tank["color"]), tank["rapid"])
+    fb.blit(int(tank["x"]) - SPRITE_R, int(tank["y"]) - SPRITE_R, img, mask)
+
+def draw_background():
+    # obstacle layer from build_occupancy(): one bulk copy replaces clear() + per-tile fills
+    fb.blit(0, 0, background)
 
 def draw_powerup():
     if not powerup:
         return
     x, y = int(powerup["x"]), int(powerup["y"])
-    canvas.SetPixel(x, y, 255,255,0)
-    canvas.SetPixel(x-1, y, 255,255,0)
-    canvas.SetPixel(x+1, y, 255,255,0)
-    canvas.SetPixel(x, y-1, 255,255,0)
-    canvas.SetPixel(x, y+1, 255,255,0)
+    fb.SetPixel(x, y, 255,255,0)
+    fb.SetPixel(x-1, y, 255,255,0)
+    fb.SetPixel(x+1, y, 255,255,0)
+    fb.SetPixel(x, y-1, 255,255,0)
+    fb.SetPixel(x, y+1, 255,255,0)
 
 def draw_bullets(tank):
     for b in tank["bullets"]:
-        canvas.SetPixel(int(b["x"]), int(b["y"]), 255,255,0)
+        fb.SetPixel(int(b["x"]), int(b["y"]), 255,255,0)
 
 def draw_lives(tank, x):
     for i in range(tank["lives"]):
-        canvas.SetPixel(x+i*3, 2, tank["color"].red, tank["color"].green, tank["color"].blue)
+        fb.SetPixel(x+i*3, 2, tank["color"].red, tank["color"].green, tank["color"].blue)
 
 def draw_explosions():
-    for e in explosions:
-        for y in range(-e["radius"], e["radius"]):
-            for x in range(-e["radius"], e["radius"]):
-                canvas.SetPixel(int(e["x"]+x), int(e["y"]+y), 255,120,0)
+    explosions.draw(fb)
 
 # =========================================================
 # GAME LOGIC
 # =========================================================
 def collide_with_obstacles(x, y):
-    for o in obstacles:
-        if o["x"] <= x < o["x"]+o["w"] and o["y"] <= y < o["y"]+o["h"]:
-            return True
-    return False
+    return bullet_hits_obstacle(x, y)
 
 def check_powerup_pickup(tank):
     global powerup
     if powerup and abs(tank["x"]-powerup["x"]) < TANK_SIZE and abs(tank["y"]-powerup["y"]) < TANK_SIZE:
         tank["rapid"] = True
-        tank["rapid_end"] = time.time() + POWERUP_DURATION
+        tank["rapid_end"] = clock() + POWERUP_DURATION
         powerup = None
 
 def update_tank(tank, joy):
-    lx, ly = joy.get_axis(0), joy.get_axis(1)
-
     # 4-way direction
-    if abs(lx) > abs(ly):
-        if lx > 0.5: tank["angle"] = DIR_RIGHT
-        elif lx < -0.5: tank["angle"] = DIR_LEFT
-    else:
-        if ly > 0.5: tank["angle"] = DIR_DOWN
-        elif ly < -0.5: tank["angle"] = DIR_UP
+    sx, sy = joy.dir4(0.5)
+    if sx:
+        tank["angle"] = DIR_RIGHT if sx > 0 else DIR_LEFT
+    elif sy:
+        tank["angle"] = DIR_DOWN if sy > 0 else DIR_UP
 
     dx, dy = math.cos(tank["angle"]), math.sin(tank["angle"])
 
@@ -316,27 +382,24 @@ def update_bullets(attacker, target):
         if abs(b["x"]-target["x"]) < TANK_SIZE and abs(b["y"]-target["y"]) < TANK_SIZE:
             attacker["bullets"].remove(b)
             target["lives"] -= 1
-            explosions.append({"x":b["x"],"y":b["y"],"radius":1})
+            explode(b["x"], b["y"])
         elif bullet_hits_obstacle(b["x"], b["y"]):
             attacker["bullets"].remove(b)
-            explosions.append({"x":b["x"],"y":b["y"],"radius":1})
+            explode(b["x"], b["y"])
         elif not (0<=b["x"]<WIDTH and 0<=b["y"]<HEIGHT):
             attacker["bullets"].remove(b)
 
-def update_explosions():
-    for e in explosions[:]:
-        e["radius"] += 1
-        if e["radius"] > 6:
-            explosions.remove(e)
+def explode(x, y):
+    explosions.emit(EXPLOSION_SPARKS, x, y, speed=(15, 60), life=(0.15, 0.45), colors=EXPLOSION_COLORS)
+
+def update_explosions(dt):
+    explosions.update(dt)
 
 def wrap(v, maxv):
     if v < 0: return maxv - 1
     if v >= maxv: return 0
     return v
 
-def rects_overlap(ax, ay, aw, ah, bx, by, bw, bh):
-    return not (ax + aw <= bx or bx + bw <= ax or ay + ah <= by or by + bh <= ay)
-
 def tank_rect_at(x, y):
     # your tank draw is from -TANK_SIZE..+TANK_SIZE, so width/height ~ 2*TANK_SIZE
     s = TANK_SIZE * 2
@@ -344,17 +407,17 @@ def tank_rect_at(x, y):
 
 def tank_hits_obstacle(nx, ny):
     rx, ry, rw, rh = tank_rect_at(nx, ny)
-    for o in obstacles:
-        if rects_overlap(rx, ry, rw, rh, o["x"], o["y"], o["w"], o["h"]):
-            return True
-    return False
+    # pixels the (possibly fractional) rect overlaps, clipped to the screen
+    x0 = max(0, math.floor(rx)); x1 = min(WIDTH, math.ceil(rx + rw))
+    y0 = max(0, math.floor(ry)); y1 = min(HEIGHT, math.ceil(ry + rh))
+    if x1 <= x0 or y1 <= y0:
+        return False
+    return (occ_sum[y1, x1] - occ_sum[y0, x1] - occ_sum[y1, x0] + occ_sum[y0, x0]) > 0
 
 def bullet_hits_obstacle(bx, by):
     # bullet treated as a single pixel
-    for o in obstacles:
-        if o["x"] <= bx < o["x"] + o["w"] and o["y"] <= by < o["y"] + o["h"]:
-            return True
-    return False
+    x = math.floor(bx); y = math.floor(by)
+    return 0 <= x < WIDTH and 0 <= y < HEIGHT and bool(occ[y, x])
 
 
 # =========================================================
@@ -364,44 +427,52 @@ exit_mgr = ExitOnBack([joy1, joy2], back_btn=BACK, quit_only=False)
 winner = None
 winner_time = None
 
+set_obstacles([])
 spawn_tank_safe(tank1, 16, 32)
 spawn_tank_safe(tank2, 112, 32)
-obstacles = generate_obstacles()
+generate_obstacles()
+
+loop = FixedStep(SIM_HZ, MAX_CATCHUP_STEPS)
+prof = Profiler("TankDuel", pads=[joy1, joy2])  # LB+RB+START: frame-time overlay
 
 while True:
-    pygame.event.pump()
-    canvas.Clear()
+    prof.begin()
+    inp.poll()
+    now = clock()
+    draw_background()
 
     if exit_mgr.should_exit():
         matrix.Clear()
         exit_mgr.handle()
+    prof.mark("input")
 
     # Spawn powerup
-    if not powerup and time.time() - last_powerup_time > POWERUP_RESPAWN_TIME:
+    if not powerup and now - last_powerup_time > POWERUP_RESPAWN_TIME:
         powerup = spawn_powerup()
-        last_powerup_time = time.time()
+        last_powerup_time = now
 
     # Reset rapid powerup
     for t in (tank1, tank2):
-        if t["rapid"] and time.time() > t["rapid_end"]:
+        if t["rapid"] and now > t["rapid_end"]:
             t["rapid"] = False
 
-    # Game logic
-    if winner is None:
-        update_tank(tank1, joy1)
-        update_tank(tank2, joy2)
-        update_bullets(tank1, tank2)
-        update_bullets(tank2, tank1)
+    # Game logic: speeds are per step, so run as many fixed steps as time has passed
+    for dt in loop.steps(now):
+        if winner is None:
+            update_tank(tank1, joy1)
+            update_tank(tank2, joy2)
+            update_bullets(tank1, tank2)
+            update_bullets(tank2, tank1)
 
-        if tank1["lives"] <= 0:
-            winner, winner_time = "BLUE", time.time()
-        elif tank2["lives"] <= 0:
-            winner, winner_time = "GREEN", time.time()
+            if tank1["lives"] <= 0:
+                winner, winner_time = "BLUE", loop.tick_t
+            elif tank2["lives"] <= 0:
+                winner, winner_time = "GREEN", loop.tick_t
 
-    update_explosions()
+        update_explosions(dt)
+    prof.mark("update")
 
-    # Draw everything
-    draw_obstacles()
+    # Draw everything on top of the background layer
     draw_powerup()
     draw_tank(tank1)
     draw_tank(tank2)
@@ -415,12 +486,10 @@ while True:
     if winner:
         text = f"{winner} WINS"
         w = len(text) * 6
-        for y in range(24, 36):
-            for x in range(40, 40 + w):
-                canvas.SetPixel(x, y, 0, 0, 0)
-        DrawText(canvas, font, 40, 34, Color(255,255,255), text)
+        fb.fill_rect(40, 24, w, 12, (0, 0, 0))
+        fb.text(font, 40, 34, Color(255,255,255), text)
 
-        if time.time() - winner_time > 2:
+        if now - winner_time > 2:
             explosions.clear()
             tank1["lives"] = tank2["lives"] = MAX_LIVES
 
@@ -429,7 +498,7 @@ while True:
             spawn_tank_safe(tank2, 112, 32)
 
             # then generate obstacles avoiding their tiles
-            obstacles = generate_obstacles()
+            generate_obstacles()
 
             # final safety pass (rare edge cases if tank got moved)
             spawn_tank_safe(tank1, tank1["x"], tank1["y"])
@@ -437,5 +506,7 @@ while True:
 
             winner = None
 
-    canvas = matrix.SwapOnVSync(canvas)
-    time.sleep(0.01)
\ No newline at end of file
+    prof.overlay(fb)
+    prof.mark("draw")
+    canvas = fb.present(matrix, canvas)
+    prof.mark("swap")
\ No newline at end of file
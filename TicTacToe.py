@@ -1,10 +1,14 @@
 import pygame
-import time
 import math
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
 from rgbmatrix.graphics import Color
-from Utils.led_digits import DIGITS_8x8, clamp_digit
+from Utils.led_digits import clamp_digit
+from Utils.led_text import draw_number
 from Utils.menu_utils import ExitOnBack
+from Utils.input_state import InputState
+from Utils.framebuffer import FrameBuffer
+from Utils.tiles import draw_tile
+from Utils.matrix_utils import create_matrix
+from Utils.game_loop import clock
 
 # -------------------------------------------------
 # INITIALIZATION
@@ -24,16 +28,12 @@ controllerB = pygame.joystick.Joystick(1)
 controllerA.init()
 controllerB.init()
 
-options = RGBMatrixOptions()
-options.hardware_mapping = 'adafruit-hat'
-options.rows = 64
-options.cols = 64
-options.chain_length = 2
-options.brightness = 50
-options.gpio_slowdown = 4
+# one event drain per frame; every pad read below comes from this snapshot
+inp = InputState([controllerA, controllerB])
+controllerA, controllerB = inp.pads
 
-matrix = RGBMatrix(options=options)
-canvas = matrix.CreateFrameCanvas()
+matrix, canvas = create_matrix(brightness=50)
+fb = FrameBuffer(128, 64)  # kept between frames: only cells whose look changed are redrawn
 
 # -------------------------------------------------
 # CONSTANTS
@@ -69,28 +69,14 @@ def create_empty_board():
 # -------------------------------------------------
 
 def draw_icon(canvas, pixel_x, pixel_y, icon, color):
-    for y in range(ICON_SIZE):
-        for x in range(ICON_SIZE):
-            if icon[y][x] == 1:
-                canvas.SetPixel(pixel_x + x, pixel_y + y, color.red, color.green, color.blue)
+    draw_tile(canvas, pixel_x, pixel_y, color, icon=icon)  # cached stamp, one blit
 
 def draw_icon_scaled(canvas, pixel_x, pixel_y, icon, color, scale=1):
     # scale must be int >= 1
-    for y in range(ICON_SIZE):
-        for x in range(ICON_SIZE):
-            if icon[y][x] == 1:
-                for sy in range(scale):
-                    for sx in range(scale):
-                        canvas.SetPixel(
-                            pixel_x + x * scale + sx,
-                            pixel_y + y * scale + sy,
-                            color.red, color.green, color.blue
-                        )
+    draw_tile(canvas, pixel_x, pixel_y, color, icon=icon, scale=scale)
 
 def clear_rect(canvas, x0, y0, w, h):
-    for y in range(y0, y0 + h):
-        for x in range(x0, x0 + w):
-            canvas.SetPixel(x, y, 0, 0, 0)
+    canvas.fill_rect(x0, y0, w, h, (0, 0, 0))
 
 def draw_scoreboard(canvas, score_p1, score_p2):
     # Clear second panel
@@ -107,30 +93,46 @@ def draw_scoreboard(canvas, score_p1, score_p2):
     x1 = SCORE_X0 + 0
     x2 = SCORE_X0 + digit_w
 
-    draw_icon_scaled(canvas, x1, y, DIGITS_8x8[s1], Color(255, 0, 0), scale=scale)  # P1 red
-    draw_icon_scaled(canvas, x2, y, DIGITS_8x8[s2], Color(0, 0, 255), scale=scale)  # P2 blue
+    draw_number(canvas, x1, y, s1, Color(255, 0, 0), scale=scale, font="8x8")  # P1 red
+    draw_number(canvas, x2, y, s2, Color(0, 0, 255), scale=scale, font="8x8")  # P2 blue
 
     # Small markers under digits: X and O
     draw_icon_scaled(canvas, SCORE_X0 + 12, 52, ICON_X, Color(255, 0, 0), scale=1)
     draw_icon_scaled(canvas, SCORE_X0 + 44, 52, ICON_O, Color(0, 0, 255), scale=1)
 
 
-def draw_board(canvas, board, icon_p1, icon_p2, score_p1, score_p2):
-    canvas.Clear()
+def draw_cell(fb, board_x, board_y, value, overlay, icon_p1, icon_p2):
+    pixel_x = GAME_X0 + board_x * ICON_SIZE
+    pixel_y = board_y * ICON_SIZE
+    clear_rect(fb, pixel_x, pixel_y, ICON_SIZE, ICON_SIZE)
 
+    if value == 1:
+        draw_icon(fb, pixel_x, pixel_y, icon_p1, Color(255, 0, 0))
+    elif value == 2:
+        draw_icon(fb, pixel_x, pixel_y, icon_p2, Color(0, 0, 255))
+
+    # cursor / winning line on top of the placed icon
+    if overlay is not None:
+        icon, (r, g, b) = overlay
+        draw_icon(fb, pixel_x, pixel_y, icon, Color(r, g, b))
+
+
+def draw_board(fb, board, icon_p1, icon_p2, score_p1, score_p2, overlay):
+    """
+    Redraw only the cells (and scoreboard) that look different from the last frame;
+    the rest of the frame is kept. overlay: {(x, y): (icon, (r, g, b))} drawn over cells.
+    """
     # Draw game board on first panel only (x 0-63)
     for board_y in range(BOARD_SIZE):
         for board_x in range(BOARD_SIZE):
-            pixel_x = GAME_X0 + board_x * ICON_SIZE
-            pixel_y = board_y * ICON_SIZE
-
-            if board[board_y][board_x] == 1:
-                draw_icon(canvas, pixel_x, pixel_y, icon_p1, Color(255, 0, 0))
-            elif board[board_y][board_x] == 2:
-                draw_icon(canvas, pixel_x, pixel_y, icon_p2, Color(0, 0, 255))
+            value = board[board_y][board_x]
+            over = overlay.get((board_x, board_y))
+            if fb.changed(("cell", board_x, board_y), (value, over)):
+                draw_cell(fb, board_x, board_y, value, over, icon_p1, icon_p2)
 
     # Draw scoreboard on second panel
-    draw_scoreboard(canvas, score_p1, score_p2)
+    if fb.changed("score", (score_p1, score_p2)):
+        draw_scoreboard(fb, score_p1, score_p2)
 
 # -------------------------------------------------
 # GAME LOGIC
@@ -172,11 +174,10 @@ def check_win(board, start_x, start_y, player):
 
     return None
 
-def draw_winning_cells(canvas, cells, icon, visible):
+def winning_overlay(cells, icon, visible):
     if not visible:
-        return
-    for x, y in cells:
-        draw_icon(canvas, x * ICON_SIZE, y * ICON_SIZE, icon, Color(0, 255, 0))
+        return {}
+    return {(x, y): (icon, (0, 255, 0)) for x, y in cells}
 
 # -------------------------------------------------
 # ICONS
@@ -226,8 +227,8 @@ def reset_round(starting_player=1):
 
 game = reset_round(starting_player=1)
 
-last_move_time = time.time()
-start_time = time.time()
+last_move_time = clock()
+start_time = clock()
 
 # -------------------------------------------------
 # MAIN LOOP
@@ -235,8 +236,8 @@ start_time = time.time()
 exit_mgr = ExitOnBack([controllerA, controllerB], back_btn=BACK, quit_only=False)
 
 while True:
-    pygame.event.pump()
-    now = time.time()
+    inp.poll()
+    now = clock()
 
     # EXIT
     if exit_mgr.should_exit():
@@ -265,25 +266,8 @@ while True:
 
     # MOVEMENT (only if round not over)
     if (not game["round_over"]) and (now - last_move_time > MOVE_DELAY):
-        if game["current_player"] == 1:
-            lx = controllerA.get_axis(0)
-            ly = controllerA.get_axis(1)
-        else:
-            lx = controllerB.get_axis(0)
-            ly = controllerB.get_axis(1)
-
-        dx = 0
-        dy = 0
-
-        if lx > DEADZONE:
-            dx = 1
-        elif lx < -DEADZONE:
-            dx = -1
-
-        if ly > DEADZONE:
-            dy = 1
-        elif ly < -DEADZONE:
-            dy = -1
+        pad = controllerA if game["current_player"] == 1 else controllerB
+        dx, dy = pad.dir8(DEADZONE)
 
         if dx != 0 or dy != 0:
             game["cursor_x"] = max(0, min(7, game["cursor_x"] + dx))
@@ -325,23 +309,17 @@ while True:
 
         game["last_action"] = now
 
-    # DRAW
-    draw_board(canvas, game["board"], ICON_X, ICON_O, scores["p1"], scores["p2"])
-
+    # DRAW (only what changed; an idle board sends nothing to the panel)
     pulse = (math.sin((now - start_time) * 4) + 1) / 2
     brightness = int(80 + 175 * pulse)
 
     if not game["round_over"]:
         # cursor on first panel only
-        draw_icon(
-            canvas,
-            game["cursor_x"] * ICON_SIZE,
-            game["cursor_y"] * ICON_SIZE,
-            game["current_icon"],
-            Color(brightness, brightness, 0)
-        )
+        cursor = (game["cursor_x"], game["cursor_y"])
+        overlay = {cursor: (game["current_icon"], (brightness, brightness, 0))}
     else:
         blink_visible = int(now * 2) % 2 == 0
-        draw_winning_cells(canvas, game["winner_cells"], game["current_icon"], blink_visible)
+        overlay = winning_overlay(game["winner_cells"], game["current_icon"], blink_visible)
 
-    canvas = matrix.SwapOnVSync(canvas)
+    draw_board(fb, game["board"], ICON_X, ICON_O, scores["p1"], scores["p2"], overlay)
+    canvas = fb.present(matrix, canvas)
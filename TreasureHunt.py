@@ -1,11 +1,15 @@
 import pygame
-import time
 import math
 import random
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
 from rgbmatrix.graphics import Color
-from Utils.led_digits import DIGITS_8x8, clamp_digit
+from Utils.led_digits import clamp_digit
+from Utils.led_text import draw_number
 from Utils.menu_utils import ExitOnBack
+from Utils.input_state import InputState
+from Utils.framebuffer import FrameBuffer
+from Utils.tiles import draw_tile
+from Utils.matrix_utils import create_matrix
+from Utils.game_loop import clock
 
 # scp /Users/Insan/PycharmProjects/RaspberryPi-Projects/active.py rpi-kristof@192.168.0.200:~/teszt.py
 # -------------------------------------------------
@@ -26,16 +30,12 @@ controllerB = pygame.joystick.Joystick(1)
 controllerA.init()
 controllerB.init()
 
-options = RGBMatrixOptions()
-options.hardware_mapping = 'adafruit-hat'
-options.rows = 64
-options.cols = 64
-options.chain_length = 2
-options.brightness = 50
-options.gpio_slowdown = 4
+# one event drain per frame; every pad read below comes from this snapshot
+inp = InputState([controllerA, controllerB])
+controllerA, controllerB = inp.pads
 
-matrix = RGBMatrix(options=options)
-canvas = matrix.CreateFrameCanvas()
+matrix, canvas = create_matrix(brightness=50)
+fb = FrameBuffer(128, 64)  # kept between frames: only cells whose look changed are redrawn
 
 # -------------------------------------------------
 # CONSTANTS
@@ -107,27 +107,10 @@ def all_revealed(revealed):
 # -------------------------------------------------
 
 def draw_icon(canvas, pixel_x, pixel_y, icon, color):
-    for y in range(ICON_SIZE):
-        for x in range(ICON_SIZE):
-            if icon[y][x] == 1:
-                canvas.SetPixel(pixel_x + x, pixel_y + y, color.red, color.green, color.blue)
-
-def draw_icon_scaled(canvas, pixel_x, pixel_y, icon, color, scale=1):
-    for y in range(ICON_SIZE):
-        for x in range(ICON_SIZE):
-            if icon[y][x] == 1:
-                for sy in range(scale):
-                    for sx in range(scale):
-                        canvas.SetPixel(
-                            pixel_x + x * scale + sx,
-                            pixel_y + y * scale + sy,
-                            color.red, color.green, color.blue
-                        )
+    draw_tile(canvas, pixel_x, pixel_y, color, icon=icon)  # cached stamp, one blit
 
 def clear_rect(canvas, x0, y0, w, h):
-    for yy in range(y0, y0 + h):
-        for xx in range(x0, x0 + w):
-            canvas.SetPixel(xx, yy, 0, 0, 0)
+    canvas.fill_rect(x0, y0, w, h, (0, 0, 0))
 
 def draw_scoreboard(canvas, score_p1, score_p2):
     clear_rect(canvas, SCORE_X0, 0, PANEL_W, PANEL_H)
@@ -141,8 +124,8 @@ def draw_scoreboard(canvas, score_p1, score_p2):
     x1 = SCORE_X0 + 0
     x2 = SCORE_X0 + digit_w
 
-    draw_icon_scaled(canvas, x1, y, DIGITS_8x8[s1], Color(255, 0, 0), scale=scale)  # P1
-    draw_icon_scaled(canvas, x2, y, DIGITS_8x8[s2], Color(0, 0, 255), scale=scale)  # P2
+    draw_number(canvas, x1, y, s1, Color(255, 0, 0), scale=scale, font="8x8")  # P1
+    draw_number(canvas, x2, y, s2, Color(0, 0, 255), scale=scale, font="8x8")  # P2
 
 def gem_color(value):
     if value == GEM_1:
@@ -153,78 +136,77 @@ def gem_color(value):
         return Color(255, 0, 255)    # magenta
     return Color(100, 100, 100)         # dim for empty (only used in reveal flash)
 
-def draw_board(canvas, revealed, treasure, cursor_x, cursor_y, current_player, show_reveal_flash, flash_cell, flash_until, now, score_p1, score_p2, round_over, winner):
-    canvas.Clear()
+def draw_cell(fb, bx, by, look):
+    """One board cell: erased, then revealed pattern, cursor outline, reveal flash."""
+    value, cursor_col, flash = look
+    px = GAME_X0 + bx * ICON_SIZE
+    py = by * ICON_SIZE
+    clear_rect(fb, px, py, ICON_SIZE, ICON_SIZE)
 
-    # Draw revealed tiles
-    for by in range(BOARD_SIZE):
-        for bx in range(BOARD_SIZE):
-            px = GAME_X0 + bx * ICON_SIZE
-            py = by * ICON_SIZE
-
-            if revealed[by][bx] == 1:
-                val = treasure[by][bx]
-                c = gem_color(val)
-
-                # Fill tile with a simple pattern
-                for yy in range(ICON_SIZE):
-                    for xx in range(ICON_SIZE):
-                        if (xx + yy) % 2 == 0:
-                            canvas.SetPixel(px + xx, py + yy, c.red, c.green, c.blue)
-            else:
-                pass
+    if value is not None:
+        # Fill tile with a simple pattern
+        draw_tile(fb, px, py, gem_color(value), checker=True, size=ICON_SIZE)
 
+    if cursor_col is not None:
+        # outline box
+        draw_tile(fb, px, py, cursor_col, outline=True, size=ICON_SIZE)
+
+    # Flash revealed gem briefly (even if the tile is now revealed, this makes it "pop")
+    if flash:
+        # stronger fill
+        draw_tile(fb, px, py, gem_color(value), size=ICON_SIZE)
+
+def draw_score_panel(fb, score_p1, score_p2, round_over, winner, now):
+    # If round over, blink winner background on score panel
+    blink = round_over and int(now * 2) % 2 == 0
+    if not fb.changed("score", (score_p1, score_p2, blink, winner)):
+        return
+
+    if not blink:
+        draw_scoreboard(fb, score_p1, score_p2)
+    elif winner == 1:
+        clear_rect(fb, SCORE_X0, 0, PANEL_W, PANEL_H)
+        draw_number(fb, SCORE_X0 + 16, 16, clamp_digit(score_p1), Color(255, 0, 0), scale=4, font="8x8")
+    elif winner == 2:
+        clear_rect(fb, SCORE_X0, 0, PANEL_W, PANEL_H)
+        draw_number(fb, SCORE_X0 + 16, 16, clamp_digit(score_p2), Color(0, 0, 255), scale=4, font="8x8")
+    else:
+        # tie: white flash
+        clear_rect(fb, SCORE_X0, 0, PANEL_W, PANEL_H)
+        draw_number(fb, SCORE_X0 + 0, 16, clamp_digit(score_p1), Color(200, 200, 200), scale=4, font="8x8")
+        draw_number(fb, SCORE_X0 + 32, 16, clamp_digit(score_p2), Color(200, 200, 200), scale=4, font="8x8")
+
+def draw_board(fb, game, now):
+    """
+    Redraw the cells whose look changed since the last frame (a revealed tile, the
+    pulsing cursor, the reveal flash) and the score panel when it changed; the rest
+    of the frame is kept, so an idle board costs next to nothing.
+    """
     # Cursor / selection highlight (only if not over)
-    if not round_over:
+    cursor_col = None
+    if not game["round_over"]:
         pulse = (math.sin(now * 6) + 1) / 2
         b = int(40 + 140 * pulse)
 
         # current player cursor color
-        if current_player == 1:
-            col = (b, 0, 0)
-        else:
-            col = (0, 0, b)
+        cursor_col = (b, 0, 0) if game["current_player"] == 1 else (0, 0, b)
 
-        cx = cursor_x * ICON_SIZE
-        cy = cursor_y * ICON_SIZE
+    flash_cell = game["flash_cell"] if now < game["flash_until"] else None
+    cursor = (game["cursor_x"], game["cursor_y"])
 
-        # outline box
-        for i in range(ICON_SIZE):
-            canvas.SetPixel(cx + i, cy + 0, col[0], col[1], col[2])
-            canvas.SetPixel(cx + i, cy + (ICON_SIZE - 1), col[0], col[1], col[2])
-            canvas.SetPixel(cx + 0, cy + i, col[0], col[1], col[2])
-            canvas.SetPixel(cx + (ICON_SIZE - 1), cy + i, col[0], col[1], col[2])
-
-    # Flash revealed gem briefly (even if the tile is now revealed, this makes it "pop")
-    if show_reveal_flash and flash_cell is not None and now < flash_until:
-        fx, fy = flash_cell
-        px = fx * ICON_SIZE
-        py = fy * ICON_SIZE
-        val = treasure[fy][fx]
-        c = gem_color(val)
-        # stronger fill
-        for yy in range(ICON_SIZE):
-            for xx in range(ICON_SIZE):
-                canvas.SetPixel(px + xx, py + yy, c.red, c.green, c.blue)
+    for by in range(BOARD_SIZE):
+        for bx in range(BOARD_SIZE):
+            value = game["treasure"][by][bx] if game["revealed"][by][bx] == 1 else None
+            look = (
+                value,
+                cursor_col if (bx, by) == cursor else None,
+                (bx, by) == flash_cell,
+            )
+            if fb.changed(("cell", bx, by), look):
+                draw_cell(fb, bx, by, look)
 
     # Draw scoreboard on second panel
-    draw_scoreboard(canvas, score_p1, score_p2)
-
-    # If round over, blink winner background on score panel
-    if round_over:
-        blink = int(now * 2) % 2 == 0
-        if blink:
-            if winner == 1:
-                clear_rect(canvas, SCORE_X0, 0, PANEL_W, PANEL_H)
-                draw_icon_scaled(canvas, SCORE_X0 + 16, 16, DIGITS_8x8[clamp_digit(score_p1)], Color(255, 0, 0), scale=4)
-            elif winner == 2:
-                clear_rect(canvas, SCORE_X0, 0, PANEL_W, PANEL_H)
-                draw_icon_scaled(canvas, SCORE_X0 + 16, 16, DIGITS_8x8[clamp_digit(score_p2)], Color(0, 0, 255), scale=4)
-            else:
-                # tie: white flash
-                clear_rect(canvas, SCORE_X0, 0, PANEL_W, PANEL_H)
-                draw_icon_scaled(canvas, SCORE_X0 + 0, 16, DIGITS_8x8[clamp_digit(score_p1)], Color(200, 200, 200), scale=4)
-                draw_icon_scaled(canvas, SCORE_X0 + 32, 16, DIGITS_8x8[clamp_digit(score_p2)], Color(200, 200, 200), scale=4)
+    draw_score_panel(fb, game["score_p1"], game["score_p2"], game["round_over"], game["winner"], now)
 
 # -------------------------------------------------
 # GAME STATE
@@ -240,7 +222,7 @@ def reset_game(starting_player=1):
         "score_p1": 0,
         "score_p2": 0,
         "last_action": 0.0,
-        "last_move_time": time.time(),
+        "last_move_time": clock(),
         "flash_cell": None,
         "flash_until": 0.0,
         "round_over": False,
@@ -256,8 +238,8 @@ game = reset_game(starting_player=1)
 exit_mgr = ExitOnBack([controllerA, controllerB], back_btn=BACK, quit_only=False)
 
 while True:
-    pygame.event.pump()
-    now = time.time()
+    inp.poll()
+    now = clock()
 
     # EXIT
     if exit_mgr.should_exit():
@@ -283,46 +265,14 @@ while True:
             game["last_action"] = now
 
         # still draw while waiting
-        draw_board(
-            canvas,
-            game["revealed"],
-            game["treasure"],
-            game["cursor_x"],
-            game["cursor_y"],
-            game["current_player"],
-            True,
-            game["flash_cell"],
-            game["flash_until"],
-            now,
-            game["score_p1"],
-            game["score_p2"],
-            game["round_over"],
-            game["winner"]
-        )
-        canvas = matrix.SwapOnVSync(canvas)
+        draw_board(fb, game, now)
+        canvas = fb.present(matrix, canvas)
         continue
 
     # MOVEMENT
     if now - game["last_move_time"] > MOVE_DELAY:
-        if game["current_player"] == 1:
-            lx = controllerA.get_axis(0)
-            ly = controllerA.get_axis(1)
-        else:
-            lx = controllerB.get_axis(0)
-            ly = controllerB.get_axis(1)
-
-        dx = 0
-        dy = 0
-
-        if lx > DEADZONE:
-            dx = 1
-        elif lx < -DEADZONE:
-            dx = -1
-
-        if ly > DEADZONE:
-            dy = 1
-        elif ly < -DEADZONE:
-            dy = -1
+        pad = controllerA if game["current_player"] == 1 else controllerB
+        dx, dy = pad.dir8(DEADZONE)
 
         if dx != 0 or dy != 0:
             game["cursor_x"] = max(0, min(7, game["cursor_x"] + dx))
@@ -372,21 +322,6 @@ while True:
         game["last_action"] = now
 
     # DRAW
-    draw_board(
-        canvas,
-        game["revealed"],
-        game["treasure"],
-        game["cursor_x"],
-        game["cursor_y"],
-        game["current_player"],
-        True,
-        game["flash_cell"],
-        game["flash_until"],
-        now,
-        game["score_p1"],
-        game["score_p2"],
-        game["round_over"],
-        game["winner"]
-    )
-
-    canvas = matrix.SwapOnVSync(canvas)
+    draw_board(fb, game, now)
+
+    canvas = fb.present(matrix, canvas)
@@ -1,10 +1,14 @@
 import pygame
-import time
 import random
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
 from rgbmatrix.graphics import Color
-from Utils.led_digits import DIGITS_8x8
+from Utils.led_text import draw_number
 from Utils.menu_utils import ExitOnBack
+from Utils.input_state import InputState
+from Utils.framebuffer import FrameBuffer
+from Utils.tiles import draw_tile
+from Utils.matrix_utils import create_matrix
+from Utils.game_loop import clock
+from Utils.free_cells import FreeCells
 
 # -------------------------------------------------
 # REACTION GEM DUEL – GAME MECHANICS
@@ -48,16 +52,12 @@ controllerB = pygame.joystick.Joystick(1)
 controllerA.init()
 controllerB.init()
 
-options = RGBMatrixOptions()
-options.hardware_mapping = 'adafruit-hat'
-options.rows = 64
-options.cols = 64
-options.chain_length = 2
-options.brightness = 50
-options.gpio_slowdown = 4
+# one event drain per frame; every pad read below comes from this snapshot
+inp = InputState([controllerA, controllerB])
+controllerA, controllerB = inp.pads
 
-matrix = RGBMatrix(options=options)
-canvas = matrix.CreateFrameCanvas()
+matrix, canvas = create_matrix(brightness=50)
+fb = FrameBuffer(128, 64)  # kept between frames: only cells whose look changed are redrawn
 
 # -------------------------------------------------
 # CONSTANTS
@@ -100,22 +100,7 @@ GEM_WEIGHTS = [60, 30, 10]  # 1s common, 4s rare
 # -------------------------------------------------
 
 def clear_rect(cv, x0, y0, w, h):
-    for yy in range(y0, y0 + h):
-        for xx in range(x0, x0 + w):
-            cv.SetPixel(xx, yy, 0, 0, 0)
-
-def draw_icon_scaled(cv, pixel_x, pixel_y, icon, color, scale=1):
-    # icon is 8x8; scale is int >= 1
-    for y in range(8):
-        for x in range(8):
-            if icon[y][x] == 1:
-                for sy in range(scale):
-                    for sx in range(scale):
-                        cv.SetPixel(
-                            pixel_x + x * scale + sx,
-                            pixel_y + y * scale + sy,
-                            color.red, color.green, color.blue
-                        )
+    cv.fill_rect(x0, y0, w, h, (0, 0, 0))
 
 def draw_scoreboard(canvas, score_p1, score_p2):
     clear_rect(canvas, SCORE_X0, 0, PANEL_W, PANEL_H)
@@ -124,28 +109,19 @@ def draw_scoreboard(canvas, score_p1, score_p2):
     s1 = max(0, min(99, score_p1))
     s2 = max(0, min(99, score_p2))
 
-    # Split into digits
-    p1_tens = s1 // 10
-    p1_ones = s1 % 10
-    p2_tens = s2 // 10
-    p2_ones = s2 % 10
-
     scale = 3                     # smaller digits
-    digit_w = 8 * scale           # 24px
     digit_h = 8 * scale           # 24px
 
     # --- Player 1 (top row) ---
     y1 = 6
     x1 = SCORE_X0 + 8
 
-    draw_icon_scaled(canvas, x1, y1, DIGITS_8x8[p1_tens], Color(255, 0, 0), scale)
-    draw_icon_scaled(canvas, x1 + digit_w, y1, DIGITS_8x8[p1_ones], Color(255, 0, 0), scale)
+    draw_number(canvas, x1, y1, s1, Color(255, 0, 0), scale, digits=2, font="8x8")
 
     # --- Player 2 (bottom row) ---
     y2 = y1 + digit_h + 6
 
-    draw_icon_scaled(canvas, x1, y2, DIGITS_8x8[p2_tens], Color(0, 0, 255), scale)
-    draw_icon_scaled(canvas, x1 + digit_w, y2, DIGITS_8x8[p2_ones], Color(0, 0, 255), scale)
+    draw_number(canvas, x1, y2, s2, Color(0, 0, 255), scale, digits=2, font="8x8")
 
 
 def tile_to_pixel(tx, ty):
@@ -153,19 +129,36 @@ def tile_to_pixel(tx, ty):
 
 def draw_tile_fill(cv, tx, ty, color, checker=True):
     px, py = tile_to_pixel(tx, ty)
-    for yy in range(ICON_SIZE):
-        for xx in range(ICON_SIZE):
-            if (not checker) or ((xx + yy) % 2 == 0):
-                cv.SetPixel(px + xx, py + yy, color.red, color.green, color.blue)
+    draw_tile(cv, px, py, color, checker=checker, size=ICON_SIZE)  # cached stamp
 
 def draw_cursor_outline(cv, tx, ty, rgb):
     px, py = tile_to_pixel(tx, ty)
-    r, g, b = rgb
-    for i in range(ICON_SIZE):
-        cv.SetPixel(px + i, py + 0, r, g, b)
-        cv.SetPixel(px + i, py + (ICON_SIZE - 1), r, g, b)
-        cv.SetPixel(px + 0, py + i, r, g, b)
-        cv.SetPixel(px + (ICON_SIZE - 1), py + i, r, g, b)
+    draw_tile(cv, px, py, rgb, outline=True, size=ICON_SIZE)
+
+def draw_cell(fb, tx, ty, gem_value, outline):
+    px, py = tile_to_pixel(tx, ty)
+    clear_rect(fb, px, py, ICON_SIZE, ICON_SIZE)
+    if gem_value is not None:
+        draw_tile_fill(fb, tx, ty, gem_color(gem_value), checker=True)
+    if outline is not None:
+        draw_cursor_outline(fb, tx, ty, outline)
+
+def draw_field(fb, gems, cursors, score_p1, score_p2):
+    """
+    Redraw only the cells whose gem or cursor changed since the last frame, and the
+    scoreboard when a score did; everything else stays as it is in the frame.
+    cursors: [((x, y), rgb), ...] in draw order (a later cursor covers an earlier one)
+    """
+    gem_at = {(g["x"], g["y"]): g["value"] for g in gems}
+    outline_at = {cell: rgb for cell, rgb in cursors}
+    for ty in range(BOARD_SIZE):
+        for tx in range(BOARD_SIZE):
+            look = (gem_at.get((tx, ty)), outline_at.get((tx, ty)))
+            if fb.changed(("cell", tx, ty), look):
+                draw_cell(fb, tx, ty, *look)
+
+    if fb.changed("score", (score_p1, score_p2)):
+        draw_scoreboard(fb, score_p1, score_p2)
 
 def gem_color(value):
     if value == 1:
@@ -184,32 +177,26 @@ def pick_gem_value():
 def next_spawn_time(now):
     return now + random.uniform(SPAWN_INTERVAL_MIN, SPAWN_INTERVAL_MAX)
 
-def new_gem(now, forbidden_cells, occupied_cells):
+def new_gem(now, forbidden_cells, free_cells):
     # choose a random empty cell not under cursors and not already holding a gem
-    candidates = []
-    for y in range(BOARD_SIZE):
-        for x in range(BOARD_SIZE):
-            if (x, y) in forbidden_cells:
-                continue
-            if (x, y) in occupied_cells:
-                continue
-            candidates.append((x, y))
-    if not candidates:
+    cell = free_cells.pop(exclude=forbidden_cells)
+    if cell is None:
         return None
 
-    x, y = random.choice(candidates)
+    x, y = cell
     value = pick_gem_value()
     lifetime = random.uniform(GEM_LIFETIME_MIN, GEM_LIFETIME_MAX)
     return {"x": x, "y": y, "value": value, "expires": now + lifetime}
 
 def reset_game():
-    now = time.time()
+    now = clock()
     return {
         "p1": {"x": 2, "y": 3, "last_move": now},
         "p2": {"x": 5, "y": 3, "last_move": now},
         "score1": 0,
         "score2": 0,
         "gems": [],  # list of {x,y,value,expires}
+        "free": FreeCells.grid(BOARD_SIZE, BOARD_SIZE),  # cells without a gem
         "next_spawn": next_spawn_time(now),
         "over": False,
         "winner": 0,
@@ -225,8 +212,8 @@ game = reset_game()
 exit_mgr = ExitOnBack([controllerA, controllerB], back_btn=BACK_BTN, quit_only=False)
 
 while True:
-    pygame.event.pump()
-    now = time.time()
+    inp.poll()
+    now = clock()
 
     # EXIT
     if exit_mgr.should_exit():
@@ -246,26 +233,16 @@ while True:
             game = reset_game()
             game["last_action"] = now
 
-        # draw
-        canvas.Clear()
-        # draw gems (optional: still show frozen field)
-        for g in game["gems"]:
-            draw_tile_fill(canvas, g["x"], g["y"], gem_color(g["value"]), checker=True)
-
-        # draw cursors (blink winner brighter)
+        # draw (frozen field; blink winner brighter)
         blink = int(now * 3) % 2 == 0
-        if game["winner"] == 1 and blink:
-            draw_cursor_outline(canvas, game["p1"]["x"], game["p1"]["y"], (255, 255, 255))
-        else:
-            draw_cursor_outline(canvas, game["p1"]["x"], game["p1"]["y"], (255, 0, 0))
-
-        if game["winner"] == 2 and blink:
-            draw_cursor_outline(canvas, game["p2"]["x"], game["p2"]["y"], (255, 255, 255))
-        else:
-            draw_cursor_outline(canvas, game["p2"]["x"], game["p2"]["y"], (0, 0, 255))
-
-        draw_scoreboard(canvas, game["score1"], game["score2"])
-        canvas = matrix.SwapOnVSync(canvas)
+        p1_col = (255, 255, 255) if game["winner"] == 1 and blink else (255, 0, 0)
+        p2_col = (255, 255, 255) if game["winner"] == 2 and blink else (0, 0, 255)
+        cursors = [
+            ((game["p1"]["x"], game["p1"]["y"]), p1_col),
+            ((game["p2"]["x"], game["p2"]["y"]), p2_col),
+        ]
+        draw_field(fb, game["gems"], cursors, game["score1"], game["score2"])
+        canvas = fb.present(matrix, canvas)
         continue
 
     # -------------------------------------------------
@@ -277,21 +254,7 @@ while True:
         if now - p["last_move"] < MOVE_DELAY:
             return
 
-        lx = ctrl.get_axis(axis_x)
-        ly = ctrl.get_axis(axis_y)
-
-        dx = 0
-        dy = 0
-
-        if lx > DEADZONE:
-            dx = 1
-        elif lx < -DEADZONE:
-            dx = -1
-
-        if ly > DEADZONE:
-            dy = 1
-        elif ly < -DEADZONE:
-            dy = -1
+        dx, dy = ctrl.dir8(DEADZONE, axis_x, axis_y)
 
         if dx != 0 or dy != 0:
             p["x"] = max(0, min(7, p["x"] + dx))
@@ -304,15 +267,20 @@ while True:
     # -------------------------------------------------
     # GEM DESPAWN
     # -------------------------------------------------
-    game["gems"] = [g for g in game["gems"] if now < g["expires"]]
+    alive = []
+    for g in game["gems"]:
+        if now < g["expires"]:
+            alive.append(g)
+        else:
+            game["free"].add((g["x"], g["y"]))
+    game["gems"] = alive
 
     # -------------------------------------------------
     # GEM SPAWN (NOT UNDER CURSORS)
     # -------------------------------------------------
     if now >= game["next_spawn"] and len(game["gems"]) < MAX_GEMS_ON_BOARD:
         forbidden = {(game["p1"]["x"], game["p1"]["y"]), (game["p2"]["x"], game["p2"]["y"])}
-        occupied = {(g["x"], g["y"]) for g in game["gems"]}
-        gem = new_gem(now, forbidden, occupied)
+        gem = new_gem(now, forbidden, game["free"])
         if gem is not None:
             game["gems"].append(gem)
         game["next_spawn"] = next_spawn_time(now)
@@ -328,6 +296,7 @@ while True:
         for g in game["gems"]:
             if g["x"] == px and g["y"] == py:
                 collected += g["value"]
+                game["free"].add((px, py))
             else:
                 remaining.append(g)
         game["gems"] = remaining
@@ -353,20 +322,14 @@ while True:
     # -------------------------------------------------
     # DRAW
     # -------------------------------------------------
-    canvas.Clear()
-
-    # draw gems
-    for g in game["gems"]:
-        draw_tile_fill(canvas, g["x"], g["y"], gem_color(g["value"]), checker=True)
-
     # draw cursors with a pulse (so they stand out)
     pulse = 1
     b = int(60 + 195 * pulse)
 
-    draw_cursor_outline(canvas, game["p1"]["x"], game["p1"]["y"], (b, 0, 0))
-    draw_cursor_outline(canvas, game["p2"]["x"], game["p2"]["y"], (0, 0, b))
-
-    # scoreboard
-    draw_scoreboard(canvas, game["score1"], game["score2"])
+    cursors = [
+        ((game["p1"]["x"], game["p1"]["y"]), (b, 0, 0)),
+        ((game["p2"]["x"], game["p2"]["y"]), (0, 0, b)),
+    ]
+    draw_field(fb, game["gems"], cursors, game["score1"], game["score2"])
 
-    canvas = matrix.SwapOnVSync(canvas)
+    canvas = fb.present(matrix, canvas)
@@ -0,0 +1,210 @@
+# bench.py
+# Headless frame-time benchmark for the LED matrix games.
+#
+# Runs each top-level game against the fakes in Utils/fake_hw.py (no Pi, panels
+# or pads needed) for N frames with scripted stick input, then reports
+# mean/p95/p99 frame time split into update / draw / swap plus SetPixel calls.
+#
+# Usage (from the repo root):
+#   python3 -m Utils.bench                       # all games
+#   python3 -m Utils.bench Snake.py active.py --frames 600
+#   python3 -m Utils.bench --json bench.json     # save a baseline
+#   python3 -m Utils.bench --compare bench.json  # diff against a baseline
+#   python3 -m Utils.bench SpaceInvaders.py --replay /tmp/led_SpaceInvaders_123.rec
+#                                                # recorded match as the input (LED_RECORD=1)
+#   python3 -m Utils.bench --latency --vsync 60      # + input-to-photon latency per game
+
+import os
+import sys
+import json
+import glob
+import runpy
+import argparse
+import traceback
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SKIP = {"menu.py"}  # not a game (and imports via the games. package on the Pi)
+
+FB_DRAW_METHODS = (
+    "SetPixel", "set_px", "fill_rect", "hline", "vline", "rect_outline",
+    "points", "line", "blit", "blit_mask", "text",
+)
+
+
+def pct(values, q):
+    if not values:
+        return 0.0
+    s = sorted(values)
+    i = min(len(s) - 1, max(0, int(round(q / 100.0 * (len(s) - 1)))))
+    return s[i]
+
+
+def mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def find_games():
+    out = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "*.py"))):
+        if os.path.basename(path) in SKIP:
+            continue
+        out.append(os.path.basename(path))
+    return out
+
+
+def instrument_framebuffer(hw):
+    """Framebuffer drawing counts as 'draw' too (it never touches the canvas until present)."""
+    from Utils.framebuffer import FrameBuffer
+
+    for name in FB_DRAW_METHODS:
+        orig = getattr(FrameBuffer, name)
+
+        def wrapped(self, *args, _orig=orig, **kwargs):
+            hw.stats.mark_draw()
+            return _orig(self, *args, **kwargs)
+
+        setattr(FrameBuffer, name, wrapped)
+
+
+def run_game(hw, filename, frames, warmup, script):
+    hw.reset(max_frames=frames, warmup=warmup, script=script)
+    path = os.path.join(ROOT, filename)
+    error = None
+    from Utils import latency
+    latency.launching(filename)  # run_path() leaves sys.argv on the bench
+    try:
+        runpy.run_path(path, run_name="__main__")
+        error = "game loop returned"
+    except BaseException as e:
+        from Utils.fake_hw import BenchDone
+        if isinstance(e, BenchDone):
+            pass
+        elif isinstance(e, KeyboardInterrupt):
+            raise
+        elif isinstance(e, SystemExit) and os.environ.get("LED_REPLAY"):
+            error = "replay ended"
+        else:
+            error = "".join(traceback.format_exception_only(type(e), e)).strip()
+
+    st = hw.stats
+    ms = lambda v: v * 1000.0
+    return {
+        "game": filename,
+        "frames": len(st.total_s),
+        "error": error,
+        "mean_ms": ms(mean(st.total_s)),
+        "p95_ms": ms(pct(st.total_s, 95)),
+        "p99_ms": ms(pct(st.total_s, 99)),
+        "update_mean_ms": ms(mean(st.update_s)),
+        "update_p95_ms": ms(pct(st.update_s, 95)),
+        "draw_mean_ms": ms(mean(st.draw_s)),
+        "draw_p95_ms": ms(pct(st.draw_s, 95)),
+        "swap_mean_ms": ms(mean(st.swap_s)),
+        "swap_p95_ms": ms(pct(st.swap_s, 95)),
+        "setpixel_per_frame": mean(st.setpixel),
+        "setimage_per_frame": mean(st.setimage),
+        "axis_reads": hw.axis_reads,
+        "button_reads": hw.button_reads,
+        "latency": latency_summary(filename),
+    }
+
+
+def latency_summary(filename):
+    """{kind: [presses, mean ms, max ms]} from the game's LED_LATENCY probe (empty when off)."""
+    from Utils import latency
+    p = latency.probe
+    if p is None or p.game != filename:
+        return {}
+    p.flush()
+    return {k: list(v) for k, v in p.summary().items()}
+
+
+def print_table(results, baseline=None):
+    hdr = f"{'game':<18}{'frames':>7}{'mean':>8}{'p95':>8}{'p99':>8}{'upd':>8}{'draw':>8}{'swap':>8}{'setpx/f':>10}"
+    if baseline:
+        hdr += f"{'d.mean':>9}{'d.p95':>9}"
+    print(hdr)
+    print("-" * len(hdr))
+    for r in results:
+        if r["error"] and not r["frames"]:
+            print(f"{r['game']:<18}  ERROR: {r['error']}")
+            continue
+        line = (
+            f"{r['game']:<18}{r['frames']:>7}"
+            f"{r['mean_ms']:>8.2f}{r['p95_ms']:>8.2f}{r['p99_ms']:>8.2f}"
+            f"{r['update_mean_ms']:>8.2f}{r['draw_mean_ms']:>8.2f}{r['swap_mean_ms']:>8.2f}"
+            f"{r['setpixel_per_frame']:>10.0f}"
+        )
+        if baseline:
+            b = baseline.get(r["game"])
+            if b and b.get("mean_ms"):
+                dm = 100.0 * (r["mean_ms"] - b["mean_ms"]) / b["mean_ms"]
+                dp = 100.0 * (r["p95_ms"] - b["p95_ms"]) / b["p95_ms"] if b.get("p95_ms") else 0.0
+                line += f"{dm:>+8.1f}%{dp:>+8.1f}%"
+        if r["error"]:
+            line += f"  ({r['error']})"
+        print(line)
+    print("times in ms; update/draw/swap are means")
+
+    if any(r.get("latency") for r in results):
+        print()
+        print(f"{'game':<18}{'kind':>8}{'presses':>9}{'mean':>8}{'max':>8}")
+        for r in results:
+            for kind, (n, mean_ms, max_ms) in sorted(r["latency"].items()):
+                print(f"{r['game']:<18}{kind:>8}{n:>9}{mean_ms:>8.1f}{max_ms:>8.1f}")
+        print("input-to-photon latency in ms (arrival -> SwapOnVSync returned)")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Headless LED matrix game benchmark")
+    ap.add_argument("games", nargs="*", help="game files (default: every top-level game)")
+    ap.add_argument("--frames", type=int, default=300, help="measured frames per game")
+    ap.add_argument("--warmup", type=int, default=30, help="frames to run before measuring")
+    ap.add_argument("--script", default="wander", help="scripted input: idle | wander")
+    ap.add_argument("--seed", type=int, default=1, help="seed for scripted input and random")
+    ap.add_argument("--replay", help="play this input recording (Utils/replay.py) flat out instead of --script")
+    ap.add_argument("--latency", action="store_true", help="probe input-to-photon latency (Utils/latency.py)")
+    ap.add_argument("--vsync", type=float, default=0.0, help="emulate a panel refresh rate in Hz (0 = off)")
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("--compare", help="baseline JSON from an earlier --json run")
+    args = ap.parse_args(argv)
+
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+
+    from Utils import fake_hw
+    hw = fake_hw.install(num_pads=2, vsync_hz=args.vsync)
+    instrument_framebuffer(hw)
+
+    if args.latency:
+        os.environ["LED_LATENCY"] = os.environ.get("LED_LATENCY") or "/tmp/led_latency_bench.json"
+
+    if args.replay:
+        os.environ["LED_REPLAY"] = os.path.abspath(args.replay)
+        os.environ["LED_REPLAY_FAST"] = "1"
+
+    import random
+    from Utils import replay
+    results = []
+    for g in (args.games or find_games()):
+        random.seed(args.seed)
+        replay.rng.seed(args.seed)  # a replayed session re-seeds it from the file
+        script_cls = fake_hw.SCRIPTS[args.script]
+        script = script_cls(seed=args.seed) if script_cls is fake_hw.WanderScript else script_cls()
+        results.append(run_game(hw, os.path.basename(g), args.frames, args.warmup, script))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {r["game"]: r for r in json.load(f)["results"]}
+
+    print_table(results, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"frames": args.frames, "script": args.script, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# connect4.py
+# Bitboard Connect Four engine + alpha-beta AI that thinks in a worker process.
+#
+# Board bits: column c, row r (0 = bottom) -> bit c*(ROWS+1) + r.
+# Each column gets one spare bit on top so shifts never wrap into the next
+# column. A position is two ints: one per player's stones.
+
+import time
+import signal
+import multiprocessing as mp
+
+COLS = 7
+ROWS = 6
+H1 = ROWS + 1
+
+COL_BITS = (1 << ROWS) - 1
+BOTTOM = sum(1 << (c * H1) for c in range(COLS))
+BOARD_MASK = BOTTOM * COL_BITS
+MOVE_ORDER = (3, 2, 4, 1, 5, 0, 6)  # centre first: better cutoffs
+
+WIN_SCORE = 1000  # win on move n scores WIN_SCORE - n (sooner is better)
+
+
+# ----------------------------
+# BOARD
+# ----------------------------
+def cell_bit(col, row):
+    return 1 << (col * H1 + row)
+
+def column_mask(col):
+    return COL_BITS << (col * H1)
+
+def drop_row(mask, col):
+    """Row a chip dropped in col lands on, or None if the column is full."""
+    n = ((mask >> (col * H1)) & COL_BITS).bit_count()
+    return n if n < ROWS else None
+
+def is_full(mask):
+    return mask == BOARD_MASK
+
+def has_four(b):
+    """Four in a row anywhere in b: vertical, horizontal, both diagonals."""
+    for s in (1, H1, H1 - 1, H1 + 1):
+        m = b & (b >> s)
+        if m & (m >> (2 * s)):
+            return True
+    return False
+
+def winning_cells(b, mask):
+    """Empty cells that would complete four for the stones in b."""
+    # vertical
+    r = (b << 1) & (b << 2) & (b << 3)
+    # horizontal and both diagonals: 3 stones + the gap at either end or inside
+    for s in (H1, H1 - 1, H1 + 1):
+        p = (b << s) & (b << (2 * s))
+        r |= p & (b << (3 * s))
+        r |= p & (b >> s)
+        p = (b >> s) & (b >> (2 * s))
+        r |= p & (b << s)
+        r |= p & (b >> (3 * s))
+    return r & (BOARD_MASK ^ mask)
+
+
+# ----------------------------
+# SEARCH (negamax + alpha-beta)
+# ----------------------------
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class _Timeout(Exception):
+    pass
+
+
+class Searcher:
+    def __init__(self, tt_limit=400000):
+        """
+        tt_limit: transposition table entries kept between moves before it is reset
+
+        Positions are (cur, mask): stones of the side to move and all stones.
+        """
+        self.tt = {}  # cur + mask -> (depth, flag, value, best_col)
+        self.tt_limit = tt_limit
+        self.deadline = 0.0
+        self.nodes = 0
+
+    def evaluate(self, cur, mask):
+        # open threats: cells that would win for me minus for the opponent
+        return winning_cells(cur, mask).bit_count() - winning_cells(cur ^ mask, mask).bit_count()
+
+    def ordered_moves(self, cur, mask, possible, first=None):
+        moves = []
+        for c in MOVE_ORDER:
+            m = possible & column_mask(c)
+            if m:
+                # moves that open more of my own threats first
+                moves.append((winning_cells(cur | m, mask).bit_count(), c == first, c, m))
+        moves.sort(key=lambda t: (t[1], t[0]), reverse=True)
+        return [(c, m) for _, _, c, m in moves]
+
+    def negamax(self, cur, mask, moves, depth, alpha, beta):
+        self.nodes += 1
+        if not self.nodes & 1023 and time.perf_counter() > self.deadline:
+            raise _Timeout()
+
+        if moves >= COLS * ROWS:
+            return 0
+
+        possible = (mask + BOTTOM) & BOARD_MASK
+        if winning_cells(cur, mask) & possible:
+            return WIN_SCORE - (moves + 1)
+
+        # the opponent threatens to win next move: block or lose
+        opp_win = winning_cells(cur ^ mask, mask)
+        forced = possible & opp_win
+        if forced:
+            if forced & (forced - 1):
+                return -(WIN_SCORE - (moves + 2))  # two threats: can't block both
+            possible = forced
+        possible &= ~(opp_win >> 1)  # never play right under an opponent's winning cell
+        if not possible:
+            return -(WIN_SCORE - (moves + 2))
+
+        if depth <= 0:
+            return self.evaluate(cur, mask)
+
+        key = cur + mask
+        hit = self.tt.get(key)
+        first = None
+        if hit is not None:
+            h_depth, flag, value, first = hit
+            if h_depth >= depth:
+                if flag == EXACT:
+                    return value
+                if flag == LOWER and value >= beta:
+                    return value
+                if flag == UPPER and value <= alpha:
+                    return value
+
+        a0 = alpha
+        best = -WIN_SCORE * 2
+        best_col = None
+        for c, m in self.ordered_moves(cur, mask, possible, first):
+            v = -self.negamax(cur ^ mask, mask | m, moves + 1, depth - 1, -beta, -alpha)
+            if v > best:
+                best, best_col = v, c
+            if v > alpha:
+                alpha = v
+            if alpha >= beta:
+                break
+
+        flag = UPPER if best <= a0 else LOWER if best >= beta else EXACT
+        self.tt[key] = (depth, flag, best, best_col)
+        return best
+
+    def best_move(self, cur, mask, moves, budget):
+        """
+        Iterative deepening until the time budget (seconds) runs out.
+        Returns the column from the deepest finished search.
+        """
+        if len(self.tt) > self.tt_limit:
+            self.tt.clear()
+        self.deadline = time.perf_counter() + budget
+        self.nodes = 0
+
+        possible = (mask + BOTTOM) & BOARD_MASK
+        legal = [c for c in MOVE_ORDER if possible & column_mask(c)]
+        if not legal:
+            return None
+        for c in legal:
+            if has_four(cur | (possible & column_mask(c))):
+                return c  # win now
+
+        best_col = legal[0]
+        for depth in range(1, COLS * ROWS - moves + 1):
+            try:
+                hit = self.tt.get(cur + mask)
+                alpha, beta = -WIN_SCORE * 2, WIN_SCORE * 2
+                d_best, d_col = -WIN_SCORE * 2, None
+                for c, m in self.ordered_moves(cur, mask, possible, hit[3] if hit else best_col):
+                    v = -self.negamax(cur ^ mask, mask | m, moves + 1, depth - 1, -beta, -alpha)
+                    if v > d_best:
+                        d_best, d_col = v, c
+                    alpha = max(alpha, v)
+            except _Timeout:
+                break
+            best_col = d_col
+            self.tt[cur + mask] = (depth, EXACT, d_best, d_col)
+            if abs(d_best) >= WIN_SCORE - COLS * ROWS:
+                break  # result is proven, deeper search won't change it
+        return best_col
+
+
+# ----------------------------
+# WORKER PROCESS
+# ----------------------------
+def ai_worker(conn, parent_end):
+    """Runs in the child: (req_id, cur, mask, moves, budget) in -> (req_id, col) out."""
+    # forked from a pygame process: SDL's SIGTERM hook would make terminate() a no-op,
+    # and Ctrl+C belongs to the game
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # drop our copy of the game's end, so its close() reaches us as EOF
+    parent_end.close()
+
+    searcher = Searcher()
+    while True:
+        try:
+            req_id, cur, mask, moves, budget = conn.recv()
+        except (EOFError, OSError):
+            return  # game closed its end
+        conn.send((req_id, searcher.best_move(cur, mask, moves, budget)))
+
+
+class AIPlayer:
+    def __init__(self, budget=0.6):
+        """
+        budget: seconds the worker may think per move
+
+        The search runs in a separate process so the game loop keeps drawing
+        at full rate; ask with request(), then poll() once per frame.
+        """
+        self.budget = float(budget)
+        self.conn, child = mp.Pipe()
+        self.proc = mp.Process(target=ai_worker, args=(child, self.conn), daemon=True)
+        self.proc.start()
+        child.close()
+        self.req_id = 0
+        self.pending = False
+
+    def request(self, cur, mask, moves):
+        """Start thinking about the position (cur = stones of the side to move)."""
+        self.req_id += 1
+        self.pending = True
+        self.conn.send((self.req_id, cur, mask, moves, self.budget))
+
+    def cancel(self):
+        """Forget the pending request (its answer is dropped when it arrives)."""
+        self.req_id += 1
+        self.pending = False
+
+    def poll(self):
+        """Chosen column once the worker has answered, else None. Never blocks."""
+        while self.conn.poll():
+            req_id, col = self.conn.recv()
+            if req_id == self.req_id:
+                self.pending = False
+                return col
+        return None
+
+    def close(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        self.proc.join(timeout=0.2)
+        if self.proc.is_alive():
+            self.proc.terminate()
@@ -0,0 +1,402 @@
+# display.py
+# Display daemon: one long-lived process owns the RGBMatrix and shows frames
+# that games write into a double-buffered framebuffer in shared memory.
+#
+# Games (and menu.py) keep calling create_matrix() / SwapOnVSync() as before;
+# when the daemon is running they get a RemoteMatrix instead of the panels, so
+# switching games never re-inits the GPIO refresh thread or blanks the panel,
+# and a game that crashes mid-frame just leaves the last good frame on screen.
+#
+# Shared file (mmap'd, /dev/shm/led_matrix by default):
+#   header   8 x uint32: magic, width, height, daemon pid, seq, shown, brightness, -
+#   frame 0  height x width x 3 uint8
+#   frame 1  height x width x 3 uint8
+#   text 0   uint32 length + "font\tx\ty\tr\tg\tb\ttext\n" lines (BDF text for frame 0)
+#   text 1   same for frame 1
+#
+# A client writes the slot (seq + 1) & 1, then bumps seq. The daemon copies
+# slot seq & 1 and re-checks seq afterwards (seqlock): if seq moved at all
+# the client may already be writing seq + 2 into that slot, so the copy is
+# thrown away and the newer frame taken instead. After SwapOnVSync the daemon sets
+# shown = seq, which is what the client's SwapOnVSync waits for.
+#
+# Run on the Pi:         python3 -m Utils.display
+# Run without panels:    python3 -m Utils.display --fake /tmp/led.ppm
+#   (every shown frame is written to that file as a PPM image)
+
+import os
+import sys
+import mmap
+import time
+import signal
+import argparse
+
+import numpy as np
+
+W, H = 128, 64
+
+DEFAULT_PATH = "/dev/shm/led_matrix" if os.path.isdir("/dev/shm") else "/tmp/led_matrix"
+
+MAGIC = 0x4644454C  # "LEDF"
+HDR_WORDS = 8
+MAGIC_I, W_I, H_I, PID_I, SEQ_I, SHOWN_I, BRIGHT_I = range(7)
+HDR_BYTES = HDR_WORDS * 4
+TEXT_BYTES = 4096
+SEQ_MASK = 0xFFFFFFFF
+
+POLL_S = 0.001       # daemon: how often to look for a new frame
+SWAP_TIMEOUT = 0.1   # client: stop waiting for "shown" if the daemon is gone
+
+
+def region_size(width=W, height=H):
+    return HDR_BYTES + 2 * width * height * 3 + 2 * TEXT_BYTES
+
+
+def seq_after(a, b):
+    """a is b or newer (uint32 counters, wrap-safe)."""
+    return ((a - b) & SEQ_MASK) < 0x80000000
+
+
+# ----------------------------
+# SHARED REGION
+# ----------------------------
+class SharedFrames:
+    def __init__(self, path=DEFAULT_PATH, create=False, width=W, height=H):
+        """
+        path: the mmap'd file both sides open
+        create: daemon side; sizes and initialises the file
+
+        .hdr is the uint32 header, .frames[i] the HxWx3 slot views.
+        """
+        self.path = path
+        flags = os.O_RDWR | (os.O_CREAT if create else 0)
+        fd = os.open(path, flags, 0o666)
+        try:
+            if create:
+                os.ftruncate(fd, region_size(width, height))
+            size = os.fstat(fd).st_size
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        self.hdr = np.frombuffer(self.mm, dtype=np.uint32, count=HDR_WORDS)
+        if create:
+            self.hdr[:] = 0
+            self.hdr[W_I] = width
+            self.hdr[H_I] = height
+            self.hdr[PID_I] = os.getpid()
+            self.hdr[BRIGHT_I] = 50
+            self.hdr[MAGIC_I] = MAGIC  # last: clients ignore a half-initialised file
+        elif self.hdr[MAGIC_I] != MAGIC or size < region_size(int(self.hdr[W_I]), int(self.hdr[H_I])):
+            raise ValueError(f"{path} is not a display framebuffer")
+
+        self.w = int(self.hdr[W_I])
+        self.h = int(self.hdr[H_I])
+        fb = self.w * self.h * 3
+        self.frames = [
+            np.frombuffer(self.mm, dtype=np.uint8, count=fb, offset=HDR_BYTES + i * fb).reshape(self.h, self.w, 3)
+            for i in range(2)
+        ]
+        self._text_off = [HDR_BYTES + 2 * fb + i * TEXT_BYTES for i in range(2)]
+
+    def daemon_alive(self):
+        pid = int(self.hdr[PID_I])
+        if not pid:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass  # alive, just owned by another user
+        return True
+
+    def write_text(self, slot, lines):
+        data = "".join(lines).encode("utf-8")[:TEXT_BYTES - 4]
+        off = self._text_off[slot]
+        self.mm[off + 4:off + 4 + len(data)] = data
+        self.mm[off:off + 4] = len(data).to_bytes(4, "little")
+
+    def read_text(self, slot):
+        off = self._text_off[slot]
+        n = int.from_bytes(self.mm[off:off + 4], "little")
+        if not n:
+            return []
+        return self.mm[off + 4:off + 4 + n].decode("utf-8", "replace").splitlines()
+
+    def close(self):
+        self.hdr = None
+        self.frames = None
+        try:
+            self.mm.close()
+        except BufferError:
+            pass  # a caller still holds a frame view; the mapping goes with it
+
+
+# ----------------------------
+# CLIENT (what games get from create_matrix)
+# ----------------------------
+class RemoteCanvas:
+    """FrameCanvas look-alike backed by a local NumPy frame; sent on SwapOnVSync."""
+
+    def __init__(self, width=W, height=H):
+        self.width = width
+        self.height = height
+        self.pixels = np.zeros((height, width, 3), dtype=np.uint8)
+        self.text = []  # queued BDF text lines, drawn by the daemon over the frame
+
+    def SetPixel(self, x, y, r, g, b):
+        x = int(x); y = int(y)
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.pixels[y, x] = (r, g, b)
+
+    def Clear(self):
+        self.pixels[:] = 0
+        self.text.clear()
+
+    def Fill(self, r, g, b):
+        self.pixels[:] = (r, g, b)
+        self.text.clear()
+
+    def SetImage(self, image, offset_x=0, offset_y=0, unsafe=True):
+        src = np.asarray(image.convert("RGB") if hasattr(image, "convert") else image, dtype=np.uint8)
+        x0 = max(0, int(offset_x)); y0 = max(0, int(offset_y))
+        x1 = min(self.width, int(offset_x) + src.shape[1]); y1 = min(self.height, int(offset_y) + src.shape[0])
+        if x1 > x0 and y1 > y0:
+            self.pixels[y0:y1, x0:x1] = src[y0 - int(offset_y):y1 - int(offset_y), x0 - int(offset_x):x1 - int(offset_x)]
+
+    def DrawText(self, font, x, y, color, text):
+        """graphics.DrawText stand-in (see matrix_utils.draw_bdf_text). Returns the advance."""
+        from Utils.matrix_utils import font_path
+        path = font_path(font)
+        if path is not None:
+            text = text.replace("\t", " ").replace("\n", " ")
+            self.text.append(f"{path}\t{int(x)}\t{int(y)}\t{color.red}\t{color.green}\t{color.blue}\t{text}\n")
+        return sum(font.CharacterWidth(ord(c)) for c in text)
+
+
+class RemoteMatrix:
+    def __init__(self, shared, brightness=50):
+        """
+        shared: an attached SharedFrames
+
+        RGBMatrix look-alike: SwapOnVSync publishes the canvas to the daemon and
+        blocks until it is on the panel, so games keep their vsync pacing.
+        """
+        self.shared = shared
+        self.width = shared.w
+        self.height = shared.h
+        self.brightness = brightness
+        self._prev = None
+
+    @property
+    def brightness(self):
+        return int(self.shared.hdr[BRIGHT_I])
+
+    @brightness.setter
+    def brightness(self, value):
+        self.shared.hdr[BRIGHT_I] = max(0, min(100, int(value)))
+
+    def CreateFrameCanvas(self):
+        return RemoteCanvas(self.width, self.height)
+
+    def publish(self, pixels, text=()):
+        hdr = self.shared.hdr
+        seq = (int(hdr[SEQ_I]) + 1) & SEQ_MASK
+        slot = seq & 1
+        self.shared.frames[slot][:] = pixels
+        self.shared.write_text(slot, text)
+        hdr[SEQ_I] = seq
+        return seq
+
+    def SwapOnVSync(self, canvas, framerate_fraction=1):
+        seq = self.publish(canvas.pixels, canvas.text)
+        canvas.text = []
+
+        # like the real SwapOnVSync: return once the frame is on the panel
+        deadline = time.perf_counter() + SWAP_TIMEOUT * max(1, framerate_fraction)
+        while not seq_after(int(self.shared.hdr[SHOWN_I]), seq):
+            if time.perf_counter() > deadline:
+                break
+            time.sleep(POLL_S / 2)
+
+        back = self._prev or self.CreateFrameCanvas()
+        self._prev = canvas
+        return back
+
+    def Clear(self):
+        self.publish(np.zeros((self.height, self.width, 3), dtype=np.uint8))
+
+
+def connect(path=DEFAULT_PATH, brightness=50):
+    """RemoteMatrix on the running daemon's framebuffer, or None when there is no daemon."""
+    if not os.path.exists(path):
+        return None
+    try:
+        shared = SharedFrames(path)
+    except (OSError, ValueError):
+        return None
+    if not shared.daemon_alive():
+        shared.close()
+        return None
+    return RemoteMatrix(shared, brightness=brightness)
+
+
+# ----------------------------
+# FAKE MATRIX (file-backed, for testing without panels)
+# ----------------------------
+class FileMatrix:
+    def __init__(self, path, width=W, height=H, brightness=50):
+        """
+        path: every SwapOnVSync writes the frame there as a PPM image (atomic replace)
+
+        Just enough RGBMatrix for the daemon: canvases, SwapOnVSync, Clear, brightness.
+        """
+        self.path = path
+        self.width = width
+        self.height = height
+        self.brightness = brightness
+        self.frames = 0
+        self.front = RemoteCanvas(width, height)
+
+    def CreateFrameCanvas(self):
+        return RemoteCanvas(self.width, self.height)
+
+    def SwapOnVSync(self, canvas, framerate_fraction=1):
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(b"P6 %d %d 255\n" % (self.width, self.height))
+            f.write(canvas.pixels.tobytes())
+        os.replace(tmp, self.path)
+        self.frames += 1
+        back, self.front = self.front, canvas
+        return back
+
+    def Clear(self):
+        self.front.Clear()
+
+
+def read_ppm(path):
+    """Frame written by FileMatrix as an HxWx3 array."""
+    with open(path, "rb") as f:
+        data = f.read()
+    head, _, body = data.partition(b"\n")
+    _, w, h, _ = head.split()
+    return np.frombuffer(body, dtype=np.uint8).reshape(int(h), int(w), 3)
+
+
+# ----------------------------
+# DAEMON
+# ----------------------------
+class Daemon:
+    def __init__(self, matrix, path=DEFAULT_PATH):
+        """
+        matrix: the real RGBMatrix (or a FileMatrix)
+
+        The panel's own refresh thread keeps scanning whatever was swapped last,
+        so nothing blanks while clients come and go.
+        """
+        self.matrix = matrix
+        self.shared = SharedFrames(path, create=True, width=matrix.width, height=matrix.height)
+        self.shared.hdr[BRIGHT_I] = matrix.brightness
+        self.canvas = matrix.CreateFrameCanvas()
+        self.last = int(self.shared.hdr[SEQ_I])
+        self.running = True
+        self._fonts = {}
+
+    def grab(self):
+        """(seq, frame copy, text lines) of the newest complete frame, or None."""
+        hdr = self.shared.hdr
+        while True:
+            seq = int(hdr[SEQ_I])
+            if seq == self.last:
+                return None
+            slot = seq & 1
+            frame = self.shared.frames[slot].copy()
+            text = self.shared.read_text(slot)
+            if int(hdr[SEQ_I]) == seq:
+                return seq, frame, text
+            # seq moved while we copied: the client may be rewriting this slot
+            # already (publish() writes before it bumps seq), so take the newer frame
+
+    def draw_text(self, lines):
+        try:
+            from rgbmatrix import graphics
+            from Utils.matrix_utils import load_font
+        except ImportError:
+            return
+        for line in lines:
+            try:
+                path, x, y, r, g, b, s = line.split("\t", 6)
+                graphics.DrawText(self.canvas, load_font(path), int(x), int(y),
+                                  graphics.Color(int(r), int(g), int(b)), s)
+            except (ValueError, TypeError, OSError):
+                pass  # bad line or no BDF support on this canvas (FileMatrix)
+
+    def step(self):
+        got = self.grab()
+        if got is None:
+            return False
+        seq, frame, text = got
+
+        bright = int(self.shared.hdr[BRIGHT_I])
+        if bright != self.matrix.brightness:
+            self.matrix.brightness = bright
+
+        if hasattr(self.canvas, "pixels"):
+            self.canvas.pixels[:] = frame
+        else:
+            from PIL import Image
+            self.canvas.SetImage(Image.fromarray(frame, "RGB"), 0, 0)
+        if text:
+            self.draw_text(text)
+        self.canvas = self.matrix.SwapOnVSync(self.canvas)
+
+        self.last = seq
+        self.shared.hdr[SHOWN_I] = seq
+        return True
+
+    def serve(self):
+        while self.running:
+            if not self.step():
+                time.sleep(POLL_S)
+
+    def close(self):
+        self.shared.hdr[PID_I] = 0
+        path = self.shared.path
+        self.shared.close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Own the LED matrix and show frames from shared memory.")
+    ap.add_argument("--path", default=DEFAULT_PATH, help="shared framebuffer file")
+    ap.add_argument("--brightness", type=int, default=50)
+    ap.add_argument("--fake", metavar="PPM", help="no panels: write each frame to this file instead")
+    args = ap.parse_args(argv)
+
+    if args.fake:
+        matrix = FileMatrix(args.fake, brightness=args.brightness)
+    else:
+        from Utils.matrix_utils import build_matrix
+        matrix = build_matrix(brightness=args.brightness)
+
+    daemon = Daemon(matrix, args.path)
+
+    def stop(*_):
+        daemon.running = False
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"Display: serving {matrix.width}x{matrix.height} on {args.path}", flush=True)
+    try:
+        daemon.serve()
+    finally:
+        daemon.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
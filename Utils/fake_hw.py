@@ -0,0 +1,392 @@
+# fake_hw.py
+# Stand-ins for rgbmatrix and pygame joysticks so games run headless (benchmarks, CI).
+
+import os
+import sys
+import time
+import types
+import random
+
+W, H = 128, 64
+NUM_AXES = 6
+NUM_BUTTONS = 11
+
+# Xbox-style pygame mapping used by the games
+A_BTN = 0
+B_BTN = 1
+X_BTN = 2
+Y_BTN = 3
+BACK_BTN = 6
+AXIS_LT = 2
+AXIS_RT = 5
+
+
+class BenchDone(BaseException):
+    """Raised from SwapOnVSync once the frame budget is used up (BaseException so games can't swallow it)."""
+
+
+# ----------------------------
+# STATS
+# ----------------------------
+class FrameStats:
+    def __init__(self, max_frames=None, warmup=0):
+        """
+        Per-frame timings split at three marks:
+        - update: previous swap returned -> first draw call
+        - draw:   first draw call -> SwapOnVSync called
+        - swap:   inside SwapOnVSync
+        """
+        self.max_frames = max_frames
+        self.warmup = int(warmup)
+        self.frame = 0
+        self.last_swap_end = time.perf_counter()
+        self.draw_start = None
+
+        self.update_s = []
+        self.draw_s = []
+        self.swap_s = []
+        self.total_s = []
+        self.setpixel = []
+        self.setimage = []
+
+        self._setpixel = 0
+        self._setimage = 0
+
+    def mark_draw(self):
+        if self.draw_start is None:
+            self.draw_start = time.perf_counter()
+
+    def count_setpixel(self):
+        self._setpixel += 1
+        self.mark_draw()
+
+    def count_setimage(self):
+        self._setimage += 1
+        self.mark_draw()
+
+    def swap_begin(self):
+        t = time.perf_counter()
+        if self.draw_start is None:
+            self.draw_start = t
+        return t
+
+    def swap_end(self, t_begin):
+        t = time.perf_counter()
+        if self.frame >= self.warmup:
+            self.update_s.append(self.draw_start - self.last_swap_end)
+            self.draw_s.append(t_begin - self.draw_start)
+            self.swap_s.append(t - t_begin)
+            self.total_s.append(t - self.last_swap_end)
+            self.setpixel.append(self._setpixel)
+            self.setimage.append(self._setimage)
+        self._setpixel = 0
+        self._setimage = 0
+        self.draw_start = None
+        self.frame += 1
+        self.last_swap_end = time.perf_counter()
+        if self.max_frames is not None and self.frame >= self.max_frames + self.warmup:
+            raise BenchDone()
+
+
+# ----------------------------
+# FAKE rgbmatrix
+# ----------------------------
+class Color:
+    def __init__(self, red=0, green=0, blue=0):
+        self.red = red
+        self.green = green
+        self.blue = blue
+
+
+class Font:
+    def __init__(self):
+        self.height = 10
+        self.baseline = 8
+        self.path = None
+
+    def LoadFont(self, path):
+        self.path = path
+
+    def CharacterWidth(self, ch):
+        return 6
+
+
+class FrameCanvas:
+    def __init__(self, hw, width=W, height=H):
+        self.hw = hw
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(width * height * 3)
+
+    def SetPixel(self, x, y, r, g, b):
+        self.hw.stats.count_setpixel()
+        if 0 <= x < self.width and 0 <= y < self.height:
+            i = (int(y) * self.width + int(x)) * 3
+            self.pixels[i:i + 3] = bytes((int(r) & 255, int(g) & 255, int(b) & 255))
+
+    def Clear(self):
+        self.hw.stats.mark_draw()
+        self.pixels[:] = bytes(len(self.pixels))
+
+    def Fill(self, r, g, b):
+        self.hw.stats.mark_draw()
+        self.pixels[:] = bytes((r, g, b)) * (self.width * self.height)
+
+    def SetImage(self, image, offset_x=0, offset_y=0, unsafe=True):
+        self.hw.stats.count_setimage()
+        data = image.convert("RGB").tobytes()
+        iw, ih = image.size
+        if offset_x == 0 and offset_y == 0 and (iw, ih) == (self.width, self.height):
+            self.pixels[:] = data
+            return
+        # a patch (FrameBuffer dirty tiles): clip and copy row by row
+        x0 = max(0, int(offset_x)); x1 = min(self.width, int(offset_x) + iw)
+        y0 = max(0, int(offset_y)); y1 = min(self.height, int(offset_y) + ih)
+        if x1 <= x0:
+            return
+        n = (x1 - x0) * 3
+        for y in range(y0, y1):
+            src = ((y - int(offset_y)) * iw + (x0 - int(offset_x))) * 3
+            dst = (y * self.width + x0) * 3
+            self.pixels[dst:dst + n] = data[src:src + n]
+
+
+class RGBMatrixOptions:
+    def __init__(self):
+        self.hardware_mapping = "regular"
+        self.rows = 32
+        self.cols = 32
+        self.chain_length = 1
+        self.parallel = 1
+        self.brightness = 100
+        self.gpio_slowdown = 1
+
+
+class RGBMatrix:
+    def __init__(self, options=None, hw=None):
+        self.hw = hw
+        options = options or RGBMatrixOptions()
+        self.width = options.cols * options.chain_length
+        self.height = options.rows * options.parallel
+        self.brightness = options.brightness
+        self.front = FrameCanvas(hw, self.width, self.height)
+
+    def CreateFrameCanvas(self):
+        return FrameCanvas(self.hw, self.width, self.height)
+
+    def SwapOnVSync(self, canvas, framerate_fraction=1):
+        t0 = self.hw.stats.swap_begin()
+        if self.hw.vsync_hz > 0:
+            time.sleep(1.0 / self.hw.vsync_hz)
+        back, self.front = self.front, canvas
+        self.hw.stats.swap_end(t0)
+        return back
+
+    def Clear(self):
+        self.front.pixels[:] = bytes(len(self.front.pixels))
+
+    def SetPixel(self, x, y, r, g, b):
+        self.front.SetPixel(x, y, r, g, b)
+
+
+def DrawText(canvas, font, x, y, color, text):
+    canvas.hw.stats.mark_draw()
+    return len(text) * font.CharacterWidth(0)
+
+
+def DrawLine(canvas, x0, y0, x1, y1, color):
+    canvas.hw.stats.mark_draw()
+
+
+def DrawCircle(canvas, x, y, r, color):
+    canvas.hw.stats.mark_draw()
+
+
+# ----------------------------
+# FAKE JOYSTICKS
+# ----------------------------
+class FakeJoystick:
+    def __init__(self, hw, index):
+        self.hw = hw
+        self.index = int(index)
+        self.inited = False
+
+    def init(self):
+        self.inited = True
+
+    def quit(self):
+        self.inited = False
+
+    def get_init(self):
+        return self.inited
+
+    def get_id(self):
+        return self.index
+
+    def get_instance_id(self):
+        return self.index
+
+    def get_name(self):
+        return f"Fake Pad {self.index}"
+
+    def get_numaxes(self):
+        return NUM_AXES
+
+    def get_numbuttons(self):
+        return NUM_BUTTONS
+
+    def get_numhats(self):
+        return 1
+
+    def get_hat(self, i):
+        return (0, 0)
+
+    def get_axis(self, i):
+        self.hw.axis_reads += 1
+        return self.hw.script.axis(self.index, i, self.hw.stats.frame)
+
+    def get_button(self, i):
+        self.hw.button_reads += 1
+        return self.hw.script.button(self.index, i, self.hw.stats.frame)
+
+
+class IdleScript:
+    """Sticks centered, nothing pressed, triggers released."""
+
+    def axis(self, pad, i, frame):
+        return -1.0 if i in (AXIS_LT, AXIS_RT) else 0.0
+
+    def button(self, pad, i, frame):
+        return 0
+
+
+class WanderScript:
+    """
+    Deterministic 'busy player' input: the stick picks a new direction every
+    `hold` frames, A/X/Y/B pulse on different periods, RT mostly held.
+    BACK is never pressed so the game never hands off to the menu.
+    """
+
+    DIRS = [(0.0, 0.0), (1.0, 0.0), (-1.0, 0.0), (0.0, 1.0), (0.0, -1.0), (0.7, 0.7), (-0.7, 0.7)]
+
+    def __init__(self, seed=1, hold=20):
+        self.seed = seed
+        self.hold = hold
+
+    def _dir(self, pad, frame):
+        r = random.Random(self.seed * 1000003 + pad * 7919 + frame // self.hold)
+        return r.choice(self.DIRS)
+
+    def axis(self, pad, i, frame):
+        if i in (0, 1):
+            return self._dir(pad, frame)[i]
+        if i == AXIS_RT:
+            return 1.0 if (frame // 45) % 4 != 3 else -1.0
+        if i == AXIS_LT:
+            return 1.0 if (frame // 45) % 4 == 3 else -1.0
+        return 0.0
+
+    def button(self, pad, i, frame):
+        if i == A_BTN:
+            return 1 if frame % 10 < 3 else 0
+        if i == X_BTN:
+            return 1 if (frame + 5 * pad) % 37 < 2 else 0
+        if i == Y_BTN:
+            return 1 if (frame + 11 * pad) % 53 < 2 else 0
+        if i == B_BTN:
+            return 1 if (frame + 17 * pad) % 29 < 2 and pad == 1 else 0
+        return 0
+
+
+SCRIPTS = {
+    "idle": IdleScript,
+    "wander": WanderScript,
+}
+
+
+# ----------------------------
+# INSTALL
+# ----------------------------
+class FakeHW:
+    def __init__(self, num_pads=2, script=None, max_frames=None, warmup=0, vsync_hz=0.0):
+        """
+        num_pads: how many fake controllers pygame reports
+        script: object with axis(pad, i, frame) / button(pad, i, frame)
+        max_frames: raise BenchDone after this many measured frames
+        vsync_hz: if > 0, SwapOnVSync sleeps like a panel refresh would
+        """
+        self.num_pads = int(num_pads)
+        self.script = script or WanderScript()
+        self.stats = FrameStats(max_frames=max_frames, warmup=warmup)
+        self.vsync_hz = float(vsync_hz)
+        self.axis_reads = 0
+        self.button_reads = 0
+        self.joy_state = {}   # (pad, "a"/"b", i) -> last value sent as an event
+
+    def reset(self, max_frames=None, warmup=0, script=None):
+        self.stats = FrameStats(max_frames=max_frames, warmup=warmup)
+        if script is not None:
+            self.script = script
+        self.axis_reads = 0
+        self.button_reads = 0
+        self.joy_state = {}
+
+    def joy_events(self):
+        """JOYAXISMOTION / JOYBUTTONDOWN / JOYBUTTONUP for what the script changed since the last call."""
+        import pygame
+        out = []
+        frame = self.stats.frame
+        for pad in range(self.num_pads):
+            for i in range(NUM_AXES):
+                v = self.script.axis(pad, i, frame)
+                if self.joy_state.get((pad, "a", i)) != v:
+                    self.joy_state[(pad, "a", i)] = v
+                    out.append(pygame.event.Event(pygame.JOYAXISMOTION, instance_id=pad, joy=pad, axis=i, value=v))
+            for i in range(NUM_BUTTONS):
+                v = self.script.button(pad, i, frame)
+                if self.joy_state.get((pad, "b", i), 0) != v:
+                    self.joy_state[(pad, "b", i)] = v
+                    kind = pygame.JOYBUTTONDOWN if v else pygame.JOYBUTTONUP
+                    out.append(pygame.event.Event(kind, instance_id=pad, joy=pad, button=i))
+        return out
+
+
+def make_rgbmatrix_module(hw):
+    """Build importable 'rgbmatrix' and 'rgbmatrix.graphics' modules bound to hw."""
+    graphics = types.ModuleType("rgbmatrix.graphics")
+    graphics.Color = Color
+    graphics.Font = Font
+    graphics.DrawText = DrawText
+    graphics.DrawLine = DrawLine
+    graphics.DrawCircle = DrawCircle
+
+    mod = types.ModuleType("rgbmatrix")
+    mod.RGBMatrixOptions = RGBMatrixOptions
+    mod.RGBMatrix = lambda options=None: RGBMatrix(options=options, hw=hw)
+    mod.FrameCanvas = FrameCanvas
+    mod.graphics = graphics
+    mod.__path__ = []  # mark as package so "from rgbmatrix.graphics import ..." resolves
+    return mod, graphics
+
+
+def install(num_pads=2, script=None, max_frames=None, warmup=0, vsync_hz=0.0):
+    """
+    Put the fakes on the import path and into pygame.joystick.
+    Call before importing/running a game. Returns the FakeHW hub.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    hw = FakeHW(num_pads=num_pads, script=script, max_frames=max_frames, warmup=warmup, vsync_hz=vsync_hz)
+
+    mod, graphics = make_rgbmatrix_module(hw)
+    sys.modules["rgbmatrix"] = mod
+    sys.modules["rgbmatrix.graphics"] = graphics
+
+    import pygame
+    pygame.joystick.Joystick = lambda i: FakeJoystick(hw, i)
+    pygame.joystick.get_count = lambda: hw.num_pads
+
+    real_get = pygame.event.get
+    pygame.event.get = lambda *a, **kw: real_get(*a, **kw) + hw.joy_events()
+    return hw
@@ -0,0 +1,263 @@
+# framebuffer.py
+# NumPy-backed frame for the LED matrix, pushed to the panel in one SetImage call.
+#
+# Draw calls mark the 8x8 tiles they touch as dirty. push() only sends the tiles
+# the target canvas hasn't got yet (the canvas SwapOnVSync handed back still
+# holds what was drawn into it two frames ago), so a frame where nothing was
+# drawn costs no SetImage at all. Games whose screen rarely changes keep the
+# frame between loops and redraw a region only when fb.changed() says its look
+# did, instead of clear() + redraw everything.
+
+import numpy as np
+from PIL import Image
+
+W, H = 128, 64
+TILE = 8           # dirty tracking granularity (the grid games' cell size)
+FULL_PUSH = 0.5    # above this share of dirty tiles one whole-frame SetImage is cheaper
+
+
+def rgb(c):
+    """Accept an rgbmatrix Color or an (r, g, b) tuple."""
+    if isinstance(c, tuple):
+        return c
+    return (c.red, c.green, c.blue)
+
+
+def mask_from_rows(rows):
+    """
+    Convert glyph/icon rows into a bool mask.
+    rows: list of "101" strings or list of [1,0,1] lists
+    """
+    return np.array([[v in ("1", 1, True) for v in row] for row in rows], dtype=bool)
+
+
+def tile_rects(tiles, tile=TILE):
+    """
+    Bool tile grid -> list of (x, y, w, h) pixel rects covering the True tiles:
+    runs along each tile row, merged downwards while the run stays the same.
+    """
+    out = []
+    open_runs = {}  # (tx0, tx1) -> first tile row
+    rows = tiles.shape[0]
+    for ty in range(rows + 1):
+        runs = set()
+        if ty < rows:
+            edges = np.diff(np.r_[0, tiles[ty].astype(np.int8), 0])
+            runs = set(zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist()))
+        for run in [r for r in open_runs if r not in runs]:
+            ty0 = open_runs.pop(run)
+            out.append((run[0] * tile, ty0 * tile, (run[1] - run[0]) * tile, (ty - ty0) * tile))
+        for run in runs:
+            open_runs.setdefault(run, ty)
+    return out
+
+
+class FrameBuffer:
+    def __init__(self, width: int = W, height: int = H):
+        """
+        width/height: full canvas size (both panels as one, 128x64 by default)
+
+        Draw into .pixels (HxWx3 uint8) with the vectorized helpers below, then call
+        present() once per frame instead of SetPixel per pixel.
+        """
+        self.w = int(width)
+        self.h = int(height)
+        self.pixels = np.zeros((self.h, self.w, 3), dtype=np.uint8)
+        self._text = []  # queued (font, x, y, color, text) drawn after SetImage
+
+        th = (self.h + TILE - 1) // TILE
+        tw = (self.w + TILE - 1) // TILE
+        self.dirty = np.ones((th, tw), dtype=bool)  # tiles drawn since the last push
+        self._stale = {}   # id(canvas) -> tiles that canvas hasn't been sent yet
+        self._looks = {}   # region -> what changed() last saw drawn there
+
+    # ----------------------------
+    # CANVAS-COMPATIBLE
+    # ----------------------------
+
+    def Clear(self):
+        self.clear()
+
+    def SetPixel(self, x, y, r, g, b):
+        x = int(x); y = int(y)
+        if 0 <= x < self.w and 0 <= y < self.h:
+            self.pixels[y, x] = (r, g, b)
+            self.dirty[y // TILE, x // TILE] = True
+
+    # ----------------------------
+    # DIRTY TRACKING
+    # ----------------------------
+
+    def _touch(self, x0, y0, x1, y1):
+        """Mark the tiles under the (already clipped) pixel rect [x0, x1) x [y0, y1)."""
+        self.dirty[y0 // TILE:(y1 + TILE - 1) // TILE, x0 // TILE:(x1 + TILE - 1) // TILE] = True
+
+    def changed(self, region, look):
+        """
+        True if look differs from what was last recorded for region (remembering it).
+        look: anything comparable that fully describes what the region shows
+
+            if fb.changed(("cell", x, y), (value, cursor_color)):
+                draw_cell(fb, x, y)     # erase + redraw just that cell
+        """
+        if region in self._looks and self._looks[region] == look:
+            return False
+        self._looks[region] = look
+        return True
+
+    def forget(self, *regions):
+        """These regions (default: all) count as changed again, e.g. after a clear()."""
+        if not regions:
+            self._looks.clear()
+        for region in regions:
+            self._looks.pop(region, None)
+
+    def invalidate(self):
+        """Resend the whole frame to every canvas (after a brightness change, matrix.Clear(), ...)."""
+        self.dirty[:] = True
+
+    # ----------------------------
+    # PRIMITIVES
+    # ----------------------------
+
+    def _clip(self, x, y, w, h):
+        x0 = max(0, int(x)); y0 = max(0, int(y))
+        x1 = min(self.w, int(x) + int(w)); y1 = min(self.h, int(y) + int(h))
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1, y1
+
+    def clear(self, c=None):
+        if c is None:
+            self.pixels.fill(0)
+        else:
+            self.pixels[:, :] = rgb(c)
+        self._text.clear()
+        self.dirty[:] = True
+
+    def set_px(self, x, y, c):
+        x = int(x); y = int(y)
+        if 0 <= x < self.w and 0 <= y < self.h:
+            self.pixels[y, x] = rgb(c)
+            self.dirty[y // TILE, x // TILE] = True
+
+    def fill_rect(self, x, y, w, h, c):
+        r = self._clip(x, y, w, h)
+        if r is None:
+            return
+        x0, y0, x1, y1 = r
+        self.pixels[y0:y1, x0:x1] = rgb(c)
+        self._touch(x0, y0, x1, y1)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect_outline(self, x, y, w, h, c):
+        self.hline(x, y, w, c)
+        self.hline(x, y + h - 1, w, c)
+        self.vline(x, y, h, c)
+        self.vline(x + w - 1, y, h, c)
+
+    def points(self, xs, ys, c):
+        """Plot many pixels at once. xs/ys: sequences or int arrays; c: one color or Nx3 array."""
+        xs = np.asarray(xs, dtype=np.int32).ravel()
+        ys = np.asarray(ys, dtype=np.int32).ravel()
+        keep = (xs >= 0) & (xs < self.w) & (ys >= 0) & (ys < self.h)
+        if isinstance(c, np.ndarray) and c.ndim == 2:
+            self.pixels[ys[keep], xs[keep]] = c[keep]
+        else:
+            self.pixels[ys[keep], xs[keep]] = rgb(c)
+        self.dirty[ys[keep] // TILE, xs[keep] // TILE] = True
+
+    def line(self, x0, y0, x1, y1, c, thickness=1):
+        """Straight line; thickness grows a square brush down/right from each point."""
+        n = max(abs(int(x1) - int(x0)), abs(int(y1) - int(y0))) + 1
+        xs = np.rint(np.linspace(x0, x1, n)).astype(np.int32)
+        ys = np.rint(np.linspace(y0, y1, n)).astype(np.int32)
+        if thickness > 1:
+            dx, dy = np.meshgrid(np.arange(thickness), np.arange(thickness))
+            xs = (xs[:, None] + dx.ravel()[None, :]).ravel()
+            ys = (ys[:, None] + dy.ravel()[None, :]).ravel()
+        self.points(xs, ys, c)
+
+    def blit(self, x, y, src, mask=None):
+        """
+        Copy an HxWx3 uint8 image onto the frame at (x, y), clipped to the screen.
+        mask: optional HxW bool array; only True pixels are copied.
+        """
+        sh, sw = src.shape[:2]
+        r = self._clip(x, y, sw, sh)
+        if r is None:
+            return
+        x0, y0, x1, y1 = r
+        sx0 = x0 - int(x); sy0 = y0 - int(y)
+        sx1 = sx0 + (x1 - x0); sy1 = sy0 + (y1 - y0)
+        dst = self.pixels[y0:y1, x0:x1]
+        if mask is None:
+            dst[:] = src[sy0:sy1, sx0:sx1]
+        else:
+            m = mask[sy0:sy1, sx0:sx1]
+            dst[m] = src[sy0:sy1, sx0:sx1][m]
+        self._touch(x0, y0, x1, y1)
+
+    def blit_mask(self, x, y, mask, c, scale=1):
+        """Paint color c wherever mask is True (glyphs, icons). scale: integer upscale."""
+        if scale > 1:
+            mask = np.kron(mask, np.ones((scale, scale), dtype=bool))
+        mh, mw = mask.shape
+        r = self._clip(x, y, mw, mh)
+        if r is None:
+            return
+        x0, y0, x1, y1 = r
+        sx0 = x0 - int(x); sy0 = y0 - int(y)
+        m = mask[sy0:sy0 + (y1 - y0), sx0:sx0 + (x1 - x0)]
+        self.pixels[y0:y1, x0:x1][m] = rgb(c)
+        self._touch(x0, y0, x1, y1)
+
+    # ----------------------------
+    # TEXT (BDF fonts stay on the C side)
+    # ----------------------------
+
+    def text(self, font, x, y, color, s):
+        """Queue graphics.DrawText; it is drawn over the frame when pushed."""
+        self._text.append((font, x, y, color, s))
+        self.dirty[:] = True  # lands on the canvas, not in pixels: resend everything
+
+    # ----------------------------
+    # OUTPUT
+    # ----------------------------
+
+    def to_image(self):
+        return Image.fromarray(self.pixels, "RGB")
+
+    def push(self, canvas):
+        """
+        Bring a FrameCanvas up to date with the frame (plus queued text): the whole
+        frame in one call, or only the tiles this canvas missed since it was last pushed.
+        """
+        for stale in self._stale.values():
+            stale |= self.dirty
+        self.dirty[:] = False
+        todo = self._stale.get(id(canvas))
+        self._stale[id(canvas)] = np.zeros_like(self.dirty)
+
+        if todo is None or todo.mean() > FULL_PUSH:
+            canvas.SetImage(self.to_image(), 0, 0)  # a canvas we haven't seen, or most of it changed
+        else:
+            for x, y, w, h in tile_rects(todo):
+                patch = np.ascontiguousarray(self.pixels[y:y + h, x:x + w])
+                canvas.SetImage(Image.fromarray(patch, "RGB"), x, y)
+        if self._text:
+            from Utils.matrix_utils import draw_bdf_text
+            for font, x, y, color, s in self._text:
+                draw_bdf_text(canvas, font, x, y, color, s)
+            self._text.clear()
+            self._stale[id(canvas)][:] = True  # text isn't in pixels: next time, overwrite it all
+
+    def present(self, matrix, canvas):
+        """push() + SwapOnVSync. Returns the new back canvas, like SwapOnVSync."""
+        self.push(canvas)
+        return matrix.SwapOnVSync(canvas)
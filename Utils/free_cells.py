@@ -0,0 +1,79 @@
+# free_cells.py
+# Set of free grid cells with O(1) add / remove / random pick (for spawners).
+
+import random
+
+
+class FreeCells:
+    def __init__(self, cells=()):
+        """
+        cells: initial free cells (any hashable, usually (x, y) tuples)
+
+        Cells live in a flat list plus a cell -> index map. Removing swaps the
+        last cell into the hole, so nothing ever shifts and choice() is one
+        randrange() no matter how full the board is.
+        """
+        self._cells = []
+        self._pos = {}
+        for c in cells:
+            self.add(c)
+
+    @classmethod
+    def grid(cls, w, h):
+        """Every (x, y) of a w x h board."""
+        return cls((x, y) for y in range(h) for x in range(w))
+
+    def __len__(self):
+        return len(self._cells)
+
+    def __contains__(self, cell):
+        return cell in self._pos
+
+    def __iter__(self):
+        return iter(self._cells)
+
+    # ----------------------------
+    # UPDATE
+    # ----------------------------
+
+    def add(self, cell):
+        if cell in self._pos:
+            return
+        self._pos[cell] = len(self._cells)
+        self._cells.append(cell)
+
+    def discard(self, cell):
+        i = self._pos.pop(cell, None)
+        if i is None:
+            return
+        last = self._cells.pop()
+        if i < len(self._cells):
+            self._cells[i] = last
+            self._pos[last] = i
+
+    # ----------------------------
+    # PICK
+    # ----------------------------
+
+    def choice(self, exclude=()):
+        """
+        Uniform random free cell, or None when there is none.
+        exclude: a few cells to skip this time (e.g. under the cursors); they stay free.
+        """
+        hidden = [c for c in exclude if c in self._pos]
+        for c in hidden:
+            self.discard(c)
+        try:
+            if not self._cells:
+                return None
+            return self._cells[random.randrange(len(self._cells))]
+        finally:
+            for c in hidden:
+                self.add(c)
+
+    def pop(self, exclude=()):
+        """choice() and mark the cell as taken."""
+        c = self.choice(exclude)
+        if c is not None:
+            self.discard(c)
+        return c
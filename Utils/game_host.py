@@ -0,0 +1,173 @@
+# game_host.py
+# Long-lived host: keeps pygame, the pads and the single RGBMatrix alive and
+# runs games in-process instead of exec'ing a fresh python3 per launch.
+#
+# Two kinds of game files are supported:
+#
+# 1) Module games (the game interface) define these top-level functions:
+#       init(host)          called once per launch (pads via host.input.pads, matrix via host)
+#       update(now, dt)     advance the game; return False to go back to the menu
+#       draw(fb)            draw the frame into the shared FrameBuffer
+#       teardown()          optional, called when leaving the game
+#    The host owns the loop, BACK handling and the swap.
+#
+# 2) Script games (everything written as "init at import + while True") are
+#    executed in a fresh namespace. create_matrix()/load_font() hand them the
+#    host's matrix and fonts, and ExitOnBack.handle() raises ReturnToMenu
+#    instead of exec'ing menu.py.
+
+import os
+import ast
+import sys
+import time
+import traceback
+
+import pygame
+
+from Utils import matrix_utils, latency, input_state, profiler
+from Utils.framebuffer import FrameBuffer
+from Utils.input_state import InputState
+from Utils.game_loop import clock
+
+BACK_BTN = 6
+
+_current = None  # the running GameHost, if any
+
+
+class ReturnToMenu(BaseException):
+    """Raised by ExitOnBack.handle() inside a host (BaseException so games' except Exception can't eat it)."""
+
+
+def current():
+    return _current
+
+
+class GameHost:
+    def __init__(self, games_dir, brightness=50):
+        """
+        games_dir: folder with the game files (added to sys.path so "from Utils..." works)
+        brightness: menu brightness; games may change it via create_matrix()
+        """
+        global _current
+        self.games_dir = games_dir
+        self.brightness = brightness
+        if games_dir not in sys.path:
+            sys.path.insert(0, games_dir)
+
+        pygame.init()
+        pygame.joystick.init()
+
+        self.matrix = matrix_utils.share(matrix_utils.open_matrix(brightness=brightness))
+        self.fb = FrameBuffer(self.matrix.width, self.matrix.height)
+        self._code = {}  # path -> (mtime, code, is_module_game)
+        self.input = None  # InputState of the running module game
+        self._probe = None  # latency probe to switch back to after a game
+        _current = self
+
+    # ----------------------------
+    # STATE
+    # ----------------------------
+
+    @property
+    def canvas(self):
+        """Current back canvas (games swap it, so always ask the host)."""
+        return self.matrix.back
+
+    def get_pads(self):
+        pads = []
+        for i in range(pygame.joystick.get_count()):
+            j = pygame.joystick.Joystick(i)
+            if not j.get_init():
+                j.init()
+            pads.append(j)
+        return pads
+
+    # ----------------------------
+    # LOADING
+    # ----------------------------
+
+    def _load(self, path):
+        mtime = os.path.getmtime(path)
+        hit = self._code.get(path)
+        if hit and hit[0] == mtime:
+            return hit[1], hit[2]
+
+        with open(path, "r", encoding="utf-8") as f:
+            src = f.read()
+        tree = ast.parse(src, filename=path)
+        funcs = {n.name for n in tree.body if isinstance(n, ast.FunctionDef)}
+        is_module_game = {"init", "update", "draw"} <= funcs
+        code = compile(tree, path, "exec")
+        self._code[path] = (mtime, code, is_module_game)
+        return code, is_module_game
+
+    # ----------------------------
+    # RUNNING
+    # ----------------------------
+
+    def launch(self, path):
+        """Run a game until it hands back to the menu. Never raises for game errors."""
+        t0 = time.perf_counter()
+        try:
+            code, is_module_game = self._load(path)
+        except Exception:
+            traceback.print_exc()
+            return
+
+        ns = {"__name__": "__main__", "__file__": path, "__builtins__": __builtins__}
+        self._probe = latency.probe  # the menu's; the game's create_matrix() replaces it
+        latency.launching(os.path.basename(path))  # exec() leaves sys.argv on the menu
+        print(f"Host: {os.path.basename(path)} loaded in {(time.perf_counter() - t0) * 1000:.1f} ms", flush=True)
+
+        try:
+            exec(code, ns)  # script games run their own loop right here
+            if is_module_game:
+                self._run_module_game(ns)
+        except ReturnToMenu:
+            pass
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                print(f"Host: {os.path.basename(path)} exited ({e.code})", flush=True)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self._after_game()
+
+    def _run_module_game(self, ns):
+        from Utils.menu_utils import ExitOnBack
+
+        self.input = InputState(self.get_pads())
+        exit_mgr = ExitOnBack(self.input.pads, back_btn=BACK_BTN, quit_only=False)
+        ns["init"](self)
+        try:
+            last_t = clock()
+            canvas = self.canvas
+            while True:
+                self.input.poll()
+                now = clock()
+                dt = max(0.0, now - last_t)
+                last_t = now
+
+                if exit_mgr.should_exit():
+                    exit_mgr.wait_for_release()
+                    return
+                if ns["update"](now, dt) is False:
+                    return
+
+                ns["draw"](self.fb)
+                canvas = self.fb.present(self.matrix, canvas)
+        finally:
+            self.input.close()
+            teardown = ns.get("teardown")
+            if teardown:
+                teardown()
+
+    def _after_game(self):
+        latency.launching(None)
+        latency.resume(self._probe)  # menu presses go to the menu's histogram again
+        self.matrix.brightness = self.brightness
+        self.matrix.Clear()
+        self.fb.clear()
+        input_state.stop_sampler()  # a script game's sampler; the menu's InputState starts its own
+        profiler.close_all()  # SIGUSR1 must not dump a finished game's frames
+        pygame.event.clear()
@@ -0,0 +1,71 @@
+# game_loop.py
+# Fixed-timestep loop timing shared by the games.
+#
+# The simulation always advances in steps of exactly 1/hz seconds, however long
+# a frame took: a slow frame runs a few steps to catch up instead of clamping
+# dt (which silently slowed the game down). Only past max_steps per frame is
+# time dropped, so one long stall can't snowball into ever longer frames.
+#
+#   loop = FixedStep(hz=60, max_steps=5)
+#   while True:
+#       now = clock()
+#       for dt in loop.steps(now):
+#           update(dt)
+#       draw(alpha=loop.alpha)   # optional: lerp(prev, cur, alpha) for smooth motion
+#       canvas = fb.present(matrix, canvas)
+
+import time
+
+clock = time.perf_counter  # the one clock games read (monotonic, sub-microsecond)
+
+
+def lerp(a, b, alpha):
+    return a + (b - a) * alpha
+
+
+class FixedStep:
+    def __init__(self, hz=60.0, max_steps=5):
+        """
+        hz: simulation steps per second; every update gets dt = 1/hz
+        max_steps: most steps run in one frame before the rest of the backlog is dropped
+        """
+        self.hz = float(hz)
+        self.dt = 1.0 / self.hz
+        self.max_steps = int(max_steps)
+        self.t = 0.0          # simulated seconds since reset()
+        self.dropped = 0.0    # seconds thrown away by the max_steps cap
+        self.reset()
+
+    def reset(self, now=None):
+        """Restart the accumulator from now (new round, after a pause or a long load)."""
+        self.last = clock() if now is None else now
+        self.acc = 0.0
+        self.tick_t = self.last   # while steps() runs: the time the current step was due
+
+    def advance(self, now=None):
+        """Account for the time since the last call; returns how many dt steps to run now."""
+        now = clock() if now is None else now
+        self.acc += max(0.0, now - self.last)
+        self.last = now
+
+        n = int(self.acc / self.dt)
+        if n > self.max_steps:
+            self.dropped += (n - self.max_steps) * self.dt
+            n = self.max_steps
+            self.acc %= self.dt   # keep the fraction, forget the whole steps we can't run
+        else:
+            self.acc -= n * self.dt
+        self.t += n * self.dt
+        return n
+
+    def steps(self, now=None):
+        """advance() as a loop: yields dt once per step to run (tick_t = that step's due time)."""
+        n = self.advance(now)
+        for k in range(n):
+            self.tick_t = self.last - self.acc - (n - 1 - k) * self.dt
+            yield self.dt
+
+    @property
+    def alpha(self):
+        """0..1: how far this frame is between the last simulated state and the next."""
+        return min(1.0, self.acc / self.dt)
@@ -0,0 +1,397 @@
+# input_state.py
+# One snapshot of every pad per frame, built from the joystick events that
+# pygame.event.get() drains, instead of a get_axis / get_button C call for
+# every query (the same button used to be read several times a frame).
+#
+#   inp = InputState([pad1, pad2])
+#   pad1, pad2 = inp.pads        # same get_axis / get_button API, now read from the snapshot
+#   while True:
+#       inp.poll()               # instead of pygame.event.pump()
+#       if pad1.pressed(A_BTN):  # went down since the last poll (a quick tap is never lost)
+#           ...
+#       dx, dy = pad2.direction(DEADZONE)
+#
+# Pads that never send events (the replay stand-ins) are read once per poll.
+#
+# Optional sampler: LED_INPUT_HZ=1000 (or sample_hz=1000) drains the event queue
+# on a background thread at that rate and stamps every event with clock() as it
+# arrives, instead of once per frame after SwapOnVSync has blocked. poll() then
+# applies the queued events in order; dir4_at(t) / axis_at(t) give the stick as
+# it was at time t (a tick's due time), and latency_report() sums up how long
+# presses waited between arriving and the poll() that handed them to the game.
+# SDL only promises event pumping on the thread that owns the video system, so
+# the sampler only runs headless on Linux (no window: the panels' setup, and the
+# fakes); elsewhere it is refused and poll() drains once per frame as usual.
+# While it runs it is the only code that touches pygame's event queue: use
+# pump() / stop_sampler() instead of pygame.event.pump() / before event.clear()
+# or pygame.quit().
+#
+# last_input / wait(timeout) are for idle screens (menu.py): how long nobody has
+# touched a pad, and a sleep that ends the moment a joystick event comes in.
+
+import os
+import sys
+import time
+import threading
+from collections import deque
+
+import pygame
+
+from Utils import latency
+from Utils.game_loop import clock
+
+DEADZONE = 0.4
+BACK_BTN = 6          # tagged "back" for the latency probe
+LATENCY_KEEP = 1000   # presses kept for latency_report()
+
+DEVICE_EVENTS = tuple(getattr(pygame, n) for n in ("JOYDEVICEADDED", "JOYDEVICEREMOVED") if hasattr(pygame, n))
+
+_sampler = None          # the one running Sampler (only one thread may drain the queue)
+_switch_interval = None  # sys.getswitchinterval() from before the sampler lowered it
+
+
+def _event_pad_id(e):
+    return getattr(e, "instance_id", getattr(e, "joy", None))
+
+
+# ----------------------------
+# SAMPLER THREAD
+# ----------------------------
+class Sampler(threading.Thread):
+    """Drains pygame's event queue at a fixed rate into a deque of (clock(), event)."""
+
+    def __init__(self, hz):
+        super().__init__(name="input-sampler", daemon=True)
+        self.hz = float(hz)
+        self.period = 1.0 / self.hz
+        self.queue = deque()
+        self.running = True
+
+    def run(self):
+        next_t = clock()
+        while self.running:
+            try:
+                events = pygame.event.get()
+            except pygame.error:
+                break  # pygame.quit() on the way out
+            for e in events:
+                self.queue.append((clock(), e))
+            next_t += self.period
+            delay = next_t - clock()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_t = clock()  # fell behind: don't burst to catch up
+
+    def stop(self):
+        self.running = False
+        if self.is_alive() and self is not threading.current_thread():
+            self.join(0.1)
+
+
+def sampler_supported():
+    """Event pumping off the main thread is only safe without a window system (Linux, headless)."""
+    if not sys.platform.startswith("linux"):
+        return False
+    if not pygame.display.get_init():
+        return True
+    return pygame.display.get_driver() in ("dummy", "offscreen")
+
+
+def start_sampler(hz):
+    """Start the sampler at hz; None (per-frame polling) where it isn't supported."""
+    global _sampler, _switch_interval
+    stop_sampler()
+    if not sampler_supported():
+        print("InputState: no input sampler with this video driver, polling per frame", flush=True)
+        return None
+    # the sampler needs the GIL every period, not after the default 5 ms switch interval
+    _switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(min(_switch_interval, 1.0 / hz))
+    _sampler = Sampler(hz)
+    _sampler.start()
+    return _sampler
+
+
+def stop_sampler():
+    """Stop the sampler (if any) and give the process its switch interval back."""
+    global _sampler, _switch_interval
+    if _sampler is not None:
+        _sampler.stop()
+        _sampler = None
+    if _switch_interval is not None:
+        sys.setswitchinterval(_switch_interval)
+        _switch_interval = None
+
+
+def pump():
+    """pygame.event.pump() for code without an InputState; the sampler already drains when it runs."""
+    if _sampler is None:
+        pygame.event.pump()
+
+
+# ----------------------------
+# PAD VIEW
+# ----------------------------
+class PadView:
+    """Joystick-shaped view of one pad in the snapshot; anything else goes to the real pad."""
+
+    def __init__(self, state, index, pad):
+        self.state = state
+        self.index = index
+        self.pad = pad
+        self.axes = [0.0] * pad.get_numaxes()
+        self.buttons = [0] * pad.get_numbuttons()
+        self.went_down = set()   # buttons that went down / up since the last poll
+        self.went_up = set()
+        self.axes0 = self.axes   # axes at the start of the poll (sampler: for axis_at)
+        self.moves = []          # sampler: (t, axis, value) applied by the last poll
+        self.dir_seen = (0, 0)   # latency probe: stick direction at the last poll
+        self.stick_seen = (0, 0)  # last_input: dir8 at the last poll
+
+    def __getattr__(self, name):
+        return getattr(self.pad, name)  # init, get_name, get_id, ...
+
+    def resync(self):
+        """Read the whole pad directly (start-up, replugged pad, polled stand-ins)."""
+        self.axes = [self.pad.get_axis(i) for i in range(len(self.axes))]
+        was = self.buttons
+        self.buttons = [int(bool(self.pad.get_button(i))) for i in range(len(was))]
+        return was
+
+    # joystick API, from the snapshot
+    def get_axis(self, i):
+        return self.axes[i] if i < len(self.axes) else 0.0
+
+    def get_button(self, i):
+        return self.buttons[i] if i < len(self.buttons) else 0
+
+    # ----------------------------
+    # QUERIES
+    # ----------------------------
+
+    def held(self, btn):
+        return bool(self.get_button(btn))
+
+    def pressed(self, btn):
+        """Went down since the last poll."""
+        return btn in self.went_down
+
+    def released(self, btn):
+        return btn in self.went_up
+
+    def down(self, btn):
+        """Held now, or pressed and already released since the last poll (a sub-frame tap)."""
+        return self.held(btn) or btn in self.went_down
+
+    def axis(self, i, deadzone=DEADZONE):
+        """One axis; inside the deadzone it reads as 0.0."""
+        v = self.get_axis(i)
+        return v if abs(v) >= deadzone else 0.0
+
+    def direction(self, deadzone=DEADZONE, ax=0, ay=1):
+        """Stick (x, y), each component deadzoned like axis()."""
+        return self.axis(ax, deadzone), self.axis(ay, deadzone)
+
+    def dir8(self, deadzone=DEADZONE, ax=0, ay=1):
+        """Stick as (dx, dy) in -1/0/1 per axis (grid cursors, diagonals allowed)."""
+        x, y = self.direction(deadzone, ax, ay)
+        return (x > 0) - (x < 0), (y > 0) - (y < 0)
+
+    def dir4(self, deadzone=DEADZONE, ax=0, ay=1):
+        """Stronger stick axis as (dx, dy) in -1/0/1 (grid movement); (0, 0) inside the deadzone."""
+        return _dir4(self.get_axis(ax), self.get_axis(ay), deadzone)
+
+    # ----------------------------
+    # TIMED QUERIES (sampler)
+    # ----------------------------
+
+    def axis_at(self, i, t):
+        """Raw axis i as it was at time t within the last poll (the current value without the sampler)."""
+        if not self.moves:
+            return self.get_axis(i)
+        v = self.axes0[i] if i < len(self.axes0) else 0.0
+        for mt, mi, mv in self.moves:
+            if mt > t:
+                break
+            if mi == i:
+                v = mv
+        return v
+
+    def dir4_at(self, t, deadzone=DEADZONE, ax=0, ay=1):
+        return _dir4(self.axis_at(ax, t), self.axis_at(ay, t), deadzone)
+
+
+def _dir4(x, y, deadzone):
+    if abs(x) < deadzone and abs(y) < deadzone:
+        return (0, 0)
+    if abs(x) > abs(y):
+        return (1 if x > 0 else -1, 0)
+    return (0, 1 if y > 0 else -1)
+
+
+# ----------------------------
+# STATE
+# ----------------------------
+class InputState:
+    def __init__(self, pads, sample_hz=None):
+        """
+        pads: pygame joysticks (or stand-ins with the same API), in player order
+        sample_hz: run the background sampler at this rate (default: LED_INPUT_HZ, 0 = off)
+        """
+        self.pads = [PadView(self, i, p) for i, p in enumerate(pads)]
+        self.polled = [v for v in self.pads if getattr(v.pad, "polled", False)]
+        self.events = []   # non-joystick events from the last poll, for anyone who wants them
+        self.latency = deque(maxlen=LATENCY_KEEP)  # sampler: press arrival -> poll, seconds
+        self.last_input = clock()  # last poll that saw a button edge or the stick change direction
+        self._early = []   # events wait() took off the queue, applied by the next poll()
+        self._map_ids()
+        for v in self.pads:
+            v.resync()
+
+        if sample_hz is None:
+            sample_hz = float(os.environ.get("LED_INPUT_HZ", "0") or 0)
+        # a new game's state replaces the last one's: its sampler must not keep eating events
+        stop_sampler()
+        self.sampler = start_sampler(sample_hz) if sample_hz > 0 else None
+
+    def _map_ids(self):
+        self.by_id = {}
+        for v in self.pads:
+            if v in self.polled:
+                continue
+            try:
+                self.by_id[v.pad.get_instance_id()] = v
+            except AttributeError:
+                self.by_id[v.pad.get_id()] = v  # pygame 1.9
+            except pygame.error:
+                pass  # unplugged
+
+    def _drain(self):
+        """(timestamp, event) pairs since the last poll; None stamps = 'now' (no sampler)."""
+        if self.sampler is None:
+            events = self._early + pygame.event.get()
+            self._early = []
+            return [(None, e) for e in events]
+        q = self.sampler.queue
+        return [q.popleft() for _ in range(len(q))]
+
+    def poll(self):
+        """Apply every event since the last poll to the snapshot; call once per frame."""
+        now = clock()
+        for v in self.pads:
+            if v.went_down:
+                v.went_down = set()
+            if v.went_up:
+                v.went_up = set()
+            if v.moves:
+                v.moves = []
+            v.axes0 = v.axes[:] if self.sampler is not None else v.axes
+
+        self.events = []
+        probe = latency.probe
+        for t, e in self._drain():
+            kind = e.type
+            if kind == pygame.JOYAXISMOTION:
+                v = self.by_id.get(_event_pad_id(e))
+                if v is not None and e.axis < len(v.axes):
+                    v.axes[e.axis] = e.value
+                    if t is not None:
+                        v.moves.append((t, e.axis, e.value))
+            elif kind == pygame.JOYBUTTONDOWN:
+                v = self.by_id.get(_event_pad_id(e))
+                if v is not None and e.button < len(v.buttons):
+                    v.buttons[e.button] = 1
+                    v.went_down.add(e.button)
+                    if t is not None:
+                        self.latency.append(now - t)
+                    if probe is not None:
+                        probe.arrived(now if t is None else t, "back" if e.button == BACK_BTN else "button")
+            elif kind == pygame.JOYBUTTONUP:
+                v = self.by_id.get(_event_pad_id(e))
+                if v is not None and e.button < len(v.buttons):
+                    v.buttons[e.button] = 0
+                    v.went_up.add(e.button)
+            elif kind in DEVICE_EVENTS:
+                self._map_ids()
+                for v in self.by_id.values():
+                    v.resync()
+            else:
+                self.events.append(e)
+
+        for v in self.polled:
+            was = v.resync()
+            for b, (old, new) in enumerate(zip(was, v.buttons)):
+                if new and not old:
+                    v.went_down.add(b)
+                    if probe is not None:
+                        probe.arrived(now, "back" if b == BACK_BTN else "button")
+                elif old and not new:
+                    v.went_up.add(b)
+
+        for v in self.pads:
+            d = v.dir8()
+            if v.went_down or v.went_up or d != v.stick_seen:
+                v.stick_seen = d
+                self.last_input = now
+
+        if probe is not None:
+            for v in self.pads:
+                d = v.dir4()
+                if d != v.dir_seen:
+                    v.dir_seen = d
+                    if d != (0, 0):
+                        probe.arrived(v.moves[-1][0] if v.moves else now, "stick")
+
+    def wait(self, timeout):
+        """
+        Sleep up to timeout seconds, but return True as soon as any event arrives
+        (poll() then applies it): idle screens can run slowly and still wake at once.
+        """
+        if timeout <= 0:
+            return False
+        if self.sampler is not None:
+            end = clock() + timeout
+            while not self.sampler.queue:
+                left = end - clock()
+                if left <= 0:
+                    return False
+                time.sleep(min(left, self.sampler.period))
+            return True
+        e = pygame.event.wait(max(1, int(timeout * 1000)))
+        if e.type == pygame.NOEVENT:
+            return False
+        self._early.append(e)
+        return True
+
+    def close(self):
+        if self.sampler is None:
+            return
+        if self.sampler is _sampler:
+            stop_sampler()
+        print(self.latency_report(), flush=True)
+        self.sampler = None
+
+    # ----------------------------
+    # ANY-PAD QUERIES
+    # ----------------------------
+
+    def any_held(self, btn):
+        return any(v.held(btn) for v in self.pads)
+
+    def any_pressed(self, btn):
+        return any(v.pressed(btn) for v in self.pads)
+
+    # ----------------------------
+    # LATENCY
+    # ----------------------------
+
+    def latency_report(self):
+        """Press arrival -> poll() delay over the last presses (needs the sampler)."""
+        if not self.latency:
+            return "input latency: no timestamped presses (sampler off?)"
+        ms = sorted(x * 1000.0 for x in self.latency)
+        p = lambda q: ms[min(len(ms) - 1, int(q * (len(ms) - 1) + 0.5))]
+        return (f"input latency over {len(ms)} presses: mean {sum(ms) / len(ms):.1f} ms, "
+                f"p50 {p(0.5):.1f}, p95 {p(0.95):.1f}, max {ms[-1]:.1f} ms "
+                f"({self.sampler.hz if self.sampler else 0:g} Hz sampler)")
@@ -0,0 +1,220 @@
+# latency.py
+# Input-to-photon latency probe.
+#
+# Every button press (and every stick move into a new direction) is stamped
+# when it arrives through InputState.poll() (or the LED_INPUT_HZ sampler).
+# The press counts as shown once a frame whose state it changed has been
+# handed to the panels: the first SwapOnVSync that returns after the game
+# applied it. By default a press is applied in the frame that polled it;
+# games that buffer input (Snake applies the stick on its next tick) call
+# defer(kind) once and apply(kind) when the input actually takes effect.
+# BACK is applied when ExitOnBack.handle() runs and counts as shown at the
+# next swap that returns: in the GameHost that is the menu's first frame
+# (a BACK that ends the process, or hands over to a new one, is dropped).
+#
+# LED_LATENCY=1 (or a path) turns it on; per-game histograms are merged into
+# /tmp/led_latency.json every few seconds and on exit. Works the same on the
+# fake matrix / joysticks, so the bench can report it (--latency).
+# Histograms are keyed by the game's file name: sys.argv[0] for a script run on
+# its own, or what GameHost / the bench announce with launching() before a game.
+
+import os
+import sys
+import json
+import atexit
+
+from Utils.game_loop import clock
+
+DEFAULT_PATH = "/tmp/led_latency.json"
+BUCKETS_MS = (8, 16.7, 33.3, 50, 66.7, 100, 200)  # upper edges; last bucket is open-ended
+STALE_S = 1.0         # a deferred press never applied by then is dropped
+FLUSH_EVERY_S = 5.0
+
+probe = None       # LatencyProbe of whatever is running now (the menu or a game)
+_leaving = None    # probe of a game that exited on BACK, until the next swap shows it
+_launching = None  # game name a launcher announced for the next create_matrix(), see launching()
+
+
+class LatencyProbe:
+    def __init__(self, game, path=DEFAULT_PATH):
+        self.game = game
+        self.path = path
+        self.pending = []        # [t_arrived, kind, applied]
+        self.deferred = {"back"}  # applied by ExitOnBack.handle()
+        self.new = {}            # kind -> {"counts", "n", "sum_ms", "max_ms"} not yet in the file
+        self.total = {}          # kind -> same, for this run (bench output)
+        self.last_flush = clock()
+
+    # ----------------------------
+    # EVENTS
+    # ----------------------------
+
+    def arrived(self, t, kind):
+        self.pending.append([t, kind, kind not in self.deferred])
+
+    def defer(self, kind):
+        """Presses of this kind only count once apply(kind) says the game acted on them."""
+        self.deferred.add(kind)
+
+    def apply(self, kind):
+        for p in self.pending:
+            if p[1] == kind:
+                p[2] = True
+
+    def shown(self, t=None, kinds=None):
+        """A frame reached the panels at t: every applied press (of kinds, if given) is done."""
+        if not self.pending:
+            return
+        t = clock() if t is None else t
+        keep = []
+        for p in self.pending:
+            if p[2] and (kinds is None or p[1] in kinds):
+                self._record(p[1], (t - p[0]) * 1000.0)
+            elif t - p[0] < STALE_S:
+                keep.append(p)
+        self.pending = keep
+        if t - self.last_flush > FLUSH_EVERY_S:
+            self.flush()
+
+    def _record(self, kind, ms):
+        for table in (self.new, self.total):
+            h = table.get(kind)
+            if h is None:
+                h = table[kind] = {"counts": [0] * (len(BUCKETS_MS) + 1), "n": 0, "sum_ms": 0.0, "max_ms": 0.0}
+            i = 0
+            while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+                i += 1
+            h["counts"][i] += 1
+            h["n"] += 1
+            h["sum_ms"] += ms
+            h["max_ms"] = max(h["max_ms"], ms)
+
+    # ----------------------------
+    # FILE
+    # ----------------------------
+
+    def flush(self):
+        """Merge what was recorded since the last flush into the per-game histograms file."""
+        self.last_flush = clock()
+        if not self.new:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if data.get("buckets_ms") != list(BUCKETS_MS):
+            data = {"buckets_ms": list(BUCKETS_MS), "games": {}}  # new file or other buckets
+
+        game = data["games"].setdefault(self.game, {})
+        for kind, h in self.new.items():
+            old = game.get(kind)
+            if old is None:
+                game[kind] = h
+                continue
+            old["counts"] = [a + b for a, b in zip(old["counts"], h["counts"])]
+            old["n"] += h["n"]
+            old["sum_ms"] += h["sum_ms"]
+            old["max_ms"] = max(old["max_ms"], h["max_ms"])
+        self.new = {}
+
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def summary(self):
+        """{kind: (presses, mean ms, max ms)} for this run."""
+        return {k: (h["n"], h["sum_ms"] / h["n"], h["max_ms"]) for k, h in self.total.items() if h["n"]}
+
+
+# ----------------------------
+# MATRIX HOOK
+# ----------------------------
+class ProbedMatrix:
+    """Matrix wrapper that reports every returned SwapOnVSync to the probe."""
+
+    def __init__(self, matrix):
+        object.__setattr__(self, "_matrix", matrix)
+
+    def SwapOnVSync(self, canvas, *args):
+        global _leaving
+        back = self._matrix.SwapOnVSync(canvas, *args)
+        if _leaving is not None:
+            _leaving.shown(kinds=("back",))
+            _leaving.flush()
+            _leaving = None
+        if probe is not None:
+            probe.shown()
+        return back
+
+    def __getattr__(self, name):
+        return getattr(self._matrix, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._matrix, name, value)
+
+
+def start(game, matrix):
+    """
+    create_matrix() calls this: with LED_LATENCY set, start a probe for game
+    and return the matrix wrapped so swaps are seen; else the matrix unchanged.
+    """
+    global probe
+    setting = os.environ.get("LED_LATENCY")
+    if not setting:
+        return matrix
+    if probe is not None:
+        probe.flush()  # the menu (or previous game) in this process, see resume()
+    probe = LatencyProbe(game, DEFAULT_PATH if setting == "1" else setting)
+    return ProbedMatrix(matrix)
+
+
+def launching(name):
+    """GameHost / bench: the next create_matrix() belongs to this game (None: back to the script's)."""
+    global _launching
+    _launching = name
+
+
+def game_name():
+    """Name the next probe is filed under: what a launcher announced, else the script this process runs."""
+    return _launching or os.path.basename(sys.argv[0]) or "?"
+
+
+def resume(previous):
+    """
+    GameHost: a game run in-process has returned; presses count for previous
+    (the menu's probe, or None) again instead of the game that last called start().
+    """
+    global probe
+    if probe is not None and probe is not previous:
+        probe.flush()
+    probe = previous
+
+
+def leave():
+    """ExitOnBack.handle(): BACK is applied; the next swap that returns shows it."""
+    global _leaving
+    if probe is not None:
+        probe.apply("back")
+        _leaving = probe
+
+
+# module-level shortcuts: no-ops while the probe is off
+def defer(kind):
+    if probe is not None:
+        probe.defer(kind)
+
+
+def apply(kind):
+    if probe is not None:
+        probe.apply(kind)
+
+
+def flush():
+    for p in (probe, _leaving):
+        if p is not None:
+            p.flush()
+
+
+atexit.register(flush)
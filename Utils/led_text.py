@@ -0,0 +1,201 @@
+# led_text.py
+# Shared 3x5 / 8x8 bitmap fonts (and BDF files), pre-rasterized once and blitted as whole strings.
+
+from functools import lru_cache
+
+import numpy as np
+
+from Utils.framebuffer import rgb, mask_from_rows
+from Utils.led_digits import DIGITS_8x8
+
+# ----------------------------
+# FONTS (glyph rows, "1" = lit)
+# ----------------------------
+DIG3x5 = {
+    "0": ["111","101","101","101","111"],
+    "1": ["010","110","010","010","111"],
+    "2": ["111","001","111","100","111"],
+    "3": ["111","001","111","001","111"],
+    "4": ["101","101","111","001","001"],
+    "5": ["111","100","111","001","111"],
+    "6": ["111","100","111","101","111"],
+    "7": ["111","001","001","010","010"],
+    "8": ["111","101","111","101","111"],
+    "9": ["111","101","111","001","111"],
+    "-": ["000","000","111","000","000"],
+}
+
+LET3x5 = {
+    "P": ["111","101","111","100","100"],
+    "W": ["101","101","101","111","101"],
+    "I": ["111","010","010","010","111"],
+    "N": ["101","111","111","111","101"],
+    "L": ["100","100","100","100","111"],
+    "O": ["111","101","101","101","111"],
+    "S": ["111","100","111","001","111"],
+    "H": ["101","101","111","101","101"],
+    "U": ["101","101","101","101","111"],
+}
+
+FONTS = {
+    "3x5": {**DIG3x5, **LET3x5},
+    "8x8": {str(d): rows for d, rows in DIGITS_8x8.items()},  # digits padded inside 8x8
+}
+
+# every glyph as a bool bitmap, rasterized once at import
+GLYPHS = {name: {ch: mask_from_rows(rows) for ch, rows in f.items()} for name, f in FONTS.items()}
+GLYPH_SIZE = {name: next(iter(g.values())).shape[::-1] for name, g in GLYPHS.items()}  # (w, h)
+
+
+def text_width(text, scale=2, gap=1, font="3x5"):
+    """Pixel width of text; every char (and space) advances glyph width + gap, times scale."""
+    gw, _ = GLYPH_SIZE[font]
+    if not text:
+        return 0
+    return (len(text) * (gw + gap) - gap) * scale
+
+
+# ----------------------------
+# RENDER (cached per string)
+# ----------------------------
+@lru_cache(maxsize=256)
+def _render(text, color, scale, gap, font):
+    glyphs = GLYPHS[font]
+    gw, gh = GLYPH_SIZE[font]
+
+    mask = np.zeros((gh, max(1, len(text) * (gw + gap) - gap)), dtype=bool)
+    x = 0
+    for ch in text:
+        g = glyphs.get(ch)
+        if g is not None:
+            mask[:, x:x + gw] = g
+        x += gw + gap
+
+    if scale > 1:
+        mask = np.kron(mask, np.ones((scale, scale), dtype=bool))
+    img = np.zeros(mask.shape + (3,), dtype=np.uint8)
+    img[mask] = color
+    ys, xs = np.nonzero(mask)
+    return img, mask, list(zip(xs.tolist(), ys.tolist()))
+
+
+def render(text, color, scale=2, gap=1, font="3x5"):
+    """
+    (image, mask, lit_points) for a whole string, built once and kept in an LRU
+    cache keyed by text, color and scale (a redrawn score is just one blit).
+    """
+    return _render(str(text), rgb(color), int(scale), int(gap), font)
+
+
+def draw_text(cv, x, y, text, color, scale=2, gap=1, font="3x5"):
+    """
+    Draw text with its top-left at (x, y).
+    FrameBuffer: one masked blit. Plain canvas: SetPixel over the cached lit pixels.
+    """
+    img, mask, pts = render(text, color, scale, gap, font)
+    if hasattr(cv, "blit"):
+        cv.blit(x, y, img, mask)
+        return
+    r, g, b = rgb(color)
+    x = int(x); y = int(y)
+    for px, py in pts:
+        cv.SetPixel(x + px, y + py, r, g, b)
+
+
+def draw_text_centered(cv, cx, y, text, color, scale=2, gap=1, font="3x5"):
+    x0 = int(cx - text_width(text, scale, gap, font) // 2)
+    draw_text(cv, x0, y, text, color, scale, gap, font)
+
+
+def draw_number(cv, x, y, n, color, scale=1, digits=0, font="3x5"):
+    """Non-negative integer; digits > 0 zero-pads (e.g. 2 for a 00-99 display)."""
+    s = str(max(0, int(n)))
+    if digits:
+        s = s.zfill(digits)
+    gap = 0 if font == "8x8" else 1  # 8x8 digits carry their own padding
+    draw_text(cv, x, y, s, color, scale, gap, font)
+
+
+# ----------------------------
+# BDF FONTS (rasterized here, so a BDF label is one cached blit too)
+# ----------------------------
+@lru_cache(maxsize=8)
+def load_bdf(path):
+    """
+    {codepoint: (mask, advance, x_off, top)} for a BDF font file, parsed once.
+    top: the glyph's first row relative to the baseline y given to DrawText.
+    """
+    glyphs = {}
+    with open(path, "r", encoding="latin-1") as f:
+        lines = iter(f.read().splitlines())
+    code = advance = bbx = None
+    for line in lines:
+        key, _, rest = line.partition(" ")
+        if key == "ENCODING":
+            code = int(rest.split()[0])
+        elif key == "DWIDTH":
+            advance = int(rest.split()[0])
+        elif key == "BBX":
+            bbx = [int(v) for v in rest.split()]
+        elif key == "BITMAP" and bbx is not None:
+            w, h, x_off, y_off = bbx
+            data = bytes.fromhex("".join(next(lines).strip() for _ in range(h)))
+            bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+            mask = bits.reshape(h, -1)[:, :w].astype(bool) if h else np.zeros((0, w), dtype=bool)
+            glyphs[code] = (mask, w if advance is None else advance, x_off, -(y_off + h))
+            code = advance = bbx = None
+    return glyphs
+
+
+def _bdf_glyph(glyphs, ch):
+    return glyphs.get(ord(ch)) or glyphs.get(0xFFFD)
+
+
+def bdf_text_width(path, text):
+    """Same as summing font.CharacterWidth() over the text, without the C font."""
+    glyphs = load_bdf(path)
+    return sum(g[1] for g in (_bdf_glyph(glyphs, ch) for ch in text) if g)
+
+
+@lru_cache(maxsize=64)
+def _render_bdf(path, text, color):
+    glyphs = load_bdf(path)
+    placed = []
+    x = 0
+    for ch in text:
+        g = _bdf_glyph(glyphs, ch)
+        if g is None:
+            continue
+        mask, advance, x_off, top = g
+        placed.append((x + x_off, top, mask))
+        x += advance
+    if not placed:
+        return np.zeros((1, 1, 3), dtype=np.uint8), np.zeros((1, 1), dtype=bool), [], 0, 0
+
+    top = min(t for _, t, _ in placed)
+    bottom = max(t + m.shape[0] for _, t, m in placed)
+    left = min(0, min(px for px, _, _ in placed))
+    width = max(x, max(px + m.shape[1] for px, _, m in placed)) - left
+    full = np.zeros((max(1, bottom - top), max(1, width)), dtype=bool)
+    for px, t, m in placed:
+        full[t - top:t - top + m.shape[0], px - left:px - left + m.shape[1]] |= m
+
+    img = np.zeros(full.shape + (3,), dtype=np.uint8)
+    img[full] = color
+    ys, xs = np.nonzero(full)
+    return img, full, list(zip((xs + left).tolist(), (ys + top).tolist())), left, top
+
+
+def draw_bdf(cv, x, y, text, color, path):
+    """
+    Like graphics.DrawText (y is the baseline), but from the BDF file at path and
+    cached per string, so redrawing a label is one masked blit on a FrameBuffer.
+    """
+    img, mask, pts, left, top = _render_bdf(path, str(text), rgb(color))
+    if hasattr(cv, "blit"):
+        cv.blit(int(x) + left, int(y) + top, img, mask)
+        return
+    r, g, b = rgb(color)
+    x = int(x); y = int(y)
+    for px, py in pts:
+        cv.SetPixel(x + px, y + py, r, g, b)
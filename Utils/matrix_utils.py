@@ -0,0 +1,117 @@
+# matrix_utils.py
+# One place to build the RGBMatrix and load BDF fonts, so a long-lived host can share them.
+# If the display daemon (display.py) is running, games get its shared framebuffer instead.
+
+from rgbmatrix import RGBMatrix, RGBMatrixOptions, graphics
+
+from Utils import display, zygote, latency
+
+PANEL_ROWS = 64
+PANEL_COLS = 64
+CHAIN_LENGTH = 2  # both panels as one 128x64 canvas
+
+_shared = None  # SharedMatrix owned by a GameHost (see game_host.py), if any
+_fonts = {}     # path -> loaded graphics.Font
+
+
+class SharedMatrix:
+    """
+    Thin wrapper that remembers the current back canvas, so the next game
+    launched in the same process draws into the right buffer instead of
+    calling CreateFrameCanvas() again.
+    """
+
+    def __init__(self, matrix):
+        self._matrix = matrix
+        self.back = matrix.CreateFrameCanvas()
+
+    def SwapOnVSync(self, canvas, *args):
+        self.back = self._matrix.SwapOnVSync(canvas, *args)
+        return self.back
+
+    def CreateFrameCanvas(self):
+        return self.back
+
+    def __getattr__(self, name):
+        return getattr(self._matrix, name)
+
+    def __setattr__(self, name, value):
+        if name in ("_matrix", "back"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._matrix, name, value)
+
+
+def build_matrix(brightness=50, gpio_slowdown=4, chain_length=CHAIN_LENGTH):
+    options = RGBMatrixOptions()
+    options.hardware_mapping = "adafruit-hat"
+    options.rows = PANEL_ROWS
+    options.cols = PANEL_COLS
+    options.chain_length = chain_length
+    options.brightness = brightness
+    options.gpio_slowdown = gpio_slowdown
+    return RGBMatrix(options=options)
+
+
+def open_matrix(brightness=50, gpio_slowdown=4):
+    """The display daemon's RemoteMatrix when it is running, else the panels themselves."""
+    remote = display.connect(brightness=brightness)
+    if remote is not None:
+        return remote
+    return build_matrix(brightness=brightness, gpio_slowdown=gpio_slowdown)
+
+
+def create_matrix(brightness=50, gpio_slowdown=4, name=None):
+    """
+    Returns (matrix, canvas) for the dual-panel chain.
+    Inside a GameHost the host's matrix is reused: no GPIO re-init, no blanking.
+    With the display daemon running, the daemon's framebuffer is used instead.
+    name: game name for LED_LATENCY; default: what the host announced, else the script's file name
+    """
+    game = name or latency.game_name()
+    if _shared is not None:
+        _shared.brightness = brightness
+        zygote.notify_ready()
+        return latency.start(game, _shared), _shared.back
+
+    matrix = open_matrix(brightness=brightness, gpio_slowdown=gpio_slowdown)
+    zygote.notify_ready()  # launch time stops here when forked from the zygote
+    return latency.start(game, matrix), matrix.CreateFrameCanvas()
+
+
+def share(matrix):
+    """Make create_matrix() hand out this matrix. Returns the SharedMatrix wrapper."""
+    global _shared
+    if not isinstance(matrix, SharedMatrix):
+        matrix = SharedMatrix(matrix)
+    _shared = matrix
+    return matrix
+
+
+def shared_matrix():
+    return _shared
+
+
+def load_font(path):
+    """BDF fonts are parsed once per process and reused."""
+    font = _fonts.get(path)
+    if font is None:
+        font = graphics.Font()
+        font.LoadFont(path)
+        _fonts[path] = font
+    return font
+
+
+def font_path(font):
+    """Path a font was loaded from with load_font(), else None."""
+    for path, f in _fonts.items():
+        if f is font:
+            return path
+    return None
+
+
+def draw_bdf_text(canvas, font, x, y, color, text):
+    """graphics.DrawText that also works on the display daemon's canvases."""
+    if hasattr(canvas, "DrawText"):
+        return canvas.DrawText(font, x, y, color, text)
+    return graphics.DrawText(canvas, font, x, y, color, text)
@@ -6,6 +6,9 @@ import os
 import sys
 import pygame
 
+from Utils import input_state
+from Utils.game_loop import clock
+
 class ExitOnBack:
     def __init__(
         self,
@@ -17,7 +20,8 @@ class ExitOnBack:
         quit_only: bool = False,   # <-- NEW FLAG
     ):
         """
-        pads: list of pygame.joystick.Joystick objects
+        pads: list of pygame.joystick.Joystick objects, or InputState pads
+              (then BACK is read from the shared per-frame snapshot)
         back_btn: button index for BACK
         holddown_ignore: ignore BACK for this many seconds after reset() / init
         release_timeout: max time to wait for BACK release before exit/handoff
@@ -25,6 +29,7 @@ class ExitOnBack:
         quit_only: if True, BACK exits the program instead of launching menu
         """
         self.pads = pads
+        self.state = getattr(pads[0], "state", None) if pads else None  # InputState, if any
         self.back_btn = back_btn
         self.holddown_ignore = float(holddown_ignore)
         self.release_timeout = float(release_timeout)
@@ -32,7 +37,7 @@ class ExitOnBack:
         self.quit_only = quit_only
 
         self.back_was_down = False
-        self.ignore_until = time.time() + self.holddown_ignore
+        self.ignore_until = clock() + self.holddown_ignore
 
     # ----------------------------
     # CONTROL
@@ -44,7 +49,7 @@ class ExitOnBack:
 
     def reset(self):
         """Call after round reset / menu entry."""
-        self.ignore_until = time.time() + self.holddown_ignore
+        self.ignore_until = clock() + self.holddown_ignore
         self.back_was_down = False
 
     # ----------------------------
@@ -55,9 +60,12 @@ class ExitOnBack:
         return any(p.get_button(self.back_btn) for p in self.pads)
 
     def wait_for_release(self):
-        t0 = time.time()
-        while self.any_back_pressed() and (time.time() - t0) < self.release_timeout:
-            pygame.event.pump()
+        t0 = clock()
+        while self.any_back_pressed() and (clock() - t0) < self.release_timeout:
+            if self.state is not None:
+                self.state.poll()
+            else:
+                input_state.pump()
             time.sleep(self.pump_sleep)
 
     def should_exit(self) -> bool:
@@ -65,7 +73,7 @@ class ExitOnBack:
         Returns True on a BACK press edge.
         Caller decides whether to quit or handoff based on quit_only flag.
         """
-        now = time.time()
+        now = clock()
         down = self.any_back_pressed()
 
         if now < self.ignore_until:
@@ -73,6 +81,9 @@ class ExitOnBack:
             return False
 
         pressed_edge = down and not self.back_was_down
+        if self.state is not None:
+            # a tap shorter than a frame never shows as held; the snapshot still saw it
+            pressed_edge = pressed_edge or any(p.pressed(self.back_btn) for p in self.pads)
         self.back_was_down = down
         return pressed_edge
 
@@ -85,10 +96,20 @@ class ExitOnBack:
         Call this when should_exit() returns True.
 
         - If quit_only=True → exit program
+        - Forked by the zygote → hand back to it (it forks a fresh menu)
+        - Inside a GameHost → raise ReturnToMenu (menu keeps running in-process)
         - Else → hand off to menu_path
         """
+        from Utils import game_host, zygote, latency
+        latency.leave()  # shown once the next frame (the menu's) reaches the panels
+
         self.wait_for_release()
+        if not self.quit_only and zygote.active():
+            zygote.handoff()
+        if not self.quit_only and game_host.current() is not None:
+            raise game_host.ReturnToMenu()
 
+        input_state.stop_sampler()  # its thread must not be pumping events during quit()
         try:
             pygame.quit()
         except Exception:
@@ -0,0 +1,143 @@
+# particles.py
+# Vectorized particle system for explosions, confetti and sparkle effects.
+#
+# Position, velocity, color and lifetime live in preallocated NumPy arrays
+# (live particles packed at the front), so update / cull / draw are a few array
+# ops whatever the effect looks like, and capacity caps the per-frame cost:
+# a burst that doesn't fit is cut short instead of slowing the frame down.
+#
+#   sparks = Particles(256, drag=3.0)
+#   sparks.emit(24, x, y, speed=(10, 40), life=(0.15, 0.4), colors=[(255, 120, 0)])
+#   ...
+#   sparks.update(dt)          # move, age, drop the dead / out-of-box ones
+#   sparks.draw(fb)            # one fb.points() call, colors fading with age
+
+import math
+
+import numpy as np
+
+from Utils.framebuffer import rgb
+
+
+def _uniform(rng, v, n):
+    """v: one value or a (lo, hi) range -> n float32 samples."""
+    if isinstance(v, tuple):
+        return rng.uniform(v[0], v[1], n).astype(np.float32)
+    return np.full(n, v, dtype=np.float32)
+
+
+class Particles:
+    def __init__(self, capacity=256, gravity=0.0, drag=0.0, box=None, seed=None):
+        """
+        capacity: most particles alive at once (the per-frame budget)
+        gravity: px/s^2 added to vy
+        drag: share of velocity lost per second (0 = none)
+        box: (x, y, w, h) particles are culled outside of; default: anywhere
+        """
+        self.cap = int(capacity)
+        self.gravity = float(gravity)
+        self.drag = float(drag)
+        self.box = box
+        self.rng = np.random.default_rng(seed)
+
+        self.x = np.zeros(self.cap, dtype=np.float32)
+        self.y = np.zeros(self.cap, dtype=np.float32)
+        self.vx = np.zeros(self.cap, dtype=np.float32)
+        self.vy = np.zeros(self.cap, dtype=np.float32)
+        self.color = np.zeros((self.cap, 3), dtype=np.uint8)
+        self.life = np.zeros(self.cap, dtype=np.float32)  # seconds left
+        self.ttl = np.ones(self.cap, dtype=np.float32)    # seconds at emit (for fading)
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def clear(self):
+        self.n = 0
+
+    # ----------------------------
+    # EMIT
+    # ----------------------------
+
+    def emit(self, count, x, y, speed=0.0, angle=(0.0, 2 * math.pi), life=1.0, colors=((255, 255, 255),)):
+        """
+        Add up to count particles (fewer once the system is full).
+        x, y, speed, angle (radians, 0 = right, pi/2 = down), life (seconds):
+        one value each, or a (lo, hi) range sampled per particle.
+        colors: Colors or (r, g, b) tuples, one picked per particle.
+        """
+        k = min(int(count), self.cap - self.n)
+        if k <= 0:
+            return
+        s = slice(self.n, self.n + k)
+        rng = self.rng
+
+        self.x[s] = _uniform(rng, x, k)
+        self.y[s] = _uniform(rng, y, k)
+        v = _uniform(rng, speed, k)
+        a = _uniform(rng, angle, k)
+        self.vx[s] = np.cos(a) * v
+        self.vy[s] = np.sin(a) * v
+
+        palette = np.array([rgb(c) for c in colors], dtype=np.uint8)
+        self.color[s] = palette[rng.integers(0, len(palette), k)]
+        self.life[s] = _uniform(rng, life, k)
+        self.ttl[s] = np.maximum(self.life[s], 1e-6)
+        self.n += k
+
+    # ----------------------------
+    # UPDATE
+    # ----------------------------
+
+    def update(self, dt):
+        """Advance every live particle by dt seconds, then cull the dead and the escaped."""
+        n = self.n
+        if n == 0:
+            return
+        dt = np.float32(dt)
+        vx, vy = self.vx[:n], self.vy[:n]
+        if self.gravity:
+            vy += self.gravity * dt
+        if self.drag:
+            f = np.float32(max(0.0, 1.0 - self.drag * dt))
+            vx *= f
+            vy *= f
+        self.x[:n] += vx * dt
+        self.y[:n] += vy * dt
+        self.life[:n] -= dt
+
+        alive = self.life[:n] > 0
+        if self.box is not None:
+            bx, by, bw, bh = self.box
+            x, y = self.x[:n], self.y[:n]
+            alive &= (x >= bx) & (x < bx + bw) & (y >= by) & (y < by + bh)
+        if alive.all():
+            return
+
+        keep = np.flatnonzero(alive)
+        m = len(keep)
+        for a in (self.x, self.y, self.vx, self.vy, self.color, self.life, self.ttl):
+            a[:m] = a[keep]
+        self.n = m
+
+    # ----------------------------
+    # DRAW
+    # ----------------------------
+
+    def draw(self, cv, fade=True):
+        """Plot every live particle; fade: dim each one by the share of its life left."""
+        n = self.n
+        if n == 0:
+            return
+        xs = np.floor(self.x[:n]).astype(np.int32)
+        ys = np.floor(self.y[:n]).astype(np.int32)
+        colors = self.color[:n]
+        if fade:
+            k = np.clip(self.life[:n] / self.ttl[:n], 0.0, 1.0)
+            colors = (colors * k[:, None]).astype(np.uint8)
+
+        if hasattr(cv, "points"):
+            cv.points(xs, ys, colors)
+            return
+        for x, y, c in zip(xs.tolist(), ys.tolist(), colors.tolist()):
+            cv.SetPixel(x, y, *c)
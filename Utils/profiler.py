@@ -0,0 +1,223 @@
+# profiler.py
+# Per-phase frame profiler: perf_counter_ns timings in a fixed-size ring buffer,
+# an optional on-panel FPS / frame-time bar, and a histogram dump on SIGUSR1.
+#
+#   prof = Profiler("TankDuel", pads=[joy1, joy2])
+#   while True:
+#       prof.begin()                 # closes the previous frame, checks the chord
+#       pygame.event.pump()
+#       prof.mark("input")           # time since the last mark goes to "input"
+#       ...update...
+#       prof.mark("update")
+#       ...draw...
+#       prof.overlay(fb)             # only draws while the overlay is on
+#       prof.mark("draw")
+#       canvas = fb.present(matrix, canvas)
+#       prof.mark("swap")
+#
+# Off by default: mark() is then a no-op and begin() only polls the chord.
+# LB + RB + START (held together) toggles recording plus the overlay;
+# LED_PROFILE=1 in the environment records from the start without the overlay.
+# kill -USR1 <pid> writes /tmp/led_profile_<game>_<pid>.txt; close() hands the
+# signal back (GameHost calls close_all() when a game returns to the menu).
+
+import os
+import time
+import signal
+
+import numpy as np
+
+CHORD = (4, 5, 7)        # LB + RB + START
+CHORD_DEBOUNCE = 0.6
+MAX_PHASES = 8
+DUMP_DIR = "/tmp"
+
+# histogram bucket upper edges in ms (last bucket is open-ended)
+BUCKETS_MS = (1, 2, 4, 8, 16.7, 33.3, 66.7)
+
+PHASE_COLORS = (
+    (0, 160, 255), (0, 220, 0), (255, 200, 0), (255, 0, 160),
+    (160, 80, 255), (0, 255, 200), (255, 120, 0), (200, 200, 200),
+)
+BAR_X, BAR_Y = 96, 0     # top-right corner of a 128x64 panel
+BAR_W = 32               # 1 px per ms, so 16 px is one 60 Hz frame
+FRAME_MS = 1000.0 / 60.0
+
+_open = []  # profilers holding SIGUSR1, oldest first (see close())
+
+
+def _off(*_):
+    pass
+
+
+def _fill(cv, x, y, w, h, c):
+    if hasattr(cv, "fill_rect"):
+        cv.fill_rect(x, y, w, h, c)
+        return
+    for yy in range(y, y + h):
+        for xx in range(x, x + w):
+            cv.SetPixel(xx, yy, *c)
+
+
+class Profiler:
+    def __init__(self, name, pads=(), capacity=600, chord=CHORD, dump_dir=DUMP_DIR):
+        """
+        name: used in the dump file name
+        pads: joysticks polled for the toggle chord
+        capacity: frames kept in the ring buffer
+        """
+        self.name = name
+        self.pads = list(pads)
+        self.cap = int(capacity)
+        self.chord = tuple(chord)
+        self.dump_dir = dump_dir
+
+        self.phases = []   # names, in first-seen order
+        self._index = {}   # name -> column
+        self.rows = np.zeros((self.cap, MAX_PHASES), dtype=np.int64)
+        self.total = np.zeros(self.cap, dtype=np.int64)
+        self.i = 0         # row being filled
+        self.n = 0         # frames completed (may exceed cap)
+        self._t0 = 0
+        self._last = 0
+
+        self.show = False
+        self._chord_until = 0.0
+        self._default = os.environ.get("LED_PROFILE") == "1"
+        self.set_enabled(self._default)
+
+        self._prev_usr1 = None
+        try:
+            self._prev_usr1 = signal.signal(signal.SIGUSR1, lambda *_: self.dump())
+            _open.append(self)
+        except ValueError:
+            pass  # not the main thread: no signal dump, the rest still works
+
+    def close(self):
+        """Give SIGUSR1 back to whoever had it before this profiler."""
+        if self not in _open:
+            return
+        _open.remove(self)
+        prev = self._prev_usr1
+        signal.signal(signal.SIGUSR1, signal.SIG_DFL if prev is None else prev)
+
+    # ----------------------------
+    # CONTROL
+    # ----------------------------
+
+    def set_enabled(self, on):
+        self.enabled = bool(on)
+        self.mark = self._mark if on else _off
+        self._t0 = 0
+
+    def _chord_down(self):
+        for p in self.pads:
+            if all(p.get_button(b) for b in self.chord):
+                return True
+        return False
+
+    def _poll_chord(self):
+        if not self.pads or time.monotonic() < self._chord_until or not self._chord_down():
+            return
+        self._chord_until = time.monotonic() + CHORD_DEBOUNCE
+        self.show = not self.show
+        self.set_enabled(self.show or self._default)
+
+    # ----------------------------
+    # RECORDING
+    # ----------------------------
+
+    def begin(self):
+        """Call first thing every frame (also after a 'continue')."""
+        self._poll_chord()
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        if self._t0:
+            self.total[self.i] = now - self._t0
+            self.n += 1
+            self.i = (self.i + 1) % self.cap
+        self.rows[self.i] = 0
+        self._t0 = self._last = now
+
+    def _mark(self, phase):
+        now = time.perf_counter_ns()
+        j = self._index.get(phase)
+        if j is None:
+            if len(self.phases) >= MAX_PHASES:
+                return
+            j = self._index[phase] = len(self.phases)
+            self.phases.append(phase)
+        self.rows[self.i, j] += now - self._last
+        self._last = now
+
+    def frames(self):
+        """(per-phase ns rows, frame totals) of the completed frames in the ring."""
+        k = min(self.n, self.cap)
+        if k < self.cap:
+            return self.rows[:k, :len(self.phases)], self.total[:k]
+        order = np.r_[self.i + 1:self.cap, 0:self.i]
+        return self.rows[order, :len(self.phases)], self.total[order]
+
+    # ----------------------------
+    # OVERLAY
+    # ----------------------------
+
+    def overlay(self, cv):
+        """FPS plus a stacked per-phase bar of the last frame (1 px per ms, tick at 60 Hz)."""
+        if not self.show or self.n == 0:
+            return
+        from Utils.led_text import draw_number
+
+        last = (self.i - 1) % self.cap
+        recent = self.total[[(self.i - 1 - k) % self.cap for k in range(min(30, self.n))]]
+        fps = 1e9 / max(1.0, float(recent.mean()))
+
+        _fill(cv, BAR_X, BAR_Y, BAR_W, 9, (0, 0, 0))
+        draw_number(cv, BAR_X + 1, BAR_Y + 1, min(999, int(fps)), (255, 255, 255))
+        x = BAR_X
+        for j in range(len(self.phases)):
+            w = int(round(self.rows[last, j] / 1e6))
+            w = min(w, BAR_X + BAR_W - x)
+            if w > 0:
+                _fill(cv, x, BAR_Y + 7, w, 2, PHASE_COLORS[j])
+                x += w
+        _fill(cv, BAR_X + int(FRAME_MS), BAR_Y + 6, 1, 3, (255, 0, 0))
+
+    # ----------------------------
+    # DUMP
+    # ----------------------------
+
+    def report(self):
+        rows, total = self.frames()
+        lines = [f"{self.name}: {len(total)} frames (ring of {self.cap}), profiling "
+                 f"{'on' if self.enabled else 'off (hold LB+RB+START or set LED_PROFILE=1)'}"]
+        if not len(total):
+            return "\n".join(lines) + "\n"
+
+        edges = ("<" + "/".join(f"{b:g}" for b in BUCKETS_MS) + "/+ ms")
+        lines.append(f"{'phase':10s} {'mean':>7s} {'p50':>7s} {'p95':>7s} {'p99':>7s} {'max':>7s}  buckets {edges}")
+        cols = [(p, rows[:, j]) for j, p in enumerate(self.phases)] + [("frame", total)]
+        for phase, ns in cols:
+            ms = ns / 1e6
+            counts = np.bincount(np.searchsorted(BUCKETS_MS, ms), minlength=len(BUCKETS_MS) + 1)
+            lines.append(
+                f"{phase:10s} {ms.mean():7.2f} {np.percentile(ms, 50):7.2f} {np.percentile(ms, 95):7.2f} "
+                f"{np.percentile(ms, 99):7.2f} {ms.max():7.2f}  " + " ".join(str(c) for c in counts))
+        state = getattr(self.pads[0], "state", None) if self.pads else None
+        if state is not None and state.sampler is not None:
+            lines.append(state.latency_report())  # InputState pads with LED_INPUT_HZ set
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path=None):
+        path = path or os.path.join(self.dump_dir, f"led_profile_{self.name}_{os.getpid()}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.report())
+        print(f"Profiler: wrote {path}", flush=True)
+        return path
+
+
+def close_all():
+    """Close every profiler still holding SIGUSR1, newest first (a game that just ended)."""
+    for p in reversed(_open[:]):
+        p.close()
@@ -0,0 +1,263 @@
+# replay.py
+# Record what the pads did each frame (plus the RNG seed and the frame clock)
+# to a compact binary file, and play it back through stand-in joysticks.
+#
+#   from Utils.replay import Session, rng       # games draw from rng, not random
+#   rec = Session("SpaceInvaders", [pad1, pad2])
+#   pad1, pad2 = rec.pads                       # real pads, or per-frame snapshots
+#   game = reset_game(rec.now)
+#   while True:
+#       now = rec.frame(check=(game["score"], ...))   # use instead of clock()
+#       inp.poll()                                    # InputState over rec.pads
+#
+# LED_RECORD=1 (or a path)  record this run to /tmp/led_<game>_<pid>.rec
+# LED_REPLAY=<path>         play a recording back at its recorded pace
+# LED_REPLAY_FAST=1         ... or flat out (benchmarks)
+#
+# With neither set a Session hands back the real pads and clock() and costs
+# nothing. While recording or replaying, the game only ever sees the values
+# sampled in frame() and a clock that starts at 0 and only moves in frame(),
+# so the same file gives the same match, frame for frame. check= is stored
+# per frame; on replay a mismatch is reported as a desync.
+
+import os
+import time
+import zlib
+import struct
+import atexit
+import random
+
+from Utils.game_loop import clock
+
+rng = random.Random()  # the one random stream games should use (seeded here)
+
+MAGIC = b"LEDR"
+VERSION = 1
+MAX_AXES = 8
+MAX_BUTTONS = 32
+AXIS_SCALE = 32767     # axes are stored as int16
+FLUSH_EVERY = 60       # frames between flushes (ExitOnBack may exec() away)
+DUMP_DIR = "/tmp"
+
+# magic, version, pads, axes per pad, buttons per pad, seed, game name
+HEADER = struct.Struct("<4sBBBBq16s")
+
+
+def frame_struct(num_pads, num_axes):
+    """t (s since start), check crc, then per pad: int16 axes + uint32 button bits."""
+    return struct.Struct("<dI" + f"{num_axes}hI" * num_pads)
+
+
+def _check_crc(check):
+    return 0 if check is None else zlib.crc32(repr(check).encode())
+
+
+# ----------------------------
+# STAND-IN JOYSTICK
+# ----------------------------
+class SnapshotPad:
+    """
+    Joystick-shaped view of one frame's sample: get_axis / get_button return
+    what frame() last stored, whether that came from a real pad or a file.
+    """
+
+    polled = True  # sends no joystick events: InputState reads it directly
+
+    def __init__(self, index, num_axes, num_buttons, name="Replay Pad"):
+        self.index = int(index)
+        self.num_axes = num_axes
+        self.num_buttons = num_buttons
+        self.name = name
+        self.axes = [0.0] * num_axes
+        self.buttons = 0
+
+    def init(self):
+        pass
+
+    def quit(self):
+        pass
+
+    def get_init(self):
+        return True
+
+    def get_id(self):
+        return self.index
+
+    def get_instance_id(self):
+        return self.index
+
+    def get_name(self):
+        return self.name
+
+    def get_numaxes(self):
+        return self.num_axes
+
+    def get_numbuttons(self):
+        return self.num_buttons
+
+    def get_numhats(self):
+        return 0
+
+    def get_hat(self, i):
+        return (0, 0)
+
+    def get_axis(self, i):
+        return self.axes[i] if 0 <= i < self.num_axes else 0.0
+
+    def get_button(self, i):
+        return (self.buttons >> i) & 1 if 0 <= i < self.num_buttons else 0
+
+    def load(self, axes_q, buttons):
+        self.axes = [a / AXIS_SCALE for a in axes_q]
+        self.buttons = buttons
+
+
+# ----------------------------
+# SESSION
+# ----------------------------
+class Session:
+    def __init__(self, name, pads):
+        """
+        name: stored in the file header and used in the default file name
+        pads: the game's real joysticks, in player order
+        """
+        self.name = name
+        self.pads = list(pads)
+        self.mode = None
+        self.frames = 0
+        self.desyncs = 0
+        self.first_desync = None
+        self.now = clock()
+
+        replay_path = os.environ.get("LED_REPLAY")
+        record = os.environ.get("LED_RECORD")
+        if replay_path:
+            self._open_replay(replay_path, os.environ.get("LED_REPLAY_FAST") == "1")
+        elif record:
+            path = record if record != "1" else os.path.join(DUMP_DIR, f"led_{name}_{os.getpid()}.rec")
+            self._open_record(path)
+
+    # ----------------------------
+    # RECORD
+    # ----------------------------
+
+    def _open_record(self, path):
+        self.real = self.pads
+        self.num_axes = min(MAX_AXES, max([p.get_numaxes() for p in self.real] or [0]))
+        self.num_buttons = min(MAX_BUTTONS, max([p.get_numbuttons() for p in self.real] or [0]))
+        self.seed = random.SystemRandom().randrange(1 << 62)
+        rng.seed(self.seed)
+
+        self.pads = [SnapshotPad(i, self.num_axes, self.num_buttons, p.get_name())
+                     for i, p in enumerate(self.real)]
+        self.frame_st = frame_struct(len(self.pads), self.num_axes)
+        self.path = path
+        self.f = open(path, "wb")
+        self.f.write(HEADER.pack(MAGIC, VERSION, len(self.pads), self.num_axes, self.num_buttons,
+                                 self.seed, self.name.encode()[:16]))
+        self.t0 = clock()
+        self.now = 0.0
+        self.mode = "record"
+        atexit.register(self.close)
+        print(f"Replay: recording {self.name} to {path} (seed {self.seed})", flush=True)
+
+    def _record_frame(self, check):
+        self.now = clock() - self.t0
+        vals = [self.now, _check_crc(check)]
+        for real, snap in zip(self.real, self.pads):
+            axes_q = [int(round(max(-1.0, min(1.0, real.get_axis(i))) * AXIS_SCALE))
+                      for i in range(min(self.num_axes, real.get_numaxes()))]
+            axes_q += [0] * (self.num_axes - len(axes_q))
+            buttons = 0
+            for i in range(min(self.num_buttons, real.get_numbuttons())):
+                if real.get_button(i):
+                    buttons |= 1 << i
+            snap.load(axes_q, buttons)
+            vals += axes_q
+            vals.append(buttons)
+        self.f.write(self.frame_st.pack(*vals))
+        if self.frames % FLUSH_EVERY == 0:
+            self.f.flush()
+
+    # ----------------------------
+    # REPLAY
+    # ----------------------------
+
+    def _open_replay(self, path, fast):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, num_pads, self.num_axes, self.num_buttons, self.seed, name = \
+            HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a v{VERSION} input recording")
+        rec_name = name.rstrip(b"\0").decode()
+        if rec_name != self.name[:16]:
+            print(f"Replay: {path} was recorded in {rec_name}, not {self.name}", flush=True)
+
+        self.frame_st = frame_struct(num_pads, self.num_axes)
+        body = data[HEADER.size:]
+        body = body[:len(body) - len(body) % self.frame_st.size]  # drop a torn last frame
+        self.stream = self.frame_st.iter_unpack(body)
+        self.total = len(body) // self.frame_st.size
+
+        rng.seed(self.seed)
+        self.pads = [SnapshotPad(i, self.num_axes, self.num_buttons) for i in range(num_pads)]
+        self.path = path
+        self.fast = fast
+        self.t0 = clock()
+        self.now = 0.0
+        self.mode = "replay"
+        print(f"Replay: playing {path} ({self.total} frames, seed {self.seed}"
+              f"{', flat out' if fast else ''})", flush=True)
+
+    def _replay_frame(self, check):
+        vals = next(self.stream, None)
+        if vals is None:
+            self.close()
+            raise SystemExit(0)
+
+        self.now, crc = vals[0], vals[1]
+        if check is not None and crc and crc != _check_crc(check):
+            self.desyncs += 1
+            if self.first_desync is None:
+                self.first_desync = self.frames
+                print(f"Replay: desync at frame {self.frames} (t={self.now:.3f}s)", flush=True)
+
+        k = 2
+        for snap in self.pads:
+            snap.load(vals[k:k + self.num_axes], vals[k + self.num_axes])
+            k += self.num_axes + 1
+
+        if not self.fast:
+            wait = self.t0 + self.now - clock()
+            if wait > 0:
+                time.sleep(wait)
+
+    # ----------------------------
+    # PER FRAME
+    # ----------------------------
+
+    def frame(self, check=None):
+        """
+        Call once per frame, before InputState.poll(); returns this frame's time.
+        check: small state summary (score, positions, ...); its repr is compared on replay.
+        """
+        if self.mode is None:
+            self.now = clock()
+            return self.now
+        if self.mode == "record":
+            self._record_frame(check)
+        else:
+            self._replay_frame(check)
+        self.frames += 1
+        return self.now
+
+    def close(self):
+        if self.mode == "record" and not self.f.closed:
+            self.f.close()
+            print(f"Replay: wrote {self.frames} frames to {self.path}", flush=True)
+        elif self.mode == "replay" and self.stream is not None:
+            self.stream = None
+            result = (f"{self.desyncs} desynced frames, first at {self.first_desync}"
+                      if self.desyncs else "in sync")
+            print(f"Replay: {self.frames}/{self.total} frames, {result}", flush=True)
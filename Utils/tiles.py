@@ -0,0 +1,64 @@
+# tiles.py
+# Pre-rendered board tiles for the 8x8 grid games (TicTacToe, TreasureHunt,
+# TreasureRace, ShooterGame). Every (icon, color, scale, checker, outline) look
+# is rasterized once into an RGB stamp + mask and drawn with one blit after that,
+# instead of a SetPixel per icon pixel (times scale squared) every frame.
+#
+#   draw_tile(fb, px, py, (255, 0, 0), icon=ICON_X)       # icon rows, 1 = lit
+#   draw_tile(fb, px, py, Color(0, 255, 0), checker=True) # every other pixel
+#   draw_tile(fb, px, py, (0, 0, 200), outline=True)      # 1 px box (cursor)
+#   draw_tile(fb, px, py, C_P1)                           # solid
+#
+# Plain canvases work too (SetPixel over the stamp's cached lit pixels).
+
+from functools import lru_cache
+
+import numpy as np
+
+from Utils.framebuffer import rgb
+
+TILE = 8  # cell size of the grid games
+
+
+def _icon_key(icon):
+    return None if icon is None else tuple(tuple(int(v) for v in row) for row in icon)
+
+
+@lru_cache(maxsize=512)
+def _stamp(color, icon, scale, checker, outline, size):
+    if icon is not None:
+        mask = np.array(icon, dtype=bool)
+    else:
+        mask = np.ones((size, size), dtype=bool)
+        if checker:
+            yy, xx = np.mgrid[0:size, 0:size]
+            mask &= (xx + yy) % 2 == 0
+        if outline:
+            mask[1:-1, 1:-1] = False
+    if scale > 1:
+        mask = np.kron(mask, np.ones((scale, scale), dtype=bool))
+
+    img = np.zeros(mask.shape + (3,), dtype=np.uint8)
+    img[mask] = color
+    ys, xs = np.nonzero(mask)
+    return img, mask, list(zip(xs.tolist(), ys.tolist()))
+
+
+def tile_stamp(color, icon=None, scale=1, checker=False, outline=False, size=TILE):
+    """
+    (image, mask, lit_points) for one tile look, built on first use and kept.
+    icon: rows of 0/1 (its own size; checker / outline / size only apply without one)
+    """
+    return _stamp(rgb(color), _icon_key(icon), int(scale), bool(checker), bool(outline), int(size))
+
+
+def draw_tile(cv, x, y, color, icon=None, scale=1, checker=False, outline=False, size=TILE):
+    """Draw a tile look with its top-left at (x, y): one masked blit on a FrameBuffer."""
+    img, mask, pts = tile_stamp(color, icon, scale, checker, outline, size)
+    if hasattr(cv, "blit"):
+        cv.blit(x, y, img, mask)
+        return
+    r, g, b = rgb(color)
+    x = int(x); y = int(y)
+    for px, py in pts:
+        cv.SetPixel(x + px, y + py, r, g, b)
@@ -0,0 +1,222 @@
+# zygote.py
+# Warm fork server: imports pygame / rgbmatrix / NumPy / Utils and parses the
+# BDF fonts once at boot, then fork()s a fresh child for the menu and for every
+# game launch instead of exec'ing a cold python3.
+#
+# Only one process may drive the panels, so the zygote itself never opens the
+# matrix or the joysticks. Each child does that (pygame.init / create_matrix),
+# runs its file, and names the next file with handoff() on the way out. That is
+# the same menu -> game -> menu chain as before, minus the import and font cost,
+# and a crashing game can never take the menu's state down with it.
+#
+# Boot with (instead of "python3 menu.py"):
+#   python3 -m Utils.zygote [--menu /home/rpi-kristof/menu.py]
+#
+# Every launch and return is logged with its time, measured from handoff() in
+# the old child to the new child's create_matrix().
+
+import os
+import sys
+import time
+import runpy
+import select
+import argparse
+import importlib
+import traceback
+
+MENU_PATH = "/home/rpi-kristof/menu.py"
+GAMES_DIR = "/home/rpi-kristof/games"
+
+PRELOAD = (
+    "numpy",
+    "pygame",
+    "rgbmatrix",
+    "rgbmatrix.graphics",
+    "multiprocessing",
+    "Utils.framebuffer",
+    "Utils.matrix_utils",
+    "Utils.menu_utils",
+    "Utils.game_host",
+    "Utils.led_digits",
+    "Utils.led_text",
+    "Utils.free_cells",
+    "Utils.connect4",
+)
+
+FONTS = (
+    "/home/rpi-kristof/rpi-rgb-led-matrix/fonts/6x10.bdf",
+    "/usr/local/share/rgbmatrix/fonts/6x10.bdf",
+)
+
+_report_fd = None   # write end of the pipe to the zygote (only set in forked children)
+_ready_sent = False
+
+
+# ----------------------------
+# CHILD SIDE
+# ----------------------------
+def active():
+    """True inside a child forked by the zygote."""
+    return _report_fd is not None
+
+
+def _send(msg):
+    os.write(_report_fd, (msg + "\n").encode())
+
+
+def notify_ready():
+    """create_matrix() calls this: the child owns the panels and is about to draw."""
+    global _ready_sent
+    if _report_fd is None or _ready_sent:
+        return
+    _ready_sent = True
+    _send(f"ready {time.monotonic():.6f}")
+
+
+def handoff(path=None):
+    """
+    Ask the zygote to run path next (None = back to the menu) and end this child.
+    Raises SystemExit, so the game's finally blocks still run.
+    """
+    _send(f"next {time.monotonic():.6f} {path or ''}")
+    raise SystemExit(0)
+
+
+def _run_child(path, report_fd):
+    global _report_fd
+    _report_fd = report_fd
+    code = 0
+    try:
+        import numpy as np
+        np.random.seed()  # forked from one parent: don't replay the same random stream
+        sys.argv = [path]
+        runpy.run_path(path, run_name="__main__")
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        # os._exit skips atexit: stop worker processes (e.g. the Connect Four AI) here
+        # and write out the latency histograms
+        import multiprocessing as mp
+        from Utils import latency
+        latency.flush()
+        for p in mp.active_children():
+            p.terminate()
+        try:
+            import pygame
+            from Utils import input_state
+            input_state.stop_sampler()  # no event pumping on its thread during quit()
+            pygame.quit()
+        except Exception:
+            pass
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+# ----------------------------
+# ZYGOTE SIDE
+# ----------------------------
+def preload(modules=PRELOAD, fonts=FONTS):
+    t0 = time.perf_counter()
+    n_mod = 0
+    for name in modules:
+        try:
+            importlib.import_module(name)
+            n_mod += 1
+        except Exception as e:
+            print(f"Zygote: can't preload {name}: {e}", flush=True)
+
+    from Utils.matrix_utils import load_font
+    n_font = 0
+    for path in fonts:
+        if os.path.isfile(path):
+            load_font(path)  # cached in matrix_utils, children inherit the parsed font
+            n_font += 1
+    print(f"Zygote: preloaded {n_mod} modules, {n_font} fonts in "
+          f"{(time.perf_counter() - t0) * 1000:.0f} ms", flush=True)
+
+
+def _messages(fd, buf):
+    """Read what is available on fd; returns (complete lines, rest, eof)."""
+    chunk = os.read(fd, 4096)
+    buf += chunk
+    lines = buf.split(b"\n")
+    return [l.decode() for l in lines[:-1]], lines[-1], not chunk
+
+
+def run_child(path, t_request):
+    """
+    Fork a child that runs path, log its launch time, wait for it to end.
+    Returns (next path or None, handoff time) as requested by the child.
+    """
+    name = os.path.basename(path)
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        _run_child(path, w)  # never returns
+    os.close(w)
+    t_fork = time.monotonic()
+
+    nxt = (None, None)
+    buf = b""
+    eof = False
+    exited = False
+    status = 0
+    while not exited:
+        # a worker the game forked may keep the pipe open after the child is gone,
+        # so poll waitpid too instead of reading until EOF
+        ready, _, _ = select.select([r], [], [], 0.25)
+        if ready:
+            lines, buf, eof = _messages(r, buf)
+            for line in lines:
+                kind, t, *rest = line.split(" ", 2)
+                if kind == "ready":
+                    print(f"Zygote: {name} up in {(float(t) - t_request) * 1000:.1f} ms "
+                          f"(fork {(t_fork - t_request) * 1000:.1f} ms)", flush=True)
+                elif kind == "next":
+                    nxt = (rest[0] if rest and rest[0] else "", float(t))
+        # EOF: every writer is gone, so the child is exiting; wait for it
+        done, status = os.waitpid(pid, 0 if eof else os.WNOHANG)
+        exited = done == pid
+    os.close(r)
+
+    code = os.waitstatus_to_exitcode(status)
+    if code != 0:
+        print(f"Zygote: {name} exited ({code})", flush=True)
+    return nxt
+
+
+def serve(menu_path=MENU_PATH):
+    """
+    Menu -> game -> menu forever. A game that ends without handoff() (crash,
+    "need two controllers", ...) returns to the menu; the menu quitting ends the zygote.
+    """
+    path, t_request = menu_path, time.monotonic()
+    while True:
+        nxt, t_handoff = run_child(path, t_request)
+        if nxt is None:
+            if path == menu_path:
+                return  # BACK in the menu: quit
+            nxt, t_handoff = "", time.monotonic()
+        path = nxt or menu_path
+        t_request = t_handoff
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Preloaded fork server for the menu and games.")
+    ap.add_argument("--menu", default=MENU_PATH, help="menu script to start (and return to)")
+    ap.add_argument("--games-dir", default=GAMES_DIR, help="added to sys.path so games find Utils")
+    args = ap.parse_args(argv)
+
+    if args.games_dir not in sys.path:
+        sys.path.insert(0, args.games_dir)
+    preload()
+    serve(args.menu)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,26 @@ import time
 import math
 import pygame
 import re
-from rgbmatrix import RGBMatrix, RGBMatrixOptions, graphics
+import sys
+from functools import lru_cache
+
+import numpy as np
 from rgbmatrix.graphics import Color
-from games.Utils.menu_utils import ExitOnBack
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+GAMES_DIR = "/home/rpi-kristof/games"
+sys.path.insert(0, GAMES_DIR)  # games import "Utils.*"; share the same modules with them
+
+from Utils.menu_utils import ExitOnBack
+from Utils.game_host import GameHost
+from Utils.input_state import InputState
+from Utils import zygote
+from Utils.framebuffer import FrameBuffer
+from Utils.game_loop import clock
+from Utils.led_text import draw_bdf, bdf_text_width
+from Utils.matrix_utils import create_matrix
 
 # scp active.py rpi-kristof@192.168.0.200:~/games/TestA.py
 
@@ -18,18 +35,20 @@ from games.Utils.menu_utils import ExitOnBack
 #     - Shows first N letters of filename centered across both panels
 #     - Arrows on far left/right edges
 #     - Index dots centered at bottom across both panels
-# - A = launch selected game
+# - A = launch selected game (runs in this process via GameHost, BACK returns here;
+#       started by Utils/zygote.py, the zygote forks a fresh child for it instead)
 # - B = refresh file list
 # - BACK = exit
+# - Nobody touching a pad for LED_MENU_IDLE seconds (default 120): low-power mode,
+#   dimmed and static at a few frames per second; any stick move / button wakes it
 #
 # Multi-controller:
 # - If multiple controllers are plugged in, ANY controller can navigate/launch/refresh/exit.
 # -------------------------------------------------
 
 # ----------------------------
-# CONFIG
+# CONFIG (cont.)
 # ----------------------------
-GAMES_DIR = "/home/rpi-kristof/games"
 ONLY_SUFFIX = ".py"
 FONT_PATH = "/home/rpi-kristof/rpi-rgb-led-matrix/fonts/6x10.bdf"
 
@@ -60,40 +79,33 @@ ERR = Color(255, 0, 0)
 ARROW_H = 16
 MAX_LABEL_CHARS = 16
 
+BRIGHTNESS = 50
+
+# Idle / low-power mode
+IDLE_AFTER = float(os.environ.get("LED_MENU_IDLE", "120"))  # seconds without input
+ACTIVE_FPS = 60
+IDLE_FPS = 4
+IDLE_BRIGHTNESS = 15
+
 # ----------------------------
-# INIT (pygame + matrix + font)
+# INIT (host: pygame + matrix, kept alive across games)
 # ----------------------------
-pygame.init()
-pygame.joystick.init()
+host = GameHost(GAMES_DIR, brightness=BRIGHTNESS)
 
 def get_pads():
-    """Return a list of all currently-connected joystick objects (initialized)."""
-    pads = []
-    for i in range(pygame.joystick.get_count()):
-        j = pygame.joystick.Joystick(i)
-        if not j.get_init():
-            j.init()
-        pads.append(j)
-    return pads
+    """Return all currently-connected pads (initialized), read through a fresh InputState."""
+    global inp, exit_mgr
+    inp = InputState(host.get_pads())
+    exit_mgr = ExitOnBack(inp.pads, back_btn=BACK_BTN, quit_only=True)  # once per pad set
+    return inp.pads
 
 pads = get_pads()
 if len(pads) < 1:
     print("No controller detected", flush=True)
     raise SystemExit(1)
 
-options = RGBMatrixOptions()
-options.hardware_mapping = "adafruit-hat"
-options.rows = 64
-options.cols = 64
-options.chain_length = CHAIN_LENGTH
-options.brightness = 50
-options.gpio_slowdown = 4
-
-matrix = RGBMatrix(options=options)
-canvas = matrix.CreateFrameCanvas()
-
-font = graphics.Font()
-font.LoadFont(FONT_PATH)
+matrix, canvas = create_matrix(brightness=BRIGHTNESS)
+fb = FrameBuffer(TOTAL_W, PANEL_H)  # kept between frames: only the parts that changed are redrawn
 
 # ----------------------------
 # FILE SCAN
@@ -116,36 +128,37 @@ idx = 0
 # ----------------------------
 # DRAW HELPERS (FULL 128x64)
 # ----------------------------
-def clear_all(cv):
-    cv.Clear()
-
-def set_pixel(cv, x, y, c):
-    if 0 <= x < TOTAL_W and 0 <= y < PANEL_H:
-        cv.SetPixel(x, y, c.red, c.green, c.blue)
-
-def text_width_px(text: str) -> int:
-    return sum(font.CharacterWidth(ord(c)) for c in text)
+LABEL_BOX = (10, PANEL_H // 2 - ARROW_H // 2, TOTAL_W - 20, ARROW_H)  # between the arrows
+DOTS_Y0 = PANEL_H - 12
+
+def arrow_mask():
+    """Left-pointing arrow, ARROW_H tall; the right arrow is its mirror image."""
+    half = ARROW_H // 2
+    m = np.zeros((ARROW_H, half), dtype=bool)
+    for row, dy in enumerate(range(-half, half)):
+        w = max(0, half - abs(dy))
+        m[row, half - w:] = True
+    return m
+
+ARROW_LEFT = arrow_mask()
+ARROW_RIGHT = ARROW_LEFT[:, ::-1]
+
+@lru_cache(maxsize=128)
+def label_for(name):
+    raw = os.path.splitext(name)[0]
+    base = re.sub(r'(?<!^)(?=[A-Z])', ' ', raw)
+    return base[:MAX_LABEL_CHARS]
 
 def draw_text_center_full(cv, baseline_y, text, color):
-    w = text_width_px(text)
+    w = bdf_text_width(FONT_PATH, text)
     start_x = (TOTAL_W - w) // 2
-    graphics.DrawText(cv, font, start_x, baseline_y, color, text)
+    draw_bdf(cv, start_x, baseline_y, text, color, FONT_PATH)
 
 def draw_arrow_left_full(cv, color):
-    cx = 8
-    cy = PANEL_H // 2
-    for dy in range(-ARROW_H // 2, ARROW_H // 2):
-        w = max(0, (ARROW_H // 2) - abs(dy))
-        for dx in range(w):
-            set_pixel(cv, cx - dx, cy + dy, color)
+    cv.blit_mask(8 - (ARROW_H // 2 - 1), PANEL_H // 2 - ARROW_H // 2, ARROW_LEFT, color)
 
 def draw_arrow_right_full(cv, color):
-    cx = TOTAL_W - 9
-    cy = PANEL_H // 2
-    for dy in range(-ARROW_H // 2, ARROW_H // 2):
-        w = max(0, (ARROW_H // 2) - abs(dy))
-        for dx in range(w):
-            set_pixel(cv, cx + dx, cy + dy, color)
+    cv.blit_mask(TOTAL_W - 9, PANEL_H // 2 - ARROW_H // 2, ARROW_RIGHT, color)
 
 def draw_index_dots_full(cv, current, total, color_on, color_off):
     if total <= 1:
@@ -179,54 +192,84 @@ def draw_index_dots_full(cv, current, total, color_on, color_off):
         x = start_x + col * (dot_w + gap_x)
 
         c = color_on if i == dot_i else color_off
-        for yy in range(dot_h):
-            for xx in range(dot_w):
-                set_pixel(cv, x + xx, y + yy, c)
+        cv.fill_rect(x, y, dot_w, dot_h, c)
 
 
-def draw_menu(cv, files, current_idx, now):
-    clear_all(cv)
+def draw_menu(cv, files, current_idx, now, idle=False):
+    """
+    Redraw only what changed since the last frame: the arrows while they pulse,
+    the label and dots when the selection moves. Idle: static arrows, so nothing.
+    """
+    if not files:
+        if cv.changed("screen", "empty"):
+            cv.clear()
+            draw_text_center_full(cv, 30, "NO FILES", ERR)
+            draw_text_center_full(cv, 44, "FOUND", ERR)
+        return
+
+    if cv.changed("screen", "carousel"):
+        cv.clear()
+        cv.forget("arrows", "label", "dots")
 
-    pulse = (math.sin(now * 4.0) + 1) / 2
-    accent = Color(
+    pulse = 0.0 if idle else (math.sin(now * 4.0) + 1) / 2
+    accent = (
         int(ACCENT.red * (0.5 + 0.5 * pulse)),
         int(ACCENT.green * (0.5 + 0.5 * pulse)),
         int(ACCENT.blue * (0.5 + 0.5 * pulse)),
     )
+    if cv.changed("arrows", accent):
+        draw_arrow_left_full(cv, accent)
+        draw_arrow_right_full(cv, accent)
 
-    if not files:
-        draw_text_center_full(cv, 30, "NO FILES", ERR)
-        draw_text_center_full(cv, 44, "FOUND", ERR)
-        return
+    label = label_for(files[current_idx])
+    if cv.changed("label", label):
+        cv.fill_rect(*LABEL_BOX, BG)
+        draw_text_center_full(cv, 38, label, FG)
 
-    name = files[current_idx]
-    raw = os.path.splitext(name)[0]
-    base = re.sub(r'(?<!^)(?=[A-Z])', ' ', raw)
-    label = base[:MAX_LABEL_CHARS]
+    if cv.changed("dots", (current_idx, len(files))):
+        cv.fill_rect(0, DOTS_Y0, TOTAL_W, PANEL_H - DOTS_Y0, BG)
+        draw_index_dots_full(cv, current_idx, len(files), TAB, Color(255, 255, 0))
 
-    draw_arrow_left_full(cv, accent)
-    draw_arrow_right_full(cv, accent)
-    draw_text_center_full(cv, 38, label, FG)
-    draw_index_dots_full(cv, current_idx, len(files), TAB, Color(255, 255, 0))
+# ----------------------------
+# IDLE / LOW POWER
+# ----------------------------
+idle = False
+
+def set_idle(on):
+    """Doze (dimmed, static, IDLE_FPS) or wake up (full brightness, pulsing, ACTIVE_FPS)."""
+    global idle
+    idle = on
+    matrix.brightness = IDLE_BRIGHTNESS if on else BRIGHTNESS
+    fb.invalidate()  # brightness is applied as pixels are set: send them all again
 
 # ----------------------------
 # INPUT / LAUNCH
 # ----------------------------
-last_action = time.time()
+last_action = clock()
 
 # per-controller axis repeat tracking
 axis_state = {}        # joy_id -> -1/0/+1
 next_repeat_time = {}  # joy_id -> float
 
 def launch_file(filename):
+    global pads, canvas, last_action
     path = os.path.join(GAMES_DIR, filename)
     if not os.path.isfile(path):
         print("Missing file:", path, flush=True)
         return
 
     matrix.Clear()
-    pygame.quit()
-    os.execvp("python3", ["python3", path])
+    if zygote.active():
+        zygote.handoff(path)  # this menu ends; the zygote forks the game
+    host.launch(path)  # returns when the game hands back (BACK) or ends
+
+    # the game swapped buffers and may have (re)initialised pads
+    pads = get_pads()
+    canvas = host.canvas
+    fb.invalidate()  # the game drew over both buffers
+    axis_state.clear()
+    next_repeat_time.clear()
+    last_action = clock()
 
 def any_button(pads, btn_index: int) -> bool:
     return any(p.get_button(btn_index) for p in pads)
@@ -257,18 +300,21 @@ def first_axis_state(pads):
 # MAIN LOOP
 # ----------------------------
 while True:
-    pygame.event.pump()
-    now = time.time()
+    frame_start = clock()
+    inp.poll()
+    now = clock()
 
     # Refresh controller list if count changes
     # (prevents needing restart when plugging/unplugging)
     if pygame.joystick.get_count() != len(pads):
-        pads = get_pads()
-        # rebuild exit manager with new pads
+        pads = get_pads()  # also rebuilds the exit manager for the new pads
         axis_state.clear()
         next_repeat_time.clear()
 
-    exit_mgr = ExitOnBack(pads, back_btn=BACK_BTN, quit_only=True)
+    # doze after IDLE_AFTER seconds without input; the first touch wakes it
+    quiet = frame_start - inp.last_input
+    if idle != (quiet > IDLE_AFTER):
+        set_idle(not idle)
 
     # keep idx valid if list changed
     if games:
@@ -276,8 +322,8 @@ while True:
     else:
         idx = 0
 
-    draw_menu(canvas, games, idx if games else 0, now)
-    canvas = matrix.SwapOnVSync(canvas)
+    draw_menu(fb, games, idx if games else 0, now, idle)
+    canvas = fb.present(matrix, canvas)
 
     # exit (any controller)
     if exit_mgr.should_exit():
@@ -328,3 +374,10 @@ while True:
             # back to neutral
             elif new_state == 0:
                 axis_state[jid] = 0
+
+    # pace: ACTIVE_FPS in use; dozing, IDLE_FPS but cut short by any joystick event
+    left = frame_start + 1.0 / (IDLE_FPS if idle else ACTIVE_FPS) - clock()
+    if idle:
+        inp.wait(left)
+    elif left > 0:
+        time.sleep(left)